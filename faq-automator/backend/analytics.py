@@ -0,0 +1,93 @@
+# backend/analytics.py
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+from backend.sketches import HyperLogLog, SpaceSaving
+
+TOP_QUERIES_LIMIT = 10
+# Heavy-hitter counters kept per business; the top 10 are exact unless the
+# query distribution is very flat (see benchmarks/bench_sketches.py)
+TOP_QUERIES_SKETCH_CAPACITY = 200
+UNIQUE_USERS_HLL_PRECISION = 12
+
+
+def normalize_query(query: str) -> str:
+    return (query or "").lower().strip()
+
+
+def record_day(record: dict) -> str:
+    timestamp = record.get("timestamp")
+    if isinstance(timestamp, datetime):
+        return timestamp.date().isoformat()
+    if isinstance(timestamp, str) and timestamp:
+        return timestamp[:10]
+    return "unknown"
+
+
+class AnalyticsDelta:
+    """The change a batch of conversation records makes to one business's counters."""
+
+    def __init__(self):
+        self.total_queries = 0
+        self.query_type_counts: Counter = Counter()
+        self.daily_counts: Counter = Counter()
+        # Exact within one batch; folded into the stored sketches by merge_sketches()
+        self.query_counts: Counter = Counter()
+        self.user_ids: Set[str] = set()
+
+    def add(self, record: dict):
+        self.total_queries += 1
+        self.query_type_counts[record.get("query_type") or "unknown"] += 1
+        self.daily_counts[record_day(record)] += 1
+        self.query_counts[normalize_query(record.get("query", ""))] += 1
+        if record.get("user_id"):
+            self.user_ids.add(str(record["user_id"]))
+
+    def merge_sketches(self, state: Optional[dict]) -> dict:
+        """Folds this delta into a stored sketch state ({"top_queries", "unique_users"}) and returns the new state."""
+        state = state or {}
+        top_queries = SpaceSaving(TOP_QUERIES_SKETCH_CAPACITY)
+        top_queries.update(self.query_counts)
+        unique_users = HyperLogLog(UNIQUE_USERS_HLL_PRECISION)
+        unique_users.update(self.user_ids)
+        if state.get("top_queries"):
+            top_queries = SpaceSaving.from_dict(state["top_queries"]).merge(top_queries)
+        if state.get("unique_users"):
+            unique_users = HyperLogLog.from_dict(state["unique_users"]).merge(unique_users)
+        return {"top_queries": top_queries.to_dict(), "unique_users": unique_users.to_dict()}
+
+    def merge_into(self, counters: dict):
+        """Applies this delta to a plain counters dict (the local stand-in for the analytics doc)."""
+        counters["total_queries"] = counters.get("total_queries", 0) + self.total_queries
+        for field, delta in (("query_type_counts", self.query_type_counts),
+                             ("daily_counts", self.daily_counts)):
+            merged = Counter(counters.get(field, {}))
+            merged.update(delta)
+            counters[field] = dict(merged)
+        counters["sketches"] = self.merge_sketches(counters.get("sketches"))
+
+
+def aggregate_by_business(records: Iterable[dict]) -> Dict[str, AnalyticsDelta]:
+    deltas: Dict[str, AnalyticsDelta] = defaultdict(AnalyticsDelta)
+    for record in records:
+        deltas[record.get("business_id") or "unknown"].add(record)
+    return dict(deltas)
+
+
+def format_analytics(counters: Optional[dict]) -> dict:
+    """Turns a stored analytics doc into the response shape of GET /analytics/{business_id}."""
+    counters = counters or {}
+    sketches = counters.get("sketches") or {}
+    top_queries = SpaceSaving.from_dict(sketches["top_queries"]).top(TOP_QUERIES_LIMIT) \
+        if sketches.get("top_queries") else []
+    unique_users = HyperLogLog.from_dict(sketches["unique_users"]).count() \
+        if sketches.get("unique_users") else 0
+    return {
+        "total_queries": counters.get("total_queries", 0),
+        "unique_users": unique_users,  # approximate (HyperLogLog, ~1.6% error)
+        "query_type_counts": dict(counters.get("query_type_counts", {})),
+        "daily_counts": dict(sorted(counters.get("daily_counts", {}).items())),
+        "top_queries": [{"query": q, "count": c} for q, c in top_queries],  # approximate (Space-Saving)
+    }
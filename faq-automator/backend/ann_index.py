@@ -0,0 +1,180 @@
+# backend/ann_index.py
+#
+# Chooses and builds the FAISS index for a business from its raw vectors file
+# (see vector_store). Brochure-sized corpora get an exact flat index; large
+# catalogues get an approximate one whose search cost doesn't grow linearly:
+#
+#   flat   IndexFlatIP    exact; fine up to ANN_FLAT_MAX_VECTORS
+#   hnsw   IndexHNSWFlat  graph search; efSearch trades recall for latency
+#   ivf    IndexIVFFlat   k-means buckets; nprobe trades recall for latency.
+#                         Builds faster than HNSW; the default for large corpora.
+#
+# Any type can store its vectors compressed (ANN_QUANTIZATION): "sq8" keeps one
+# byte per dimension (4x smaller), "pq" ANN_PQ_SUBQUANTIZERS bytes per vector
+# (32x smaller at 48). The full float32 vectors stay on disk in {business_id}.vectors,
+# and the retriever re-scores the top candidates exactly from a memory map of it.
+#
+# The chosen type and its build parameters are recorded in {business_id}.meta.json.
+
+import math
+from pathlib import Path
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from backend.config import settings
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+QUANTIZATIONS = ("none", "sq8", "pq")
+# Vectors added to an approximate index per add() call while building
+BUILD_BATCH_ROWS = 65_536
+# k-means wants roughly 30-256 training points per IVF list
+IVF_TRAINING_POINTS_PER_LIST = 64
+# Training points for the quantizer itself: PQ learns 256 centroids per sub-vector
+QUANTIZER_TRAINING_POINTS = 256 * 64
+# Below this, PQ's codebooks can't be trained well; such corpora use SQ8
+PQ_MIN_VECTORS = 256 * 16
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """Picks the index type for a corpus of `num_vectors` chunks (or ANN_INDEX_TYPE, if forced)."""
+    if settings.ANN_INDEX_TYPE != "auto":
+        if settings.ANN_INDEX_TYPE not in INDEX_TYPES:
+            raise ValueError(f"Unknown ANN_INDEX_TYPE: {settings.ANN_INDEX_TYPE}")
+        return settings.ANN_INDEX_TYPE
+    if num_vectors <= settings.ANN_FLAT_MAX_VECTORS:
+        return "flat"
+    if num_vectors >= settings.ANN_IVF_MIN_VECTORS:
+        return "ivf"
+    return "hnsw"
+
+
+def choose_quantization(index_type: str, num_vectors: int) -> str:
+    """ANN_QUANTIZATION, or SQ8 where PQ doesn't fit (small corpora, HNSW)."""
+    quantization = settings.ANN_QUANTIZATION
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown ANN_QUANTIZATION: {quantization}")
+    # FAISS's HNSW-PQ only supports L2 distances, not inner product
+    if quantization == "pq" and (index_type == "hnsw" or num_vectors < PQ_MIN_VECTORS):
+        return "sq8"
+    return quantization
+
+
+def ivf_num_lists(num_vectors: int) -> int:
+    """ANN_IVF_NLIST, or about 4 * sqrt(n) lists, capped so each list gets enough training points."""
+    nlist = settings.ANN_IVF_NLIST or int(4 * math.sqrt(num_vectors))
+    return max(1, min(nlist, num_vectors // IVF_TRAINING_POINTS_PER_LIST))
+
+
+def flat_index_from_file(vectors_file: Path, num_vectors: int, dimension: int) -> faiss.IndexFlatIP:
+    """
+    Builds an IndexFlatIP from a raw float32 vectors file, reading straight into
+    the index's storage. index.add() would need the whole matrix in memory first,
+    and adding batch by batch regrows (and briefly doubles) the storage each time.
+    """
+    # --- Step D: Create FAISS Index (IMPROVEMENT: Using Inner Product) ---
+    # Using IndexFlatIP for Inner Product (cosine similarity)
+    index = faiss.IndexFlatIP(dimension)
+    num_bytes = num_vectors * dimension * 4
+    index.codes.resize(num_bytes)
+    storage = faiss.rev_swig_ptr(index.codes.data(), num_bytes)
+    with open(vectors_file, "rb") as f:
+        if f.readinto(storage) != num_bytes:
+            raise IOError(f"Truncated vectors file: {vectors_file}")
+    index.ntotal = num_vectors
+    return index
+
+
+def build_index(vectors_file: Path, num_vectors: int, dimension: int,
+                index_type: Optional[str] = None, quantization: Optional[str] = None) -> Tuple[faiss.Index, dict]:
+    """
+    Builds the search index for a vectors file.
+
+    Approximate and quantized indexes are filled from a memory map in batches,
+    so the raw vectors are never loaded twice.
+
+    Args:
+        vectors_file: float32 rows, num_vectors x dimension (L2-normalized).
+        num_vectors: Number of rows.
+        dimension: Embedding dimension.
+        index_type: "flat", "hnsw" or "ivf"; chosen from num_vectors if omitted.
+        quantization: "none", "sq8" or "pq"; ANN_QUANTIZATION if omitted.
+
+    Returns:
+        Tuple: (index, description for the metadata file, e.g. {"type": "ivf", "nlist": 632, ...}).
+    """
+    index_type = index_type or choose_index_type(num_vectors)
+    quantization = quantization or choose_quantization(index_type, num_vectors)
+    if index_type == "flat" and quantization == "none":
+        return flat_index_from_file(vectors_file, num_vectors, dimension), {"type": "flat", "quantization": "none"}
+
+    storage = {"none": "Flat", "sq8": "SQ8", "pq": f"PQ{settings.ANN_PQ_SUBQUANTIZERS}"}[quantization]
+    info = {"type": index_type, "quantization": quantization}
+    if index_type == "flat":
+        description = storage
+    elif index_type == "hnsw":
+        description = f"HNSW{settings.ANN_HNSW_M},{storage}"
+        info.update(M=settings.ANN_HNSW_M, ef_construction=settings.ANN_HNSW_EF_CONSTRUCTION)
+    elif index_type == "ivf":
+        info["nlist"] = ivf_num_lists(num_vectors)
+        description = f"IVF{info['nlist']},{storage}"
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+    if quantization == "pq":
+        info["pq_subquantizers"] = settings.ANN_PQ_SUBQUANTIZERS
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = settings.ANN_HNSW_EF_CONSTRUCTION
+
+    vectors = np.memmap(vectors_file, dtype="float32", mode="r", shape=(num_vectors, dimension))
+    if not index.is_trained:
+        # Train on an evenly spaced sample; the rows are in document order, so this covers every part of it
+        num_training = min(num_vectors, max(info.get("nlist", 0) * IVF_TRAINING_POINTS_PER_LIST,
+                                            QUANTIZER_TRAINING_POINTS if quantization != "none" else 0))
+        sample_rows = np.linspace(0, num_vectors - 1, num_training).astype(np.int64)
+        index.train(np.ascontiguousarray(vectors[sample_rows]))
+    for start in range(0, num_vectors, BUILD_BATCH_ROWS):
+        index.add(np.ascontiguousarray(vectors[start:start + BUILD_BATCH_ROWS]))
+    del vectors
+    return index, info
+
+
+def rerank_exact(vectors: np.ndarray, query_embedding: np.ndarray, candidates: np.ndarray,
+                 top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Re-scores candidate rows with their full-precision vectors and keeps the best `top_k`.
+
+    Args:
+        vectors: All of the business's float32 vectors (usually a read-only memory map;
+            only the candidate rows are read).
+        query_embedding: L2-normalized query vector.
+        candidates: Row ids from the approximate search (-1 for empty slots).
+        top_k: Number of results to keep.
+
+    Returns:
+        Tuple: (exact inner-product scores, row ids), best first.
+    """
+    # Sorted, so the memory map is read in file order
+    rows = np.sort(candidates[candidates >= 0])
+    scores = vectors[rows] @ query_embedding.reshape(-1)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return scores[order], rows[order]
+
+
+def search_params(index: faiss.Index, top_k: int, nprobe: Optional[int] = None,
+                  ef_search: Optional[int] = None) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query search parameters for an approximate index (None for a flat one).
+
+    They're passed to index.search() rather than set on the index, as one cached
+    index object serves concurrent queries. Defaults: ANN_HNSW_EF_SEARCH, ANN_IVF_NPROBE.
+    `top_k` is the number of results asked from the index (candidates, when re-scoring).
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        # HNSW can't return more results than its candidate list holds
+        return faiss.SearchParametersHNSW(efSearch=max(ef_search or settings.ANN_HNSW_EF_SEARCH, top_k))
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe or settings.ANN_IVF_NPROBE)
+    return None
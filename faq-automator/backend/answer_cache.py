@@ -0,0 +1,144 @@
+# backend/answer_cache.py
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+from backend.config import settings
+from backend.metrics import METRICS
+
+
+@dataclass
+class _CachedAnswer:
+    answer: str
+    llm_seconds: float
+    created_at: float
+    last_used: float
+
+
+@dataclass
+class _BusinessAnswers:
+    version: Hashable
+    vectors: Optional[np.ndarray] = None  # (n, d) L2-normalized query embeddings
+    answers: List[_CachedAnswer] = field(default_factory=list)
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers per business, looked up by query-embedding similarity.
+
+    A lookup hits when a previously answered query of the same business has a
+    cosine similarity >= `similarity_threshold` with the new one. Entries expire
+    after `ttl_seconds`, each business keeps at most `max_entries_per_business`
+    (least recently used are dropped first), and all of a business's entries are
+    dropped when its index version changes (i.e. the PDF was re-processed).
+    """
+
+    def __init__(self, similarity_threshold: float = 0.92, max_entries_per_business: int = 256,
+                 ttl_seconds: float = 3600.0):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_business = max_entries_per_business
+        self.ttl_seconds = ttl_seconds
+        self._businesses: Dict[str, _BusinessAnswers] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_llm_seconds = 0.0
+
+    def lookup(self, business_id: str, query_embedding: np.ndarray, version: Hashable) -> Optional[str]:
+        """Returns a cached answer for a sufficiently similar query, or None."""
+        with self._lock:
+            entries = self._get_entries(business_id, version)
+            self._expire(entries, time.monotonic())
+            if entries is None or not entries.answers:
+                self._record_miss()
+                return None
+
+            similarities = entries.vectors @ query_embedding.reshape(-1)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self._record_miss()
+                return None
+
+            cached = entries.answers[best]
+            cached.last_used = time.monotonic()
+            self.hits += 1
+            self.saved_llm_seconds += cached.llm_seconds
+            METRICS.incr("answer_cache.hits")
+            METRICS.incr("answer_cache.saved_llm_seconds", cached.llm_seconds)
+            return cached.answer
+
+    def store(self, business_id: str, query_embedding: np.ndarray, answer: str,
+              version: Hashable, llm_seconds: float = 0.0):
+        with self._lock:
+            entries = self._get_entries(business_id, version, create=True)
+            now = time.monotonic()
+            self._expire(entries, now)
+            if len(entries.answers) >= self.max_entries_per_business:
+                lru = min(range(len(entries.answers)), key=lambda i: entries.answers[i].last_used)
+                self._delete(entries, [lru])
+
+            vector = query_embedding.reshape(1, -1).astype("float32")
+            entries.vectors = vector if entries.vectors is None else np.vstack([entries.vectors, vector])
+            entries.answers.append(_CachedAnswer(answer, llm_seconds, created_at=now, last_used=now))
+
+    def invalidate(self, business_id: str):
+        with self._lock:
+            if self._businesses.pop(business_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_llm_seconds": self.saved_llm_seconds,
+                "invalidations": self.invalidations,
+                "businesses": len(self._businesses),
+                "entries": sum(len(e.answers) for e in self._businesses.values()),
+            }
+
+    # --- Internal helpers (caller must hold the lock) ---
+
+    def _record_miss(self):
+        self.misses += 1
+        METRICS.incr("answer_cache.misses")
+
+    def _get_entries(self, business_id: str, version: Hashable, create: bool = False) -> Optional[_BusinessAnswers]:
+        entries = self._businesses.get(business_id)
+        if entries is not None and entries.version != version:
+            # The business's index was rebuilt, so every cached answer may be stale
+            del self._businesses[business_id]
+            self.invalidations += 1
+            entries = None
+        if entries is None and create:
+            entries = self._businesses[business_id] = _BusinessAnswers(version=version)
+        return entries
+
+    def _expire(self, entries: Optional[_BusinessAnswers], now: float):
+        if entries is None:
+            return
+        expired = [i for i, a in enumerate(entries.answers) if now - a.created_at > self.ttl_seconds]
+        if expired:
+            self._delete(entries, expired)
+
+    @staticmethod
+    def _delete(entries: _BusinessAnswers, positions: List[int]):
+        dropped = set(positions)
+        keep = [i for i in range(len(entries.answers)) if i not in dropped]
+        entries.answers = [entries.answers[i] for i in keep]
+        entries.vectors = entries.vectors[keep] if keep else None
+
+
+ANSWER_CACHE = SemanticAnswerCache(
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+    max_entries_per_business=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+)
+METRICS.register_collector("answer_cache", ANSWER_CACHE.stats)
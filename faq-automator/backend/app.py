@@ -1,23 +1,37 @@
 # backend/app.py
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends # <-- Added 'Depends'
+from fastapi.responses import JSONResponse
 from datetime import datetime
 from pathlib import Path
 import logging
+import os
+import uuid
 
 # Import our Pydantic models
 from backend.models import QueryRequest, QueryResponse
 # Import the core RAG logic function
 from backend.llm_handler import generate_answer
 # Import the router from our whatsapp_handler file
-from backend.whatsapp_handler import router as whatsapp_router
-# Import the PDF processor and Firebase functions
-from backend.pdf_processor import process_pdf
-from backend.firebase_client import get_analytics_data, update_business_paths
+from backend.whatsapp_handler import router as whatsapp_router, start_reply_workers, stop_reply_workers
+# Import the background ingestion jobs and Firebase functions
+from backend.ingestion_jobs import IngestionJobManager, IngestionQueueFullError
+from backend.answer_cache import ANSWER_CACHE
+from backend.config import settings
+from backend.firebase_client import (
+    get_analytics_data, get_business_by_id, update_business_paths, start_conversation_log, stop_conversation_log,
+)
+from backend.index_versions import locate
+from backend.retriever import CHUNKS_PATH, FAISS_INDEX_PATH, warm_index
+from backend.vector_store import read_meta
 # Import logging configuration
 from backend.logging_config import setup_logging, get_logger
 # Import security utilities
 from backend.security import verify_api_key, optional_verify_api_key
+# Import the in-process metrics registry
+from backend.metrics import METRICS
+from backend.utils import UPLOAD_FORM_OVERHEAD_BYTES, UploadSizeLimitMiddleware, UploadTooLargeError, save_upload
+from backend.workers import run_cpu_bound, shutdown_cpu_executor
 
 # Setup logging
 setup_logging()
@@ -33,10 +47,53 @@ app = FastAPI(
 # Include the WhatsApp router to make the /whatsapp-webhook endpoint available
 app.include_router(whatsapp_router)
 
+# Oversized uploads are refused before their multipart body is spooled to disk
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=settings.MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES,
+    paths={"/business/upload-pdf"},
+)
+
 # Define storage path for PDFs
 PDF_STORAGE_PATH = Path("data/pdfs")
 PDF_STORAGE_PATH.mkdir(parents=True, exist_ok=True)
 
+
+async def _on_ingestion_success(business_id: str, pdf_path: str, filename: str, result: dict):
+    # Runs in the API process once the job's process has written the new index
+    ANSWER_CACHE.invalidate(business_id)
+    # The new version is already live; load it now rather than on the next customer query
+    if not await run_cpu_bound(warm_index, business_id):
+        logger.warning(f"Could not warm the new index of {business_id}")
+    # Keep the PDF behind the live index under its business; the job's own copy goes
+    stored_path = PDF_STORAGE_PATH / f"{business_id}_{filename}"
+    os.replace(pdf_path, stored_path)
+    await update_business_paths(business_id, str(stored_path), result["faiss_index_path"], result.get("pdf_sha256"))
+
+
+async def _indexed_pdf_sha256(business_id: str):
+    """SHA-256 of the PDF behind the business's current index, or None if unknown."""
+    location = locate(FAISS_INDEX_PATH, CHUNKS_PATH, business_id)
+    if location is None:
+        return None
+    # The local index metadata is authoritative for this instance; the business
+    # record covers indexes built before the hash was kept next to them
+    meta = read_meta(location.index_dir, business_id) or {}
+    if meta.get("pdf_sha256"):
+        return meta["pdf_sha256"]
+    business = await get_business_by_id(business_id)
+    return business.get("pdf_sha256")
+
+
+ingestion_jobs = IngestionJobManager(
+    jobs_dir=settings.INGESTION_JOBS_DIR,
+    max_concurrent=settings.INGESTION_MAX_CONCURRENT,
+    max_pending=settings.INGESTION_MAX_PENDING,
+    retention_seconds=settings.INGESTION_JOB_RETENTION_SECONDS,
+    on_success=_on_ingestion_success,
+)
+METRICS.register_collector("ingestion", ingestion_jobs.stats)
+
 logger.info("✅ FastAPI application initialized")
 
 # --- API ENDPOINTS ---
@@ -46,6 +103,11 @@ async def health_check():
     logger.debug("Health check endpoint called")
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/metrics")
+async def get_metrics(api_key: str = Depends(verify_api_key)):
+    """Returns in-process performance counters (caches, latencies, queues)."""
+    return METRICS.snapshot()
+
 @app.get("/analytics/{business_id}")
 async def get_analytics(business_id: str):
     logger.info(f"Analytics requested for business_id: {business_id}")
@@ -67,9 +129,12 @@ async def upload_and_process_pdf(
     api_key: str = Depends(optional_verify_api_key)
 ):
     """
-    Uploads a PDF, saves it, processes it into a FAISS index,
-    and updates the business record in Firestore.
-    
+    Uploads a PDF, saves it and queues a background job that processes it into
+    a FAISS index and updates the business record in Firestore.
+
+    Returns 202 with a job id at once; poll GET /business/jobs/{job_id} for progress.
+    Re-uploading the document that is already indexed (same SHA-256) returns
+    200 with status "unchanged" and queues nothing.
     Optional API key authentication can be enabled by setting API_KEY in .env
     """
     logger.info(f"PDF upload started for business_id: {business_id}, filename: {file.filename}, authenticated: {api_key is not None}")
@@ -80,47 +145,71 @@ async def upload_and_process_pdf(
             logger.warning(f"Non-PDF file upload attempted: {file.filename}")
             raise HTTPException(status_code=400, detail="Only PDF files are accepted.")
         
-        # Check file size (max 50MB)
-        file_content = await file.read()
-        if len(file_content) > 50 * 1024 * 1024:
-            logger.warning(f"File too large: {file.filename} ({len(file_content)} bytes)")
-            raise HTTPException(status_code=413, detail="File size exceeds maximum (50MB)")
-        
-        # Save file
-        file_path = PDF_STORAGE_PATH / f"{business_id}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
-        
+        # Stream the upload to a temporary file, hashing it on the way, so the file is
+        # never held in memory. UploadSizeLimitMiddleware has already refused bodies far
+        # over the limit; this enforces it exactly on the file itself
+        tmp_path = PDF_STORAGE_PATH / f".{business_id}_{uuid.uuid4().hex}.part"
+        try:
+            file_size, pdf_sha256 = await save_upload(file, tmp_path, settings.MAX_UPLOAD_BYTES)
+        except UploadTooLargeError:
+            logger.warning(f"File too large: {file.filename} (over {settings.MAX_UPLOAD_BYTES} bytes)")
+            raise HTTPException(
+                status_code=413,
+                detail=f"File size exceeds maximum ({settings.MAX_UPLOAD_BYTES // (1024 * 1024)}MB)",
+            )
+        logger.debug(f"Received {file_size} bytes for {business_id}")
+
+        try:
+            # Same bytes as the document already indexed: nothing to rebuild
+            if pdf_sha256 == await _indexed_pdf_sha256(business_id):
+                logger.info(f"PDF for {business_id} unchanged (sha256 {pdf_sha256[:12]}), skipping processing")
+                return {
+                    "status": "unchanged",
+                    "filename": file.filename,
+                    "sha256": pdf_sha256,
+                    "message": f"This PDF is already the indexed document for business '{business_id}'; no change."
+                }
+
+            # Each job reads its own file, so a later upload can't change the bytes under it
+            file_path = tmp_path.with_suffix(".pdf")
+            os.replace(tmp_path, file_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
         logger.debug(f"PDF saved to: {file_path}")
+
+        # Queue processing; the job deletes its file when it finishes
+        job = await ingestion_jobs.submit(business_id, str(file_path), file.filename, pdf_sha256)
+        logger.info(f"✅ PDF queued for {business_id}: job {job['job_id']}")
         
-        # Process PDF
-        processing_result = process_pdf(str(file_path), business_id)
-        if processing_result["status"] != "success":
-            logger.error(f"PDF processing failed for {business_id}: {processing_result}")
-            raise HTTPException(status_code=500, detail="Failed to process PDF.")
-        
-        # Update business metadata
-        await update_business_paths(
-            business_id,
-            str(file_path),
-            processing_result["faiss_index_path"]
-        )
-        
-        logger.info(f"✅ PDF successfully processed for {business_id}: {processing_result['num_chunks']} chunks created")
-        
-        return {
-            "status": "success",
+        return JSONResponse(status_code=202, content={
+            "status": "queued",
+            "job_id": job["job_id"],
             "filename": file.filename,
-            "num_chunks": processing_result["num_chunks"],
-            "message": f"PDF processed and business '{business_id}' updated."
-        }
+            "status_url": f"/business/jobs/{job['job_id']}",
+            "message": f"PDF accepted; business '{business_id}' will be updated when processing finishes."
+        })
     
     except HTTPException:
         raise
+    except IngestionQueueFullError as e:
+        logger.warning(f"Ingestion queue full, rejecting upload for {business_id}: {e}")
+        raise HTTPException(status_code=503, detail="Too many PDFs are being processed. Please retry shortly.")
     except Exception as e:
         logger.error(f"Unexpected error during PDF upload for {business_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="An unexpected error occurred during PDF processing.")
 
+@app.get("/business/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, api_key: str = Depends(optional_verify_api_key)):
+    """
+    Reports an ingestion job's status ("queued", "running", "succeeded" or "failed"),
+    its progress (pages extracted, chunks embedded) and, when finished, its result.
+    """
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    return job
+
 @app.post("/query", response_model=QueryResponse)
 async def test_query(request: QueryRequest):
     logger.info(f"Query received - business_id: {request.business_id}, query: {request.query}")
@@ -142,10 +231,17 @@ async def startup_event():
     logger.info("="*60)
     logger.info("🚀 WhatsApp FAQ Automator starting up...")
     logger.info("="*60)
+    await start_conversation_log()
+    await start_reply_workers()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("="*60)
     logger.info("🛑 WhatsApp FAQ Automator shutting down...")
-    logger.info("="*60)
\ No newline at end of file
+    logger.info("="*60)
+    await stop_reply_workers()
+    await ingestion_jobs.shutdown()
+    # After the reply workers, so turns they logged while draining are flushed too
+    await stop_conversation_log()
+    shutdown_cpu_executor()
\ No newline at end of file
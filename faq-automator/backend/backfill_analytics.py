@@ -0,0 +1,59 @@
+# backend/backfill_analytics.py
+#
+# One-off job that builds the pre-aggregated analytics counters from the
+# conversations already stored in Firestore. New conversations update the
+# counters incrementally, so this only needs to run once (per business) after
+# deploying incremental analytics. Counters are overwritten, not incremented,
+# so re-running it is safe; run it while the business has no live traffic.
+#
+# Usage (from the faq-automator directory):
+#     python -m backend.backfill_analytics [--business-id business_01]
+
+import argparse
+from collections import defaultdict
+from typing import Dict, Optional
+
+from backend.analytics import AnalyticsDelta
+from backend.firebase_client import DB
+
+# Records summarised exactly before being folded into the sketches; bounds memory
+FOLD_EVERY = 5000
+
+
+def backfill(business_id: Optional[str] = None) -> Dict[str, int]:
+    """Rebuilds analytics counters for one business (or all). Returns queries counted per business."""
+    query = DB.collection('conversations')
+    if business_id:
+        query = query.where(field_path='business_id', op_string='==', value=business_id)
+
+    counters: Dict[str, dict] = defaultdict(dict)
+    deltas: Dict[str, AnalyticsDelta] = defaultdict(AnalyticsDelta)
+    for doc in query.stream():
+        record = doc.to_dict()
+        bid = record.get('business_id') or 'unknown'
+        deltas[bid].add(record)
+        if deltas[bid].total_queries >= FOLD_EVERY:
+            deltas.pop(bid).merge_into(counters[bid])
+    for bid, delta in deltas.items():
+        delta.merge_into(counters[bid])
+
+    for bid, doc in counters.items():
+        analytics_ref = DB.collection('analytics').document(bid)
+        analytics_ref.set({"business_id": bid, **doc})
+        print(f"Backfilled analytics for {bid}: {doc['total_queries']} queries.")
+
+    return {bid: doc["total_queries"] for bid, doc in counters.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build analytics counters from existing conversations.")
+    parser.add_argument("--business-id", help="Only backfill this business (default: all)")
+    args = parser.parse_args()
+
+    if DB is None:
+        print("ERROR: Firestore is not initialized; check FIREBASE_CREDENTIALS_PATH.")
+    else:
+        result = backfill(args.business_id)
+        print("\n--- Backfill Complete ---")
+        print(result)
+        print("-------------------------")
@@ -0,0 +1,109 @@
+# backend/chunk_store.py
+#
+# Compact, memory-mapped storage of a business's chunk texts, replacing the
+# pickled lists. One file, data/chunks/{business_id}_chunks.bin:
+#
+#   [UTF-8 text of every chunk, back to back]
+#   [uint64 offsets, num_chunks + 1; chunk i is blob[offsets[i]:offsets[i + 1]]]
+#   [uint64 num_chunks][8-byte magic]
+#
+# The offsets come after the texts so the file can be written in one pass as
+# batches arrive. Readers map the file and decode only the chunks they return;
+# every process mapping the same file shares its pages through the page cache.
+
+import mmap
+import pickle
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Sequence
+
+import numpy as np
+
+MAGIC = b"FAQCHNK1"
+TRAILER = struct.Struct("<Q8s")  # num_chunks, magic
+
+
+def chunk_store_file(chunks_dir: Path, business_id: str) -> Path:
+    return Path(chunks_dir) / f"{business_id}_chunks.bin"
+
+
+def legacy_chunks_file(chunks_dir: Path, business_id: str) -> Path:
+    return Path(chunks_dir) / f"{business_id}_chunks.pkl"
+
+
+def read_pickled_chunks(chunks_file: Path) -> List[str]:
+    """Reads a legacy .pkl chunk file: one pickled list per ingestion batch (older files: a single list)."""
+    chunks: List[str] = []
+    with open(chunks_file, "rb") as f:
+        while True:
+            try:
+                chunks.extend(pickle.load(f))
+            except EOFError:
+                return chunks
+
+
+class ChunkStoreWriter:
+    """Writes a chunk store batch by batch; only the offsets (8 bytes per chunk) are kept in memory."""
+
+    def __init__(self, out: BinaryIO):
+        self._out = out
+        self._offsets: List[int] = [0]
+
+    def add(self, chunks: Iterable[str]):
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            self._out.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def finish(self):
+        """Writes the offsets and trailer. The caller closes the file."""
+        np.asarray(self._offsets, dtype="<u8").tofile(self._out)
+        self._out.write(TRAILER.pack(len(self), MAGIC))
+
+
+def write_chunk_store(path: Path, chunks: Iterable[str]):
+    with open(path, "wb") as out:
+        writer = ChunkStoreWriter(out)
+        writer.add(chunks)
+        writer.finish()
+
+
+class ChunkStore(Sequence[str]):
+    """
+    Read-only, memory-mapped chunk texts. store[i] decodes just that chunk.
+
+    The mapping stays valid after the file is replaced (the old inode lives on
+    until it's unmapped), so a loaded store always matches the index it was loaded with.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            size = f.seek(0, 2)
+            if size < TRAILER.size:
+                raise ValueError(f"Not a chunk store: {path}")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        num_chunks, magic = TRAILER.unpack_from(self._map, size - TRAILER.size)
+        offsets_start = size - TRAILER.size - 8 * (num_chunks + 1)
+        if magic != MAGIC or offsets_start < 0:
+            raise ValueError(f"Not a chunk store: {path}")
+        self._offsets = np.frombuffer(self._map, dtype="<u8", count=num_chunks + 1, offset=offsets_start)
+        self._num_chunks = num_chunks
+
+    def __len__(self) -> int:
+        return self._num_chunks
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += self._num_chunks
+        if not 0 <= i < self._num_chunks:
+            raise IndexError("chunk index out of range")
+        return self._map[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    @property
+    def offsets_nbytes(self) -> int:
+        return self._offsets.nbytes
@@ -16,6 +16,125 @@ class Settings(BaseSettings):
     # If not set, endpoint protection is disabled
     API_KEY: Optional[str] = None
 
+    # --- RETRIEVAL INDEX CACHE ---
+    # Approximate memory budget for loaded FAISS indexes and chunk lists (all businesses)
+    INDEX_CACHE_MAX_MB: int = 512
+    # Hash the index/chunk files when their mtime changes in place, so an untouched-content
+    # rewrite doesn't force a reload. Off by default: ingestion publishes new, immutable
+    # version directories, so files never change in place
+    INDEX_CACHE_VERIFY_HASH: bool = False
+    # Open FAISS indexes memory-mapped and read-only, so uvicorn workers share one copy
+    # in the OS page cache instead of each loading its own
+    INDEX_MMAP: bool = True
+    # Published index versions kept per business after a re-index (the current one always
+    # is); older ones are deleted once queries have moved to the new version
+    INDEX_VERSIONS_KEEP: int = 2
+
+    # --- EMBEDDINGS ---
+    # One model instance is shared by PDF ingestion and query retrieval
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 32
+    # Torch intra-op threads for encoding (None = library default)
+    EMBEDDING_NUM_THREADS: Optional[int] = None
+    # Query-side micro-batching: concurrent queries are encoded together once
+    # either limit is reached
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+
+    # --- LLM CALLS ---
+    # Maximum Gemini calls in flight per worker, and the per-call timeout
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TIMEOUT_SECONDS: float = 30.0
+
+    # --- SEMANTIC ANSWER CACHE ---
+    # Answers are reused for queries of the same business whose embeddings are at
+    # least this cosine-similar to an already answered one
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.92
+    ANSWER_CACHE_MAX_ENTRIES: int = 256  # Per business
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+
+    # --- CONVERSATION MEMORY ---
+    # "memory" (per process) or "sqlite" (shared by all workers on the host)
+    CONVERSATION_STORE_BACKEND: str = "memory"
+    CONVERSATION_SQLITE_PATH: str = "data/conversations.db"
+    CONVERSATION_MAX_TURNS: int = 10  # Per sender
+    CONVERSATION_IDLE_TTL_SECONDS: float = 86400.0
+    CONVERSATION_MAX_MEMORY_MB: int = 64  # In-memory backend only
+
+    # --- PROMPT ASSEMBLY ---
+    # Estimated-token budget for the whole prompt. The latest turns are kept verbatim,
+    # older ones compacted/dropped, and retrieved chunks fill what's left by score.
+    PROMPT_TOKEN_BUDGET: int = 3000
+    PROMPT_RECENT_TURNS: int = 3
+    PROMPT_HISTORY_SHARE: float = 0.4
+    PROMPT_COMPACT_CHARS: int = 200
+
+    # --- CONVERSATION LOGGING ---
+    # Turns are written to Firestore in batches by a background flusher ("local" writes
+    # JSON lines to CONVERSATION_LOG_LOCAL_PATH instead). If a write fails, records
+    # spill to CONVERSATION_LOG_SPILL_PATH and are replayed on the next startup.
+    CONVERSATION_LOG_BACKEND: str = "firestore"
+    CONVERSATION_LOG_LOCAL_PATH: str = "data/conversations.jsonl"
+    CONVERSATION_LOG_SPILL_PATH: str = "data/conversation_spill.jsonl"
+    CONVERSATION_LOG_BATCH_SIZE: int = 100
+    CONVERSATION_LOG_FLUSH_SECONDS: float = 2.0
+    CONVERSATION_LOG_MAX_BUFFERED: int = 10000
+
+    # --- WORKER POOL ---
+    # Threads for CPU-bound work (embedding, FAISS search) kept off the event loop
+    CPU_WORKER_THREADS: int = 4
+
+    # --- PDF INGESTION JOBS ---
+    # Uploads are streamed to disk and rejected (413) once they pass this size
+    MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024
+    # Uploads are processed in a pool of INGESTION_MAX_CONCURRENT processes; at most
+    # INGESTION_MAX_PENDING jobs (queued + running) are accepted per API worker
+    INGESTION_MAX_CONCURRENT: int = 2
+    INGESTION_MAX_PENDING: int = 20
+    INGESTION_JOBS_DIR: str = "data/jobs"
+    INGESTION_JOB_RETENTION_SECONDS: float = 7 * 86400
+    # Text extraction fans out across this many processes (default: CPU count) for
+    # PDFs with at least PDF_PARALLEL_MIN_PAGES pages; smaller ones run serially
+    PDF_EXTRACT_WORKERS: Optional[int] = None
+    PDF_PARALLEL_MIN_PAGES: int = 32
+    # Ingestion embeds and indexes this many chunks at a time; bounds its peak memory
+    PDF_EMBED_BATCH_SIZE: int = 256
+
+    # --- ANN INDEX SELECTION ---
+    # "auto" picks by chunk count: exact flat index up to ANN_FLAT_MAX_VECTORS, IVF from
+    # ANN_IVF_MIN_VECTORS, HNSW in between (no band by default: IVF measured better
+    # recall per ms and faster builds, see benchmarks/bench_ann_index.py).
+    # "flat", "hnsw" or "ivf" force a type.
+    ANN_INDEX_TYPE: str = "auto"
+    ANN_FLAT_MAX_VECTORS: int = 20_000
+    ANN_IVF_MIN_VECTORS: int = 20_000
+    ANN_HNSW_M: int = 32
+    ANN_HNSW_EF_CONSTRUCTION: int = 80
+    ANN_IVF_NLIST: Optional[int] = None  # Default: about 4 * sqrt(num_chunks)
+    # Search-time recall/latency knobs (higher: better recall, slower queries)
+    ANN_HNSW_EF_SEARCH: int = 128
+    ANN_IVF_NPROBE: int = 16
+    # Compressed vector storage in the index: "none", "sq8" (int8, 4x smaller) or
+    # "pq" (ANN_PQ_SUBQUANTIZERS bytes per vector; must divide the dimension).
+    # Quantized indexes fetch top_k x ANN_RERANK_FACTOR candidates and re-score them
+    # exactly from the on-disk float32 vectors (1 disables re-scoring).
+    ANN_QUANTIZATION: str = "none"
+    ANN_PQ_SUBQUANTIZERS: int = 48
+    ANN_RERANK_FACTOR: int = 10
+
+    # --- WEBHOOK REPLY MODE ---
+    # If enabled, the webhook acknowledges with an empty TwiML response immediately and
+    # the reply is sent later by a worker through the outbound messaging client
+    WHATSAPP_ASYNC_REPLY: bool = False
+    OUTBOUND_MESSAGING_BACKEND: str = "twilio"  # "twilio" or "fake"
+    TWILIO_WHATSAPP_NUMBER: Optional[str] = None  # e.g. "whatsapp:+14155238886"
+    REPLY_WORKERS: int = 4
+    REPLY_QUEUE_MAX_SIZE: int = 1000
+    # Twilio retries are deduplicated by MessageSid for this long
+    WEBHOOK_DEDUPE_TTL_SECONDS: float = 600.0
+    WEBHOOK_DEDUPE_MAX_ENTRIES: int = 10000
+
     class Config:
         env_file = ".env"
         env_file_encoding = 'utf-8'
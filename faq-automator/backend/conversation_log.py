@@ -0,0 +1,292 @@
+# backend/conversation_log.py
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+from backend.analytics import AnalyticsDelta, aggregate_by_business
+from backend.metrics import METRICS
+
+
+class ConversationSink:
+    """
+    Storage client for conversation records and the per-business analytics
+    counters derived from them. Both methods are blocking.
+    """
+
+    def write_batch(self, records: List[dict]):
+        raise NotImplementedError
+
+    def read_analytics(self, business_id: str) -> Optional[dict]:
+        """Returns the stored counters doc for a business (see format_analytics), or None."""
+        raise NotImplementedError
+
+
+class FirestoreConversationSink(ConversationSink):
+    """
+    Writes records to the 'conversations' collection and keeps one
+    pre-aggregated doc per business up to date:
+
+        analytics/{business_id}   total_queries, query_type_counts, daily_counts  (atomic increments)
+                                  sketches.top_queries, sketches.unique_users     (merged)
+
+    Each business's records and its counters are written in one transaction, and
+    a record's doc id is its record_id. Writing a batch again (a spill replayed
+    after a failure that may have been committed after all) therefore skips the
+    records already stored and never counts them twice.
+
+    The sketches are a few KB regardless of traffic, so the doc stays well under
+    Firestore's 1 MiB limit, and concurrent workers merge into it safely.
+    """
+
+    MAX_BATCH_WRITES = 500  # Firestore's per-batch (and per-transaction) limit
+
+    def __init__(self, db, collection: str = "conversations", analytics_collection: str = "analytics"):
+        self.db = db
+        self.collection = collection
+        self.analytics_collection = analytics_collection
+
+    def write_batch(self, records: List[dict]):
+        by_business: Dict[str, List[dict]] = {}
+        for record in records:
+            by_business.setdefault(record.get("business_id") or "unknown", []).append(record)
+        # One write per record plus the analytics doc per transaction
+        step = self.MAX_BATCH_WRITES - 1
+        for business_id, business_records in by_business.items():
+            for start in range(0, len(business_records), step):
+                self._write_business_records(business_id, business_records[start:start + step])
+
+    def _write_business_records(self, business_id: str, records: List[dict]):
+        from google.cloud import firestore
+
+        conversations_ref = self.db.collection(self.collection)
+        doc_refs = [conversations_ref.document(record.get("record_id") or None) for record in records]
+        analytics_ref = self.db.collection(self.analytics_collection).document(business_id)
+
+        @firestore.transactional
+        def write(transaction):
+            # Retried by Firestore if another worker updated the doc meanwhile.
+            # All reads come before the writes, as transactions require.
+            snapshot = analytics_ref.get(transaction=transaction)
+            stored = snapshot.to_dict() if snapshot.exists else {}
+            existing = {doc.id for doc in self.db.get_all(doc_refs, transaction=transaction) if doc.exists}
+            delta = AnalyticsDelta()
+            for doc_ref, record in zip(doc_refs, records):
+                if doc_ref.id not in existing:
+                    transaction.set(doc_ref, record)
+                    delta.add(record)
+            if not delta.total_queries:
+                return
+            transaction.set(analytics_ref, {
+                "business_id": business_id,
+                "total_queries": firestore.Increment(delta.total_queries),
+                "query_type_counts": {k: firestore.Increment(v) for k, v in delta.query_type_counts.items()},
+                "daily_counts": {k: firestore.Increment(v) for k, v in delta.daily_counts.items()},
+                "sketches": delta.merge_sketches(stored.get("sketches")),
+            }, merge=True)
+
+        write(self.db.transaction())
+
+    def read_analytics(self, business_id: str) -> Optional[dict]:
+        snapshot = self.db.collection(self.analytics_collection).document(business_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+
+class LocalConversationSink(ConversationSink):
+    """
+    A local stand-in for Firestore: appends records to a JSON-lines file (or just
+    keeps them in memory). `latency_seconds` simulates a network round-trip per
+    write call, which makes offline benchmarks meaningful.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency_seconds: float = 0.0):
+        self.path = Path(path) if path else None
+        self.latency_seconds = latency_seconds
+        self.records: List[dict] = []
+        self.analytics: Dict[str, dict] = {}
+        self.write_calls = 0
+        self._lock = threading.Lock()
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write_batch(self, records: List[dict]):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        self.write_calls += 1
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+        else:
+            self.records.extend(records)
+        with self._lock:
+            for business_id, delta in aggregate_by_business(records).items():
+                delta.merge_into(self.analytics.setdefault(business_id, {}))
+
+    def read_analytics(self, business_id: str) -> Optional[dict]:
+        with self._lock:
+            counters = self.analytics.get(business_id)
+            return dict(counters) if counters is not None else None
+
+
+def _to_json(record: dict) -> str:
+    return json.dumps({k: v.isoformat() if isinstance(v, datetime) else v for k, v in record.items()})
+
+
+def _from_json(line: str) -> dict:
+    record = json.loads(line)
+    if isinstance(record.get("timestamp"), str):
+        record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+    return record
+
+
+class WriteBehindBuffer:
+    """
+    Buffers conversation records and writes them to the sink in batches.
+
+    A batch is flushed when `max_batch_size` records are waiting or every
+    `flush_interval` seconds. At most `max_buffered` records are held in memory;
+    beyond that (and whenever the sink fails) records spill to a local JSON-lines
+    file, which is replayed on the next start. `stop()` flushes everything left,
+    spilling whatever the sink doesn't accept.
+    """
+
+    def __init__(self, sink: ConversationSink, spill_path: str, max_batch_size: int = 100,
+                 flush_interval: float = 2.0, max_buffered: int = 10000):
+        self.sink = sink
+        self.spill_path = Path(spill_path)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._buffer: Deque[dict] = deque()
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.spilled = 0
+
+    def add(self, record: dict):
+        """Queues a record without blocking. Never raises."""
+        # Stable across retries and replays, so sinks can store each record once
+        record.setdefault("record_id", uuid.uuid4().hex)
+        overflow = None
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) > self.max_buffered:
+                overflow = [self._buffer.popleft() for _ in range(len(self._buffer) - self.max_buffered)]
+            ready = len(self._buffer) >= self.max_batch_size
+        if overflow:
+            self._spill(overflow)
+        if ready and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await self.replay_spill()
+
+    async def stop(self):
+        """Stops the flusher and writes out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._buffer:
+            if not await self.flush():
+                # The sink is down: spill the rest now, there is no later flush to retry it
+                with self._lock:
+                    remaining = list(self._buffer)
+                    self._buffer.clear()
+                if remaining:
+                    self._spill(remaining)
+                break
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer:
+                if not await self.flush() or len(self._buffer) < self.max_batch_size:
+                    break
+
+    async def flush(self) -> bool:
+        """Writes up to one batch. Returns False if the sink failed (the batch is spilled)."""
+        with self._lock:
+            batch = [self._buffer.popleft() for _ in range(min(self.max_batch_size, len(self._buffer)))]
+        if not batch:
+            return True
+
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.sink.write_batch, batch)
+        except Exception as e:
+            self.failed_flushes += 1
+            print(f"Error writing {len(batch)} conversation records, spilling to {self.spill_path}: {e}")
+            self._spill(batch)
+            return False
+
+        self.flushes += 1
+        self.written += len(batch)
+        METRICS.observe("conversation_log.flush_seconds", time.perf_counter() - start)
+        METRICS.observe("conversation_log.batch_size", len(batch), buckets=(1, 5, 10, 25, 50, 100, 250, 500))
+        return True
+
+    async def replay_spill(self):
+        """Re-sends records spilled by an earlier failure or shutdown, if any."""
+        replay_path = self.spill_path.with_suffix(".replaying")
+        # A replay that crashed part-way leaves its file behind: finish it first, so the
+        # newer spill doesn't overwrite it. Records it already wrote are skipped by record_id
+        if replay_path.exists() and not await self._replay_file(replay_path):
+            return
+        if self.spill_path.exists():
+            self.spill_path.replace(replay_path)
+            await self._replay_file(replay_path)
+
+    async def _replay_file(self, replay_path: Path) -> bool:
+        """Writes a spill file's records to the sink; any it can't write are spilled again. True if all were written."""
+        with open(replay_path, encoding="utf-8") as f:
+            records = [_from_json(line) for line in f if line.strip()]
+        print(f"Replaying {len(records)} spilled conversation records.")
+        replayed = True
+        for start in range(0, len(records), self.max_batch_size):
+            batch = records[start:start + self.max_batch_size]
+            try:
+                await asyncio.to_thread(self.sink.write_batch, batch)
+                self.written += len(batch)
+            except Exception as e:
+                print(f"Replay failed, keeping records spilled: {e}")
+                self._spill(records[start:])
+                replayed = False
+                break
+        replay_path.unlink()
+        return replayed
+
+    def _spill(self, records: List[dict]):
+        self.spilled += len(records)
+        METRICS.incr("conversation_log.spilled", len(records))
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(_to_json(record) + "\n")
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "spilled": self.spilled,
+        }
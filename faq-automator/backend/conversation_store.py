@@ -0,0 +1,183 @@
+# backend/conversation_store.py
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Deque, List, Tuple
+
+# A stored message is (role, content), where role is "human" or "ai"
+Message = Tuple[str, str]
+
+
+class ConversationStore:
+    """Interface for per-sender conversation memory."""
+
+    def get_history(self, sender_id: str) -> List[Message]:
+        raise NotImplementedError
+
+    def append_turn(self, sender_id: str, user_message: str, ai_message: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+@dataclass
+class _Session:
+    messages: Deque[Message]
+    last_active: float
+    size_bytes: int = 0
+
+
+def _message_size(message: Message) -> int:
+    # Rough resident size: the text plus a fixed per-object overhead
+    return len(message[1]) + 100
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Bounded in-process history store.
+
+    - Each sender keeps at most `max_turns` turns (older messages fall off a deque, O(1)).
+    - Senders idle for longer than `idle_ttl_seconds` are forgotten.
+    - Once the total size exceeds `max_total_bytes`, the least recently active
+      senders are evicted.
+    """
+
+    def __init__(self, max_turns: int = 10, idle_ttl_seconds: float = 86400.0,
+                 max_total_bytes: int = 64 * 1024 * 1024):
+        self.max_messages = max(2, 2 * max_turns)
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_total_bytes = max_total_bytes
+        # Ordered by last activity, so idle and LRU senders are always at the front
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def get_history(self, sender_id: str) -> List[Message]:
+        with self._lock:
+            self._expire_idle(time.monotonic())
+            session = self._sessions.get(sender_id)
+            return list(session.messages) if session else []
+
+    def append_turn(self, sender_id: str, user_message: str, ai_message: str):
+        with self._lock:
+            now = time.monotonic()
+            self._expire_idle(now)
+            session = self._sessions.get(sender_id)
+            if session is None:
+                session = self._sessions[sender_id] = _Session(deque(maxlen=self.max_messages), now)
+            session.last_active = now
+            self._sessions.move_to_end(sender_id)
+
+            for message in (("human", user_message), ("ai", ai_message)):
+                if len(session.messages) == self.max_messages:
+                    dropped = _message_size(session.messages[0])
+                    session.size_bytes -= dropped
+                    self._total_bytes -= dropped
+                session.messages.append(message)
+                session.size_bytes += _message_size(message)
+                self._total_bytes += _message_size(message)
+
+            # Evict the least recently active senders, but never the one we just wrote
+            while self._total_bytes > self.max_total_bytes and len(self._sessions) > 1:
+                _, evicted = self._sessions.popitem(last=False)
+                self._total_bytes -= evicted.size_bytes
+                self.evicted += 1
+
+    def _expire_idle(self, now: float):
+        while self._sessions:
+            sender_id, session = next(iter(self._sessions.items()))
+            if now - session.last_active <= self.idle_ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._total_bytes -= session.size_bytes
+            self.expired += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "senders": len(self._sessions),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_total_bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    History in a local SQLite file, so several uvicorn workers on one host share it.
+    Same limits as the in-memory store: max turns per sender and idle TTL.
+    """
+
+    def __init__(self, db_path: str, max_turns: int = 10, idle_ttl_seconds: float = 86400.0,
+                 cleanup_every: int = 500):
+        self.db_path = db_path
+        self.max_messages = max(2, 2 * max_turns)
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.cleanup_every = cleanup_every
+        self._appends = 0
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " sender_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender_id, id)")
+        self._conn.commit()
+
+    def get_history(self, sender_id: str) -> List[Message]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, created_at FROM messages WHERE sender_id = ? ORDER BY id DESC LIMIT ?",
+                (sender_id, self.max_messages),
+            ).fetchall()
+        if not rows or time.time() - rows[0][2] > self.idle_ttl_seconds:
+            return []
+        return [(role, content) for role, content, _ in reversed(rows)]
+
+    def append_turn(self, sender_id: str, user_message: str, ai_message: str):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO messages (sender_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(sender_id, "human", user_message, now), (sender_id, "ai", ai_message, now)],
+            )
+            # Keep only this sender's most recent messages
+            self._conn.execute(
+                "DELETE FROM messages WHERE sender_id = ? AND id NOT IN "
+                "(SELECT id FROM messages WHERE sender_id = ? ORDER BY id DESC LIMIT ?)",
+                (sender_id, sender_id, self.max_messages),
+            )
+            self._appends += 1
+            if self._appends % self.cleanup_every == 0:
+                self._conn.execute("DELETE FROM messages WHERE created_at < ?", (now - self.idle_ttl_seconds,))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            messages, senders = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sender_id) FROM messages"
+            ).fetchone()
+        return {"backend": "sqlite", "senders": senders, "messages": messages}
+
+
+def create_conversation_store(backend: str, max_turns: int, idle_ttl_seconds: float,
+                              max_total_bytes: int, sqlite_path: str) -> ConversationStore:
+    """Builds the configured store ('memory' or 'sqlite')."""
+    if backend == "memory":
+        return InMemoryConversationStore(max_turns, idle_ttl_seconds, max_total_bytes)
+    if backend == "sqlite":
+        return SQLiteConversationStore(sqlite_path, max_turns, idle_ttl_seconds)
+    raise ValueError(f"Unknown conversation store backend: {backend}")
@@ -0,0 +1,102 @@
+# backend/embedding_batcher.py
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.metrics import METRICS
+
+EncodeFn = Callable[[Sequence[str]], np.ndarray]
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collects query texts from concurrent requests and encodes them as one batch.
+
+    A batch is flushed when `max_batch_size` queries are waiting or when the
+    oldest waiting query has waited `max_wait_ms`, whichever comes first. The
+    encode itself runs off the event loop, on the executor returned by
+    `get_executor` (looked up per batch, so a pool that was shut down and
+    recreated is picked up), and every caller gets back its own row.
+    """
+
+    def __init__(
+        self,
+        encode_fn: EncodeFn,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        get_executor: Optional[Callable[[], Executor]] = None,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.get_executor = get_executor
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight = set()  # Strong references so encode tasks aren't garbage-collected
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.max_observed_batch = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Returns the embedding of a single query text (1-D float32 array)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._encode_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _encode_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        loop = asyncio.get_running_loop()
+        texts = [text for text, _, _ in batch]
+        flushed_at = time.perf_counter()
+        try:
+            executor = self.get_executor() if self.get_executor is not None else None
+            embeddings = await loop.run_in_executor(executor, self.encode_fn, texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for row, (_, future, enqueued_at) in enumerate(batch):
+            if not future.done():
+                future.set_result(embeddings[row])
+            METRICS.observe("embedding.batch_wait_seconds", flushed_at - enqueued_at)
+
+        METRICS.observe("embedding.batch_size", len(batch), buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+        with self._stats_lock:
+            self.batches += 1
+            self.queries += len(batch)
+            self.max_observed_batch = max(self.max_observed_batch, len(batch))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+                "max_batch_size_seen": self.max_observed_batch,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
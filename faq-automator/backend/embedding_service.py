@@ -0,0 +1,113 @@
+# backend/embedding_service.py
+
+import threading
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from backend.config import settings
+from backend.metrics import METRICS
+
+
+class EmbeddingService:
+    """
+    The single, process-wide owner of the sentence-embedding model.
+
+    Both PDF ingestion and query retrieval encode through this service, so a
+    worker only ever holds one copy of the model. The model is loaded lazily on
+    first use, which keeps imports (and worker startup) fast.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32, num_threads: Optional[int] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.load_seconds = 0.0
+        self.encode_calls = 0
+        self.texts_encoded = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _load_model(self):
+        # Imported here so modules that only need the service don't pay for torch at import time
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+
+        print(f"Loading embedding model '{self.model_name}'...")
+        start = time.perf_counter()
+        model = SentenceTransformer(self.model_name)
+        self.load_seconds = time.perf_counter() - start
+        print(f"Embedding model loaded in {self.load_seconds:.2f}s.")
+        return model
+
+    def encode(self, texts: Sequence[str], batch_size: Optional[int] = None, normalize: bool = True) -> np.ndarray:
+        """
+        Encodes texts into a float32 matrix of shape (len(texts), dimension).
+
+        Args:
+            texts: The texts to embed.
+            batch_size: Overrides the configured encode batch size.
+            normalize: L2-normalize the rows, as required by our Inner Product indexes.
+
+        Returns:
+            np.ndarray: The embedding matrix.
+        """
+        model = self.model
+        start = time.perf_counter()
+        embeddings = model.encode(
+            list(texts),
+            batch_size=batch_size or self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        embeddings = np.asarray(embeddings, dtype="float32")
+        if normalize and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.encode_calls += 1
+            self.texts_encoded += len(texts)
+            self.encode_seconds += elapsed
+        METRICS.observe("embedding.encode_seconds", elapsed)
+        return embeddings
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "loaded": self._model is not None,
+                "load_seconds": self.load_seconds,
+                "encode_calls": self.encode_calls,
+                "texts_encoded": self.texts_encoded,
+                "encode_seconds": self.encode_seconds,
+                "avg_seconds_per_text": self.encode_seconds / self.texts_encoded if self.texts_encoded else 0.0,
+            }
+
+
+# One shared instance per process
+EMBEDDING_SERVICE = EmbeddingService(
+    model_name=settings.EMBEDDING_MODEL_NAME,
+    batch_size=settings.EMBEDDING_BATCH_SIZE,
+    num_threads=settings.EMBEDDING_NUM_THREADS,
+)
+METRICS.register_collector("embedding", EMBEDDING_SERVICE.stats)
@@ -3,9 +3,13 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 from datetime import datetime
-from collections import Counter
+from typing import Optional
+import asyncio
 
 from backend.config import settings
+from backend.conversation_log import FirestoreConversationSink, LocalConversationSink, WriteBehindBuffer
+from backend.metrics import METRICS
+from backend.analytics import format_analytics
 
 DB = None
 
@@ -23,16 +27,40 @@ except Exception as e:
 
 # --- 2. CONVERSATION FUNCTIONS ---
 
+# Conversation turns are buffered and written in batches in the background, so the
+# webhook never waits on a Firestore round-trip. The sink can be swapped for a local file.
+if settings.CONVERSATION_LOG_BACKEND == "local":
+    _conversation_sink = LocalConversationSink(settings.CONVERSATION_LOG_LOCAL_PATH)
+elif DB:
+    _conversation_sink = FirestoreConversationSink(DB)
+else:
+    _conversation_sink = None
+
+CONVERSATION_BUFFER = None
+if _conversation_sink is not None:
+    CONVERSATION_BUFFER = WriteBehindBuffer(
+        _conversation_sink,
+        spill_path=settings.CONVERSATION_LOG_SPILL_PATH,
+        max_batch_size=settings.CONVERSATION_LOG_BATCH_SIZE,
+        flush_interval=settings.CONVERSATION_LOG_FLUSH_SECONDS,
+        max_buffered=settings.CONVERSATION_LOG_MAX_BUFFERED,
+    )
+    METRICS.register_collector("conversation_log", CONVERSATION_BUFFER.stats)
+
+async def start_conversation_log():
+    if CONVERSATION_BUFFER is not None:
+        await CONVERSATION_BUFFER.start()
+
+async def stop_conversation_log():
+    """Flushes buffered conversation turns. Call on shutdown."""
+    if CONVERSATION_BUFFER is not None:
+        await CONVERSATION_BUFFER.stop()
+
 async def store_conversation(conversation_data: dict):
-    """Stores a single conversation turn in the 'conversations' collection."""
-    if not DB: return
-    try:
-        conversations_ref = DB.collection('conversations')
-        conversation_data['timestamp'] = datetime.now()
-        conversations_ref.add(conversation_data)
-        print(f"Successfully stored conversation for user: {conversation_data.get('user_id')}")
-    except Exception as e:
-        print(f"Error storing conversation in Firestore: {e}")
+    """Queues a single conversation turn for the 'conversations' collection."""
+    if CONVERSATION_BUFFER is None: return
+    conversation_data['timestamp'] = datetime.now()
+    CONVERSATION_BUFFER.add(conversation_data)
 
 async def get_conversations(business_id: str, limit: int = 50) -> list:
     """Fetches the last N conversations for a given business from Firestore."""
@@ -60,42 +88,34 @@ async def get_business_by_id(business_id: str) -> dict:
         return docs[0].to_dict()
     return {}
 
-async def update_business_paths(business_id: str, pdf_path: str, faiss_path: str):
-    """Updates a business document with new file paths."""
+async def update_business_paths(business_id: str, pdf_path: str, faiss_path: str, pdf_sha256: Optional[str] = None):
+    """Updates a business document with new file paths (and the indexed PDF's SHA-256, if given)."""
     if not DB: return
     doc_ref_query = DB.collection('businesses').where('business_id', '==', business_id).limit(1)
     docs = list(doc_ref_query.stream())
     if docs:
         doc_id = docs[0].id
         doc_ref = DB.collection('businesses').document(doc_id)
-        doc_ref.update({'pdf_url': pdf_path, 'faiss_index_path': faiss_path})
+        update = {'pdf_url': pdf_path, 'faiss_index_path': faiss_path}
+        if pdf_sha256:
+            update['pdf_sha256'] = pdf_sha256
+        doc_ref.update(update)
         print(f"Updated paths for business {business_id}")
 
 # --- 4. ANALYTICS FUNCTIONS ---
 
 async def get_analytics_data(business_id: str) -> dict:
-    """Fetches all conversations for a business and computes analytics."""
-    if not DB: return {}
+    """
+    Reads a business's pre-aggregated analytics counters. They are kept up to date
+    incrementally as conversations are written (see backend/conversation_log.py),
+    so this is O(1) instead of a scan over every conversation. Top queries and
+    unique users come from small streaming sketches and are approximate.
+    Use backend/backfill_analytics.py once to build counters for older data.
+    """
+    if _conversation_sink is None: return {}
     try:
-        conversations_ref = DB.collection('conversations')
-        query = conversations_ref.where(field_path='business_id', op_string='==', value=business_id)
-        docs = query.stream()
-        conversations = [doc.to_dict() for doc in docs]
-
-        if not conversations:
-            return {"total_queries": 0, "query_type_counts": {}, "top_queries": []}
-
-        total_queries = len(conversations)
-        query_type_counts = Counter(conv.get('query_type', 'unknown') for conv in conversations)
-        top_queries = Counter(
-            conv.get('query', '').lower().strip() for conv in conversations
-        ).most_common(10)
-
-        return {
-            "total_queries": total_queries,
-            "query_type_counts": dict(query_type_counts),
-            "top_queries": [{"query": q, "count": c} for q, c in top_queries]
-        }
+        counters = await asyncio.to_thread(_conversation_sink.read_analytics, business_id)
+        return format_analytics(counters)
     except Exception as e:
         print(f"Error fetching analytics data: {e}")
-        return {}
\ No newline at end of file
+        return {}
@@ -0,0 +1,122 @@
+# backend/idempotency.py
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from backend.metrics import METRICS
+
+T = TypeVar("T")
+
+
+class IdempotencyCache:
+    """
+    Deduplicates work keyed by an idempotency key (Twilio's MessageSid).
+
+    - `run()` executes the work once per key: a duplicate arriving while the
+      first attempt is still running awaits that attempt's result, and one
+      arriving afterwards (within the TTL) gets the cached result.
+    - `claim()` is for fire-and-forget flows: it returns True only for the
+      first sighting of a key within the TTL. `release()` undoes a claim whose
+      work could not be handed off.
+
+    Failures are not cached, so a retry after an error runs the work again.
+    Neither are results rejected by run()'s `cache_if`, e.g. fallback replies
+    sent because the real work failed.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._results: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, result)
+        self._claims: "OrderedDict[Hashable, float]" = OrderedDict()  # key -> expires_at
+        self.executed = 0
+        self.joined_inflight = 0
+        self.served_cached = 0
+        self.dropped_claims = 0
+
+    async def run(self, key: Optional[Hashable], func: Callable[[], Awaitable[T]],
+                  cache_if: Optional[Callable[[T], bool]] = None) -> T:
+        if key is None:
+            return await func()
+
+        now = time.monotonic()
+        self._purge(self._results, now, lambda item: item[0])
+
+        cached = self._results.get(key)
+        if cached is not None:
+            self.served_cached += 1
+            METRICS.incr("idempotency.served_cached")
+            return cached[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.joined_inflight += 1
+            METRICS.incr("idempotency.joined_inflight")
+            # Shield so a cancelled duplicate doesn't cancel the original attempt
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executed += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited isn't logged as "never retrieved"
+            future.exception()
+            raise
+        else:
+            # Duplicates already waiting share the result either way
+            future.set_result(result)
+            if cache_if is None or cache_if(result):
+                self._results[key] = (time.monotonic() + self.ttl_seconds, result)
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def claim(self, key: Optional[Hashable]) -> bool:
+        """Returns True the first time `key` is seen within the TTL, False for duplicates."""
+        if key is None:
+            return True
+        now = time.monotonic()
+        self._purge(self._claims, now, lambda expires_at: expires_at)
+        if key in self._claims or key in self._inflight or key in self._results:
+            self.dropped_claims += 1
+            METRICS.incr("idempotency.dropped_duplicates")
+            return False
+        self._claims[key] = now + self.ttl_seconds
+        while len(self._claims) > self.max_entries:
+            self._claims.popitem(last=False)
+        return True
+
+    def release(self, key: Optional[Hashable]):
+        """Forgets a claim whose work was not started, so the key can be handled again."""
+        if key is not None:
+            self._claims.pop(key, None)
+
+    @staticmethod
+    def _purge(entries: OrderedDict, now: float, expires_at: Callable):
+        # Entries are inserted in expiry order, so expired ones are always at the front
+        while entries:
+            key, value = next(iter(entries.items()))
+            if expires_at(value) > now:
+                break
+            entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "joined_inflight": self.joined_inflight,
+            "served_cached": self.served_cached,
+            "dropped_duplicates": self.dropped_claims,
+            "inflight": len(self._inflight),
+            "cached_results": len(self._results),
+        }
@@ -0,0 +1,155 @@
+# backend/index_cache.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional, Sequence, Tuple
+
+# A loader receives the files backing a cache key and returns (value, size_in_bytes).
+Loader = Callable[[Sequence[Path]], Tuple[Any, int]]
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    size_bytes: int
+    paths: Tuple[Path, ...]
+    signature: Tuple
+    content_hash: Optional[str]
+
+
+def file_signature(paths: Sequence[Path]) -> Tuple:
+    """A cheap change detector: (mtime_ns, size) of every backing file."""
+    signature = []
+    for path in paths:
+        stat = path.stat()
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def content_hash(paths: Sequence[Path], block_size: int = 1024 * 1024) -> str:
+    """SHA-256 over the contents of every backing file, in order."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexCache:
+    """
+    An LRU cache of loaded per-business search data (FAISS index + chunks),
+    bounded by an approximate memory budget.
+
+    Entries are validated on every lookup by comparing the backing files'
+    mtime/size signature. When the signature of the same files changes and hash
+    verification is enabled, their contents are hashed: if the hash matches the
+    one taken at the previous change (e.g. the file was only touched or copied
+    over with identical bytes) the entry is kept, otherwise it is reloaded.
+    Files are never hashed on a cold load or when the key's paths change (a new
+    index version), since there is nothing to compare with.
+    """
+
+    def __init__(self, loader: Loader, max_bytes: int, verify_content_hash: bool = False):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.verify_content_hash = verify_content_hash
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, paths: Sequence[Path]) -> Any:
+        """
+        Returns the cached value for `key`, loading it from `paths` on a miss.
+
+        Raises:
+            FileNotFoundError: If one of the backing files does not exist.
+        """
+        paths = tuple(paths)
+        signature = file_signature(paths)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.paths == paths and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+
+        new_hash = None
+        if entry is not None and entry.paths == paths and self.verify_content_hash:
+            new_hash = content_hash(paths)
+            if new_hash == entry.content_hash:
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        entry.signature = signature
+                        self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry.value
+
+        # Load outside the lock so a slow tenant doesn't block lookups for everyone else
+        value, size_bytes = self.loader(paths)
+        new_entry = CacheEntry(
+            value=value,
+            size_bytes=size_bytes,
+            paths=paths,
+            signature=signature,
+            content_hash=new_hash,
+        )
+
+        with self._lock:
+            self.misses += 1
+            if entry is not None:
+                self.invalidations += 1
+            self._remove(key)
+            if size_bytes <= self.max_bytes:
+                self._entries[key] = new_entry
+                self._current_bytes += size_bytes
+                self._evict_to_budget()
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Drops a single entry, e.g. after its index has been rebuilt."""
+        with self._lock:
+            if self._remove(key):
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    # --- Internal helpers (caller must hold the lock) ---
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._current_bytes -= entry.size_bytes
+        return True
+
+    def _evict_to_budget(self):
+        while self._current_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._current_bytes -= evicted.size_bytes
+            self.evictions += 1
@@ -0,0 +1,169 @@
+# backend/index_versions.py
+#
+# Versioned, atomically published index builds. Every ingestion writes a complete
+# set of files into a new directory and then publishes it by replacing a one-line
+# pointer file, so readers see either the old set or the new one, never a mix:
+#
+#   data/faiss_index/{business_id}/
+#       CURRENT                     name of the published version
+#       {version}/                  immutable once published:
+#           {business_id}.index         FAISS index
+#           {business_id}_chunks.bin    chunk store
+#           {business_id}.vectors / .hashes / .meta.json   (see vector_store)
+#       {version}.tmp/              a build in progress
+#
+# File names inside a version match the old flat layout, so vector_store and
+# chunk_store helpers work on a version directory unchanged. Businesses indexed
+# before versioning (flat files in data/faiss_index and data/chunks) are still
+# read until their next upload.
+#
+# Old versions are deleted after each publish, keeping the newest few. Readers
+# that already opened or mapped a deleted version's files keep working (POSIX
+# keeps unlinked files alive while open); a reader that resolved it but hadn't
+# opened it yet simply resolves again.
+
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from backend.chunk_store import chunk_store_file, legacy_chunks_file
+from backend.vector_store import hashes_file, meta_file, vectors_file
+
+POINTER_FILE = "CURRENT"
+STAGING_SUFFIX = ".tmp"
+# Builds still unpublished after this long were abandoned (crashed job) and are removed
+STALE_STAGING_SECONDS = 24 * 3600
+
+
+@dataclass(frozen=True)
+class IndexLocation:
+    """Where one build of a business's index lives. `version` is None for the pre-versioning flat layout."""
+    business_id: str
+    index_dir: Path
+    chunks_dir: Path
+    version: Optional[str] = None
+
+    @property
+    def index_file(self) -> Path:
+        return self.index_dir / f"{self.business_id}.index"
+
+    @property
+    def chunks_file(self) -> Path:
+        chunks_file = chunk_store_file(self.chunks_dir, self.business_id)
+        if self.version is None and not chunks_file.exists():
+            return legacy_chunks_file(self.chunks_dir, self.business_id)
+        return chunks_file
+
+
+def business_dir(index_root: Path, business_id: str) -> Path:
+    return Path(index_root) / business_id
+
+
+def current_version(index_root: Path, business_id: str) -> Optional[str]:
+    try:
+        return (business_dir(index_root, business_id) / POINTER_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def locate(index_root: Path, chunks_root: Path, business_id: str) -> Optional[IndexLocation]:
+    """The business's published index, or its pre-versioning files, or None if it has neither."""
+    legacy = IndexLocation(business_id, Path(index_root), Path(chunks_root))
+    # Checked twice: the first publish writes the pointer before removing the legacy files
+    for check_legacy in (True, False):
+        version = current_version(index_root, business_id)
+        if version is not None:
+            version_dir = business_dir(index_root, business_id) / version
+            return IndexLocation(business_id, version_dir, version_dir, version)
+        if check_legacy and legacy.index_file.exists():
+            return legacy
+    return None
+
+
+def create_staging_dir(index_root: Path, business_id: str) -> Path:
+    """A fresh directory to build the next version in; publish() makes it current."""
+    # Time-ordered names, so the newest versions sort last
+    version = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    staging_dir = business_dir(index_root, business_id) / f"{version}{STAGING_SUFFIX}"
+    staging_dir.mkdir(parents=True)
+    return staging_dir
+
+
+def publish(index_root: Path, chunks_root: Path, business_id: str, staging_dir: Path, keep: int = 2) -> str:
+    """
+    Atomically makes a finished build the current version, then removes old ones.
+
+    Returns:
+        str: The published version's name.
+    """
+    base_dir = business_dir(index_root, business_id)
+    version = staging_dir.name[:-len(STAGING_SUFFIX)]
+    # Every file is on disk before anything points at it, so after a crash CURRENT
+    # names either the old version or a complete new one
+    for path in staging_dir.iterdir():
+        _fsync(path)
+    _fsync(staging_dir)
+    os.rename(staging_dir, base_dir / version)
+    _fsync(base_dir)
+
+    pointer_tmp = base_dir / f"{POINTER_FILE}.{os.getpid()}.tmp"
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, base_dir / POINTER_FILE)
+    _fsync(base_dir)
+
+    _remove_legacy_files(index_root, chunks_root, business_id)
+    collect_garbage(index_root, business_id, keep)
+    return version
+
+
+def list_versions(index_root: Path, business_id: str) -> List[str]:
+    """Published versions, oldest first."""
+    base_dir = business_dir(index_root, business_id)
+    if not base_dir.is_dir():
+        return []
+    return sorted(p.name for p in base_dir.iterdir() if p.is_dir() and not p.name.endswith(STAGING_SUFFIX))
+
+
+def collect_garbage(index_root: Path, business_id: str, keep: int = 2) -> List[str]:
+    """
+    Deletes all but the newest `keep` versions (never the current one), and
+    abandoned builds. Returns the versions deleted.
+    """
+    current = current_version(index_root, business_id)
+    base_dir = business_dir(index_root, business_id)
+    deleted = []
+    for version in list_versions(index_root, business_id)[:-max(keep, 1)]:
+        if version != current:
+            shutil.rmtree(base_dir / version, ignore_errors=True)
+            deleted.append(version)
+    for staging_dir in base_dir.glob(f"*{STAGING_SUFFIX}"):
+        try:
+            if staging_dir.is_dir() and time.time() - staging_dir.stat().st_mtime > STALE_STAGING_SECONDS:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+    return deleted
+
+
+def _fsync(path: Path):
+    # Directories too: their entries (new files, renames) are only durable once synced
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _remove_legacy_files(index_root: Path, chunks_root: Path, business_id: str):
+    # The pre-versioning flat files are superseded by the first published version
+    for path in (Path(index_root) / f"{business_id}.index", vectors_file(index_root, business_id),
+                 hashes_file(index_root, business_id), meta_file(index_root, business_id),
+                 chunk_store_file(chunks_root, business_id), legacy_chunks_file(chunks_root, business_id)):
+        path.unlink(missing_ok=True)
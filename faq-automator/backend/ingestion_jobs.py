@@ -0,0 +1,243 @@
+# backend/ingestion_jobs.py
+#
+# PDF ingestion (extract -> chunk -> embed -> FAISS build) runs as a background
+# job in a process pool, so a large brochure never blocks the API worker.
+#
+# Job status lives in small JSON files under `jobs_dir`: the child process writes
+# progress there directly and any uvicorn worker can answer GET /business/jobs/{id}.
+
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from backend.metrics import METRICS
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+FINISHED_STATUSES = ("succeeded", "failed")
+# Progress updates from the child are written at most this often (stage changes always are)
+PROGRESS_WRITE_INTERVAL = 0.5
+
+
+class IngestionQueueFullError(Exception):
+    """Raised when too many ingestion jobs are already queued or running."""
+    pass
+
+
+# --- 1. STATUS FILES (shared by the API process and the job processes) ---
+
+def _status_path(jobs_dir: str, job_id: str) -> Path:
+    return Path(jobs_dir) / f"{job_id}.json"
+
+
+def read_job_status(jobs_dir: str, job_id: str) -> Optional[dict]:
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(_status_path(jobs_dir, job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def update_job_status(jobs_dir: str, job_id: str, **fields) -> dict:
+    """Merges fields into a job's status file; the write is atomic (tmp file + rename)."""
+    status = read_job_status(jobs_dir, job_id) or {}
+    progress = {**status.get("progress", {}), **fields.pop("progress", {})}
+    status.update(fields, job_id=job_id, progress=progress, updated_at=time.time())
+    path = _status_path(jobs_dir, job_id)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, default=str)
+    os.replace(tmp_path, path)
+    return status
+
+
+# --- 2. JOB BODY (runs in a pool process) ---
+
+def run_ingestion_job(job_id: str, pdf_path: str, business_id: str, jobs_dir: str,
+                      pdf_sha256: Optional[str] = None) -> dict:
+    """Processes one PDF, reporting progress to the job's status file. Returns process_pdf's result."""
+    # Imported here so the API process doesn't pay for it; a pool process imports
+    # it (and loads the embedding model) once and reuses it for later jobs
+    from backend.pdf_processor import process_pdf
+
+    update_job_status(jobs_dir, job_id, status="running", started_at=time.time())
+    last_write = {"at": 0.0, "stage": None}
+
+    def report(counters: dict):
+        now = time.monotonic()
+        if counters.get("stage") == last_write["stage"] and now - last_write["at"] < PROGRESS_WRITE_INTERVAL:
+            return
+        last_write.update(at=now, stage=counters.get("stage"))
+        update_job_status(jobs_dir, job_id, progress=counters)
+
+    return process_pdf(pdf_path, business_id, progress_callback=report, pdf_sha256=pdf_sha256)
+
+
+# --- 3. JOB MANAGER (runs in the API process) ---
+
+class IngestionJobManager:
+    """
+    Queues ingestion jobs on a process pool of `max_concurrent` processes.
+
+    At most `max_pending` jobs (queued + running) are accepted per API process.
+    Jobs for the same business run one at a time in the order they were submitted,
+    so an older upload can never finish last and replace a newer index.
+    Each job reads its own copy of the upload at `pdf_path`, which it deletes when
+    it finishes. When a job succeeds, `on_success(business_id, pdf_path, filename,
+    result)` runs in the API process first, e.g. to keep the PDF (by moving it) and
+    update the business record in Firestore. `job_fn` is what
+    runs in the pool process; it must be a picklable module-level function.
+    """
+
+    def __init__(self, jobs_dir: str, max_concurrent: int = 2, max_pending: int = 20,
+                 retention_seconds: float = 7 * 86400,
+                 on_success: Optional[Callable[[str, str, str, dict], Awaitable[None]]] = None,
+                 job_fn: Callable[..., dict] = run_ingestion_job):
+        self.jobs_dir = jobs_dir
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.on_success = on_success
+        self.job_fn = job_fn
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # (business_id, sha256) -> job_id of pending jobs, so a retried upload joins the running job
+        self._pending_uploads: Dict[Tuple[str, str], str] = {}
+        # business_id -> (lock its jobs take turns on, number of its pending jobs)
+        self._business_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        Path(jobs_dir).mkdir(parents=True, exist_ok=True)
+        self.succeeded = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 'spawn' rather than fork: the API process has threads (CPU pool, Firestore)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_concurrent,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        # A pool whose process died is broken for good; the next job starts a new one.
+        # Other jobs on the same pool fail with it, so only the first one resets it
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, business_id: str, pdf_path: str, filename: str = "",
+                     pdf_sha256: Optional[str] = None) -> dict:
+        """
+        Enqueues a job and returns its initial status. If the same document (by
+        `pdf_sha256`) is already pending for this business, returns that job instead.
+        Raises IngestionQueueFullError if too many jobs are pending.
+
+        The job takes over `pdf_path`, which must be a file no other job uses; it
+        is deleted when the job finishes, or straight away if no job is queued for it.
+        """
+        pending_job_id = self._pending_uploads.get((business_id, pdf_sha256)) if pdf_sha256 else None
+        if pending_job_id is not None:
+            Path(pdf_path).unlink(missing_ok=True)
+            return self.get(pending_job_id)
+        if len(self._tasks) >= self.max_pending:
+            Path(pdf_path).unlink(missing_ok=True)
+            raise IngestionQueueFullError(f"{len(self._tasks)} ingestion jobs already pending")
+        self._prune_old_jobs()
+
+        job_id = uuid.uuid4().hex
+        status = update_job_status(
+            self.jobs_dir, job_id, status="queued", business_id=business_id,
+            filename=filename, pdf_sha256=pdf_sha256, created_at=time.time(),
+        )
+        if pdf_sha256:
+            self._pending_uploads[(business_id, pdf_sha256)] = job_id
+        lock, pending = self._business_locks.get(business_id, (None, 0))
+        self._business_locks[business_id] = (lock or asyncio.Lock(), pending + 1)
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id, business_id, pdf_path, filename, pdf_sha256))
+        METRICS.set_gauge("ingestion.pending", len(self._tasks))
+        return status
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return read_job_status(self.jobs_dir, job_id)
+
+    async def _run(self, job_id: str, business_id: str, pdf_path: str, filename: str,
+                   pdf_sha256: Optional[str]):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        executor = None
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, so a business's jobs publish in submission order
+            async with self._business_locks[business_id][0]:
+                executor = self._get_executor()
+                result = await loop.run_in_executor(
+                    executor, self.job_fn, job_id, pdf_path, business_id, self.jobs_dir, pdf_sha256)
+                if result.get("status") != "success":
+                    raise RuntimeError(result.get("message", "PDF processing failed"))
+                if self.on_success is not None:
+                    await self.on_success(business_id, pdf_path, filename, result)
+            update_job_status(self.jobs_dir, job_id, status="succeeded", result=result,
+                              finished_at=time.time(), progress={"stage": "done"})
+            self.succeeded += 1
+            print(f"Ingestion job {job_id} for {business_id} finished: {result.get('num_chunks')} chunks.")
+        except asyncio.CancelledError:
+            update_job_status(self.jobs_dir, job_id, status="failed", error="Interrupted by shutdown",
+                              finished_at=time.time())
+            raise
+        except BrokenProcessPool as e:
+            self.failed += 1
+            self._discard_executor(executor)
+            print(f"Ingestion job {job_id} for {business_id} failed: worker process died ({e})")
+            update_job_status(self.jobs_dir, job_id, status="failed", error="Worker process died",
+                              finished_at=time.time())
+        except Exception as e:
+            self.failed += 1
+            print(f"Ingestion job {job_id} for {business_id} failed: {e}")
+            update_job_status(self.jobs_dir, job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            Path(pdf_path).unlink(missing_ok=True)
+            self._tasks.pop(job_id, None)
+            self._pending_uploads.pop((business_id, pdf_sha256), None)
+            lock, pending = self._business_locks[business_id]
+            if pending > 1:
+                self._business_locks[business_id] = (lock, pending - 1)
+            else:
+                del self._business_locks[business_id]
+            METRICS.set_gauge("ingestion.pending", len(self._tasks))
+            METRICS.observe("ingestion.job_seconds", time.perf_counter() - start,
+                            buckets=(1, 5, 15, 30, 60, 120, 300, 600))
+
+    def _prune_old_jobs(self):
+        cutoff = time.time() - self.retention_seconds
+        for path in Path(self.jobs_dir).glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    async def shutdown(self):
+        """Cancels pending jobs (marking them failed) and stops the pool."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._tasks),
+            "max_concurrent": self.max_concurrent,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
@@ -4,12 +4,16 @@ from langchain_core.messages import AIMessage, HumanMessage
 from langgraph.graph import StateGraph, END
 # --- THIS IS THE FIX ---
 # We need to import 'Annotated' from the typing library
-from typing import TypedDict, List, Annotated 
+from typing import TypedDict, List, Annotated, Any, Dict, Optional
 import operator
+import time
 
 # We will reuse our existing retriever and LLM handler functions as tools for the agent
-from backend.retriever import retrieve_context
-from backend.llm_handler import MODEL, PROMPT_TEMPLATE # Import the model and template directly
+from backend.retriever import aembed_query, aretrieve_context, index_version
+from backend.llm_handler import LLM_CLIENT, LLM_SINGLEFLIGHT, PROMPT_BUILDER # Import the shared LLM client and prompt builder directly
+from backend.singleflight import prompt_key
+from backend.answer_cache import ANSWER_CACHE
+from backend.config import settings
 
 # --- 1. Define the State of our Agent ---
 # The state is the "memory" that gets passed between steps in the graph.
@@ -19,14 +23,19 @@ class AgentState(TypedDict):
     conversation_history: Annotated[List[HumanMessage | AIMessage], operator.add]
     business_id: str
     user_query: str
-    retrieved_context: str # Added to hold the context
+    retrieved_chunks: List[Dict] # Added to hold the context (chunk text + similarity score)
     ai_answer: str # Added to hold the final answer
+    query_embedding: Any # Embedding of user_query, used as the answer cache key
+    index_version: Optional[str] # Index build the answer is based on
+    cache_hit: bool # True if ai_answer came from the semantic answer cache
+    generation_failed: bool # True if ai_answer is an error message rather than an answer
 
 # --- 2. Define the Nodes (the "workers" of the agent) ---
 
-def retriever_node(state: AgentState) -> dict:
+async def retriever_node(state: AgentState) -> dict:
     """
     This node retrieves context from the vector database based on the user's query.
+    Embedding and search run on the worker pool, so the event loop stays free.
     """
     print("---AGENT: RETRIEVER NODE---")
     user_query = state["user_query"]
@@ -34,40 +43,81 @@ def retriever_node(state: AgentState) -> dict:
     
     # Get the full conversation history to provide more context for the search
     history = state.get("conversation_history", [])
-    # Create a contextualized query including recent history
-    contextual_query = f"{history[-2].content if len(history) > 1 else ''}\n{history[-1].content if history else ''}\n{user_query}"
 
-    context_chunks = retrieve_context(contextual_query, business_id, top_k=3)
-    context_str = "\n---\n".join([chunk['chunk_text'] for chunk in context_chunks])
+    if history:
+        # Follow-ups aren't cached (their answers depend on earlier turns), so there is
+        # no cache lookup; create a contextualized query including recent history
+        contextual_query = f"{history[-2].content if len(history) > 1 else ''}\n{history[-1].content}\n{user_query}"
+        context_chunks = await aretrieve_context(contextual_query, business_id, top_k=3)
+        return {"retrieved_chunks": context_chunks, "cache_hit": False}
+
+    # Check the semantic answer cache before doing any retrieval or generation
+    query_embedding = await aembed_query(user_query)
+    version = index_version(business_id)
+    if settings.ANSWER_CACHE_ENABLED and version is not None:
+        cached_answer = ANSWER_CACHE.lookup(business_id, query_embedding, version)
+        if cached_answer is not None:
+            print("---AGENT: ANSWER CACHE HIT---")
+            return {"ai_answer": cached_answer, "cache_hit": True}
+
+    # The user's query is the search query, and it's already embedded
+    context_chunks = await aretrieve_context(user_query, business_id, top_k=3, query_embedding=query_embedding)
     
-    return {"retrieved_context": context_str}
+    return {
+        "retrieved_chunks": context_chunks,
+        "query_embedding": query_embedding,
+        "index_version": version,
+        "cache_hit": False,
+    }
 
 
-def generation_node(state: AgentState) -> dict:
+async def generation_node(state: AgentState) -> dict:
     """
     This node generates an answer using the LLM, based on the retrieved context
     and the conversation history.
     """
     print("---AGENT: GENERATION NODE---")
     user_query = state["user_query"]
-    context = state.get("retrieved_context", "")
+    context_chunks = state.get("retrieved_chunks", [])
     history = state.get("conversation_history", [])
     
     # Format the conversation history for the prompt
-    history_str = "\n".join([f"{type(msg).__name__}: {msg.content}" for msg in history]) if history else "No prior messages."
+    history_lines = [f"{type(msg).__name__}: {msg.content}" for msg in history]
 
     try:
-        formatted_prompt = PROMPT_TEMPLATE.format(
-            retrieved_chunks=context,
-            conversation_history=history_str,
-            user_query=user_query
+        # Recent turns are kept verbatim, older ones compacted, and chunks fill the
+        # rest of the token budget, so prompt size stays bounded for chatty users
+        formatted_prompt = PROMPT_BUILDER.build(
+            user_query=user_query,
+            history_lines=history_lines,
+            chunks=context_chunks,
+            empty_history_text="No prior messages.",
         )
-        response = MODEL.generate_content(formatted_prompt)
+        # Awaiting the client keeps the event loop free while Gemini is working
+        start = time.perf_counter()
+        if history:
+            ai_answer = await LLM_CLIENT.generate(formatted_prompt)
+        else:
+            # Without history the prompt is the same for everyone asking this question,
+            # so concurrent identical questions share one Gemini call
+            ai_answer = await LLM_SINGLEFLIGHT.do(
+                prompt_key(state["business_id"], formatted_prompt),
+                lambda: LLM_CLIENT.generate(formatted_prompt),
+            )
+        llm_seconds = time.perf_counter() - start
     except Exception as e:
         print(f"Error in generation node: {e}")
-        return {"ai_answer": "I'm sorry, I encountered an error generating a response. Please try again."}
+        # Not stored anywhere: the next attempt should call the LLM again
+        return {"ai_answer": "I'm sorry, I encountered an error generating a response. Please try again.",
+                "generation_failed": True}
+
+    # Only answers to standalone questions are cached: with history, the answer may
+    # depend on earlier turns and wouldn't be right for someone else's question
+    version = state.get("index_version")
+    if settings.ANSWER_CACHE_ENABLED and not history and context_chunks and version is not None:
+        ANSWER_CACHE.store(state["business_id"], state["query_embedding"], ai_answer, version, llm_seconds)
     
-    return {"ai_answer": response.text.strip()}
+    return {"ai_answer": ai_answer}
 
 
 # --- 3. Build the Graph ---
@@ -77,7 +127,12 @@ workflow.add_node("retriever", retriever_node)
 workflow.add_node("generator", generation_node)
 
 workflow.set_entry_point("retriever")
-workflow.add_edge("retriever", "generator")
+# A cached answer skips generation entirely
+workflow.add_conditional_edges(
+    "retriever",
+    lambda state: END if state.get("cache_hit") else "generator",
+    {END: END, "generator": "generator"},
+)
 workflow.add_edge("generator", END)
 
 conversational_agent = workflow.compile()
@@ -0,0 +1,95 @@
+# backend/llm_client.py
+
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from backend.metrics import METRICS
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when no LLM model is configured."""
+
+
+class LLMClient:
+    """
+    Calls the LLM without blocking the event loop.
+
+    Models exposing the SDK's `generate_content_async` are awaited directly;
+    sync-only models run on a dedicated thread pool. Either way, calls are
+    bounded by a process-wide concurrency limit and a per-call timeout.
+    """
+
+    def __init__(self, model: Any, max_concurrency: int = 8, timeout_seconds: float = 30.0):
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout_seconds = timeout_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # asyncio primitives belong to one event loop, so keep one semaphore per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _call_model(self, prompt: str):
+        if hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.model.generate_content, prompt)
+
+    async def generate(self, prompt: str) -> str:
+        """
+        Generates a completion for `prompt` and returns its stripped text.
+
+        Raises:
+            LLMUnavailableError: If no model is configured.
+            asyncio.TimeoutError: If the call exceeds the configured timeout.
+        """
+        if self.model is None:
+            raise LLMUnavailableError("The AI model is not available.")
+
+        async with self._get_semaphore():
+            with self._stats_lock:
+                self.calls += 1
+                self.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(self._call_model(prompt), timeout=self.timeout_seconds)
+                return response.text.strip()
+            except asyncio.TimeoutError:
+                with self._stats_lock:
+                    self.timeouts += 1
+                raise
+            except Exception:
+                with self._stats_lock:
+                    self.errors += 1
+                raise
+            finally:
+                METRICS.observe("llm.call_seconds", time.perf_counter() - start)
+                with self._stats_lock:
+                    self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "calls": self.calls,
+                "in_flight": self.in_flight,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "max_concurrency": self.max_concurrency,
+                "timeout_seconds": self.timeout_seconds,
+            }
@@ -1,12 +1,18 @@
 # backend/llm_handler.py
 
 import google.generativeai as genai
+import time
 from typing import List, Dict
 
 # Import the settings instance
 from backend.config import settings
 # Import the retriever function we just built
-from backend.retriever import retrieve_context
+from backend.retriever import aembed_query, aretrieve_context, index_version
+from backend.llm_client import LLMClient
+from backend.answer_cache import ANSWER_CACHE
+from backend.singleflight import SingleFlight, prompt_key
+from backend.prompt_builder import PromptBuilder
+from backend.metrics import METRICS
 
 # --- 1. CONFIGURE THE GEMINI MODEL ---
 # Configure the generative AI library with the API key
@@ -19,6 +25,19 @@ except Exception as e:
     print(f"Error initializing Gemini model: {e}")
     MODEL = None
 
+# All LLM calls go through this client: non-blocking, concurrency-limited and timed out
+LLM_CLIENT = LLMClient(
+    MODEL,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+)
+METRICS.register_collector("llm", LLM_CLIENT.stats)
+
+# Identical prompts (same business, context and question, no history) that arrive while
+# one is already being answered share that single Gemini call
+LLM_SINGLEFLIGHT = SingleFlight("llm_singleflight")
+METRICS.register_collector("llm_singleflight", LLM_SINGLEFLIGHT.stats)
+
 # --- 2. DEFINE THE PROMPT TEMPLATE ---
 # This is a crucial part of RAG. We instruct the model on how to behave.
 # It's a "meta-prompt" that guides the final answer generation.
@@ -45,6 +64,15 @@ CUSTOMER QUESTION:
 YOUR ANSWER:
 """
 
+# Fills PROMPT_TEMPLATE within the configured token budget
+PROMPT_BUILDER = PromptBuilder(
+    PROMPT_TEMPLATE,
+    token_budget=settings.PROMPT_TOKEN_BUDGET,
+    recent_turns=settings.PROMPT_RECENT_TURNS,
+    history_share=settings.PROMPT_HISTORY_SHARE,
+    compact_chars=settings.PROMPT_COMPACT_CHARS,
+)
+
 # --- 3. CORE ANSWER GENERATION FUNCTION ---
 async def generate_answer(query: str, business_metadata: dict) -> str:
     """
@@ -63,29 +91,43 @@ async def generate_answer(query: str, business_metadata: dict) -> str:
 
     business_id = business_metadata.get("business_id", "default")
 
-    # --- Step A: Retrieve context from our FAISS index ---
-    context_chunks = retrieve_context(query, business_id, top_k=3)
+    # --- Step A: Embed the query once; it's used for the answer cache and for retrieval ---
+    # Async embedding lets concurrent queries share one batched model call
+    query_embedding = await aembed_query(query)
+    version = index_version(business_id)
+    use_cache = settings.ANSWER_CACHE_ENABLED and version is not None
+    if use_cache:
+        cached_answer = ANSWER_CACHE.lookup(business_id, query_embedding, version)
+        if cached_answer is not None:
+            print("Answer served from the semantic answer cache.")
+            return cached_answer
+
+    # --- Step B: Retrieve context from our FAISS index ---
+    context_chunks = await aretrieve_context(query, business_id, top_k=3, query_embedding=query_embedding)
 
     if not context_chunks:
         return "I'm sorry, I couldn't find any relevant information to answer your question. Please try rephrasing or contact the business."
 
-    # --- Step B: Format the retrieved chunks for the prompt ---
-    # We'll combine the text from the retrieved chunks into a single block.
-    context_str = "\n---\n".join([chunk['chunk_text'] for chunk in context_chunks])
-
     # --- Step C: Fill in the prompt template ---
-    formatted_prompt = PROMPT_TEMPLATE.format(
-        retrieved_chunks=context_str,
+    # Chunks are fitted into the token budget in score order
+    formatted_prompt = PROMPT_BUILDER.build(
         user_query=query,
-        conversation_history=""  # No history in simple RAG mode
+        history_lines=[],  # No history in simple RAG mode
+        chunks=context_chunks,
     )
 
     # --- Step D: Call the Gemini API ---
     try:
         print("\n--- Calling Gemini API ---")
-        response = MODEL.generate_content(formatted_prompt)
+        start = time.perf_counter()
+        answer = await LLM_SINGLEFLIGHT.do(
+            prompt_key(business_id, formatted_prompt),
+            lambda: LLM_CLIENT.generate(formatted_prompt),
+        )
         print("--- Gemini API call successful ---\n")
-        return response.text.strip()
+        if use_cache:
+            ANSWER_CACHE.store(business_id, query_embedding, answer, version, time.perf_counter() - start)
+        return answer
     except Exception as e:
         print(f"Error during Gemini API call: {e}")
         return "There was an issue generating a response. Please try again."
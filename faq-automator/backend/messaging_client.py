@@ -0,0 +1,56 @@
+# backend/messaging_client.py
+
+import asyncio
+from typing import List, Optional, Tuple
+
+
+class MessagingClient:
+    """Interface for sending outbound WhatsApp messages."""
+
+    async def send_message(self, to: str, body: str):
+        raise NotImplementedError
+
+
+class TwilioMessagingClient(MessagingClient):
+    """Sends replies through Twilio's REST API (used when the webhook only acknowledges)."""
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: Optional[str]):
+        if not from_number:
+            raise ValueError("TWILIO_WHATSAPP_NUMBER must be set to send outbound messages.")
+        # Imported here so the fake client (and its tests) don't need the Twilio REST stack
+        from twilio.rest import Client
+
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    async def send_message(self, to: str, body: str):
+        # The Twilio SDK is blocking, so run the HTTP call in the default executor
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: self.client.messages.create(from_=self.from_number, to=to, body=body),
+        )
+
+
+class FakeMessagingClient(MessagingClient):
+    """Records messages instead of sending them. For local runs and tests."""
+
+    def __init__(self, delay_seconds: float = 0.0):
+        self.delay_seconds = delay_seconds
+        self.sent: List[Tuple[str, str]] = []
+
+    async def send_message(self, to: str, body: str):
+        if self.delay_seconds:
+            await asyncio.sleep(self.delay_seconds)
+        self.sent.append((to, body))
+        print(f"[FakeMessagingClient] to={to}: {body}")
+
+
+def create_messaging_client(backend: str, account_sid: str = "", auth_token: str = "",
+                            from_number: Optional[str] = None) -> MessagingClient:
+    """Builds the configured outbound client ('twilio' or 'fake')."""
+    if backend == "fake":
+        return FakeMessagingClient()
+    if backend == "twilio":
+        return TwilioMessagingClient(account_sid, auth_token, from_number)
+    raise ValueError(f"Unknown messaging backend: {backend}")
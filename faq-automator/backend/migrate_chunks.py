@@ -0,0 +1,59 @@
+# backend/migrate_chunks.py
+#
+# One-off job that converts pickled chunk files (data/chunks/{business_id}_chunks.pkl)
+# into memory-mapped chunk stores ({business_id}_chunks.bin, see chunk_store).
+# Re-ingesting a PDF also writes the new format, so this is only for businesses
+# whose PDFs haven't been re-uploaded since. The retriever reads either format
+# and prefers the .bin file, so it's safe to run while serving.
+#
+# Usage (from the faq-automator directory):
+#     python -m backend.migrate_chunks [--business-id business_01] [--keep-pkl]
+
+import argparse
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from backend.chunk_store import ChunkStore, chunk_store_file, read_pickled_chunks, write_chunk_store
+
+CHUNKS_PATH = Path("data") / "chunks"
+LEGACY_SUFFIX = "_chunks.pkl"
+
+
+def migrate(chunks_dir: Path = CHUNKS_PATH, business_id: Optional[str] = None,
+            keep_pkl: bool = False) -> Dict[str, int]:
+    """Converts the .pkl chunk files of one business (or all). Returns chunks migrated per business."""
+    pattern = f"{business_id}{LEGACY_SUFFIX}" if business_id else f"*{LEGACY_SUFFIX}"
+    migrated: Dict[str, int] = {}
+    for pkl_file in sorted(Path(chunks_dir).glob(pattern)):
+        bid = pkl_file.name[:-len(LEGACY_SUFFIX)]
+        pkl_size = pkl_file.stat().st_size
+        chunks = read_pickled_chunks(pkl_file)
+        store_file = chunk_store_file(chunks_dir, bid)
+        tmp_file = store_file.with_name(store_file.name + ".tmp")
+        write_chunk_store(tmp_file, chunks)
+        # Check the round trip before the new file becomes the one the retriever reads
+        store = ChunkStore(tmp_file)
+        if len(store) != len(chunks) or any(store[i] != chunk for i, chunk in enumerate(chunks)):
+            tmp_file.unlink()
+            raise RuntimeError(f"Chunk store for {bid} doesn't match its .pkl file; left unmigrated")
+        del store
+        os.replace(tmp_file, store_file)
+        if not keep_pkl:
+            pkl_file.unlink()
+        migrated[bid] = len(chunks)
+        print(f"Migrated {len(chunks)} chunks of {bid} ({pkl_size} -> {store_file.stat().st_size} bytes)")
+    return migrated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert pickled chunk files to memory-mapped chunk stores.")
+    parser.add_argument("--business-id", help="Only migrate this business (default: all)")
+    parser.add_argument("--chunks-dir", default=str(CHUNKS_PATH), help="Directory holding the chunk files")
+    parser.add_argument("--keep-pkl", action="store_true", help="Keep the .pkl files after converting them")
+    args = parser.parse_args()
+
+    result = migrate(Path(args.chunks_dir), args.business_id, args.keep_pkl)
+    print("\n--- Migration Complete ---")
+    print(result or "No .pkl chunk files found.")
+    print("--------------------------")
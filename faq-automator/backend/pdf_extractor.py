@@ -0,0 +1,93 @@
+# backend/pdf_extractor.py
+#
+# Page-level PDF text extraction, fanned out across a process pool in page ranges.
+# Kept separate from pdf_processor so pool processes only import PyPDF2, not
+# faiss / the embedding model.
+
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+# (text, seconds) for each page
+PageResult = Tuple[str, float]
+
+
+def count_pages(pdf_path: str) -> int:
+    with open(pdf_path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[PageResult]:
+    """Extracts pages [start, end). Each call opens its own reader, so it can run in any process."""
+    results: List[PageResult] = []
+    with open(pdf_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        for page_no in range(start, end):
+            page_start = time.perf_counter()
+            text = reader.pages[page_no].extract_text() or ""
+            results.append((text, time.perf_counter() - page_start))
+    return results
+
+
+def iter_pages(pdf_path: str, workers: Optional[int] = None, min_parallel_pages: int = 32,
+               progress_callback: Optional[Callable[[int, int], None]] = None,
+               max_range_pages: int = 50) -> Iterator[PageResult]:
+    """
+    Yields (text, seconds) for every page of a PDF, in page order.
+
+    Documents with at least `min_parallel_pages` pages are split into page ranges
+    (of at most `max_range_pages` pages) and extracted by a pool of `workers`
+    processes (default: CPU count); smaller ones are extracted serially, where a
+    pool would cost more than it saves. Only a few ranges are in flight at once,
+    so memory stays bounded however long the document is.
+
+    Args:
+        pdf_path: The PDF to read.
+        workers: Number of extraction processes.
+        min_parallel_pages: Page count from which the pool is used.
+        progress_callback: Called with (pages_extracted, total_pages) as pages finish.
+        max_range_pages: Largest page range handed to one process at a time.
+    """
+    total_pages = count_pages(pdf_path)
+    workers = workers or os.cpu_count() or 1
+    report = progress_callback or (lambda done, total: None)
+
+    if workers <= 1 or total_pages < min_parallel_pages:
+        with open(pdf_path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            for page_no, page in enumerate(reader.pages, start=1):
+                page_start = time.perf_counter()
+                text = page.extract_text() or ""
+                yield text, time.perf_counter() - page_start
+                report(page_no, total_pages)
+        return
+
+    # About two ranges per worker, so one slow (e.g. image-heavy) range doesn't leave the
+    # others idle; not many more, as every range re-opens the PDF and re-reads its page tree
+    range_size = max(1, min(max_range_pages, math.ceil(total_pages / (workers * 2))))
+    ranges = deque((start, min(start + range_size, total_pages)) for start in range(0, total_pages, range_size))
+    in_flight: Deque[Future] = deque()
+    done = 0
+    # 'spawn' keeps pool processes independent of whatever threads the caller has
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        while ranges or in_flight:
+            while ranges and len(in_flight) < workers * 2:
+                in_flight.append(pool.submit(extract_page_range, pdf_path, *ranges.popleft()))
+            # Ranges are consumed in submission order, which is page order
+            page_results = in_flight.popleft().result()
+            done += len(page_results)
+            report(done, total_pages)
+            yield from page_results
+
+
+def extract_pages(pdf_path: str, workers: Optional[int] = None, min_parallel_pages: int = 32,
+                  progress_callback: Optional[Callable[[int, int], None]] = None) -> List[PageResult]:
+    """Extracts every page of a PDF, in page order (see iter_pages)."""
+    return list(iter_pages(pdf_path, workers, min_parallel_pages, progress_callback))
@@ -1,12 +1,22 @@
 # backend/pdf_processor.py
 
-import PyPDF2
+import json
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
+import shutil
 from pathlib import Path
-import pickle
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from backend.config import settings
+from backend.embedding_service import EMBEDDING_SERVICE
+from backend.answer_cache import ANSWER_CACHE
+from backend.chunk_store import ChunkStoreWriter, chunk_store_file
+from backend.index_versions import IndexLocation, business_dir, create_staging_dir, locate, publish
+from backend.ann_index import build_index
+from backend.metrics import METRICS
+from backend.pdf_extractor import count_pages, iter_pages
+from backend.vector_store import StoredVectors, chunk_digest, hashes_file, meta_file, vectors_file
 
 # --- 1. CONFIGURATION ---
 DATA_PATH = Path("data")
@@ -15,65 +25,251 @@ CHUNKS_PATH = DATA_PATH / "chunks"
 FAISS_INDEX_PATH.mkdir(parents=True, exist_ok=True)
 CHUNKS_PATH.mkdir(parents=True, exist_ok=True)
 
-print("Loading embedding model...")
-EMBEDDING_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
-print("Model loaded.")
+# Called with progress counters, e.g. {"stage": "embedding", "chunks_embedded": 64, "pages_extracted": 10}
+ProgressCallback = Callable[[dict], None]
 
-# --- 2. CORE PDF PROCESSING FUNCTION (IMPROVED) ---
-def process_pdf(pdf_path: str, business_id: str) -> dict:
-    print(f"Starting to process PDF: {pdf_path} for business: {business_id}")
+# Extracted text is split once this much has accumulated; only the unfinished
+# last chunk is carried over to the next window
+SPLIT_WINDOW_CHARS = 16_000
 
-    try:
-        text = ""
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            for page in reader.pages:
-                text += page.extract_text() or ""
-        print(f"Extracted {len(text)} characters from the PDF.")
-        if not text.strip():
-            return {"status": "error", "message": "No text could be extracted from the PDF."}
-    except Exception as e:
-        return {"status": "error", "message": f"Failed to read PDF: {e}"}
 
+def _make_text_splitter() -> RecursiveCharacterTextSplitter:
     # --- Step B: Chunk the Text (IMPROVEMENT: Smaller chunk size) ---
     # We reduce the chunk size to get more specific, smaller pieces of text.
-    text_splitter = RecursiveCharacterTextSplitter(
+    return RecursiveCharacterTextSplitter(
         chunk_size=250,  # Reduced from 500
         chunk_overlap=30,   # Reduced from 50
-        length_function=len
+        length_function=len,
+        add_start_index=True,
     )
-    chunks = text_splitter.split_text(text)
-    print(f"Split text into {len(chunks)} chunks.")
-
-    print("Generating embeddings for all chunks...")
-    embeddings = EMBEDDING_MODEL.encode(chunks, convert_to_tensor=False)
-    
-    # --- Step D: Create and Save FAISS Index (IMPROVEMENT: Using Inner Product) ---
-    embeddings = np.array(embeddings).astype('float32')
-    
-    # We MUST normalize the vectors for Inner Product to work correctly
-    faiss.normalize_L2(embeddings)
-
-    d = embeddings.shape[1]
-    
-    # Using IndexFlatIP for Inner Product (cosine similarity)
-    index = faiss.IndexFlatIP(d)
-    index.add(embeddings)
-    
-    index_file = FAISS_INDEX_PATH / f"{business_id}.index"
-    faiss.write_index(index, str(index_file))
-    print(f"FAISS index saved to: {index_file} (using Inner Product)")
-
-    chunks_file = CHUNKS_PATH / f"{business_id}_chunks.pkl"
-    with open(chunks_file, "wb") as f:
-        pickle.dump(chunks, f)
-    print(f"Text chunks saved to: {chunks_file}")
+
+
+def stream_chunks(page_texts: Iterable[str], window_chars: int = SPLIT_WINDOW_CHARS) -> Iterator[str]:
+    """
+    Splits a stream of page texts into chunks without holding the whole document.
+
+    Pages are joined as before ("".join), so chunks can span page boundaries.
+    The splitter only ever sees about `window_chars` at a time, though, so near
+    each window boundary a chunk may be cut at a different point than splitting
+    the whole text at once would choose, and the chunk count can differ by one
+    or two. The chunks still cover the same text in the same order.
+    """
+    splitter = _make_text_splitter()
+    buffer = ""
+    for page_text in page_texts:
+        buffer += page_text
+        if len(buffer) < window_chars:
+            continue
+        docs = splitter.create_documents([buffer])
+        if len(docs) < 2:
+            continue
+        # The last chunk may continue on the next page: re-split it with the next window.
+        # Keep the whitespace before it, which the splitter counts as part of the chunk.
+        yield from (doc.page_content for doc in docs[:-1])
+        start = docs[-1].metadata["start_index"]
+        while start > 0 and buffer[start - 1].isspace():
+            start -= 1
+        buffer = buffer[start:]
+    if buffer:
+        yield from splitter.split_text(buffer)
+
+
+def _batched(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _StreamingIndexWriter:
+    """
+    Appends embedded batches to the business's vectors file (plus each chunk's
+    content hash) and their texts to the chunk store as they arrive; commit()
+    builds the FAISS index (flat, HNSW or IVF by size, optionally quantized)
+    from the vectors file. Everything is written into a staging directory that
+    becomes a new index version when published (see index_versions), so readers
+    keep the previous version until the new one is complete.
+    """
+
+    def __init__(self, business_id: str, staging_dir: Path):
+        self.business_id = business_id
+        self.staging_dir = staging_dir
+        self.files = {
+            "index": staging_dir / f"{business_id}.index",
+            "chunks": chunk_store_file(staging_dir, business_id),
+            "vectors": vectors_file(staging_dir, business_id),
+            "hashes": hashes_file(staging_dir, business_id),
+            "meta": meta_file(staging_dir, business_id),
+        }
+        self.dimension = None
+        self.num_chunks = 0
+        self.index_info = None
+        self._chunks_out = open(self.files["chunks"], "wb")
+        self._chunk_store = ChunkStoreWriter(self._chunks_out)
+        self._vectors_out = open(self.files["vectors"], "wb")
+        self._hashes_out = open(self.files["hashes"], "wb")
+
+    def add(self, chunks: List[str], digests: List[bytes], embeddings: np.ndarray):
+        self.dimension = embeddings.shape[1]
+        np.ascontiguousarray(embeddings, dtype="float32").tofile(self._vectors_out)
+        self._hashes_out.write(b"".join(digests))
+        self._chunk_store.add(chunks)
+        self.num_chunks += len(chunks)
+
+    def _close(self):
+        for out in (self._chunks_out, self._vectors_out, self._hashes_out):
+            out.close()
+
+    def commit(self, embedding_model: str, pdf_sha256: Optional[str] = None):
+        """Finishes every file of the build; it is published separately."""
+        self._chunk_store.finish()
+        self._close()
+        index, self.index_info = build_index(self.files["vectors"], self.num_chunks, self.dimension)
+        faiss.write_index(index, str(self.files["index"]))
+        del index
+        # The metadata is written last: a version with a meta file is complete
+        with open(self.files["meta"], "w", encoding="utf-8") as f:
+            json.dump({"embedding_model": embedding_model, "dimension": self.dimension,
+                       "num_chunks": self.num_chunks, "pdf_sha256": pdf_sha256,
+                       "index": self.index_info}, f)
+
+    def abort(self):
+        self._close()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+def _embed_with_reuse(chunks: List[str], previous: StoredVectors) -> Tuple[List[bytes], np.ndarray, int]:
+    """
+    Embeds a batch, reusing stored vectors for chunks whose text hasn't changed.
+
+    Returns:
+        Tuple: (content hashes, embeddings in chunk order, number of chunks reused).
+    """
+    digests = [chunk_digest(chunk) for chunk in chunks]
+    reused = {i: previous.get(digest) for i, digest in enumerate(digests)}
+    reused = {i: vector for i, vector in reused.items() if vector is not None}
+
+    # Identical chunks within the batch are embedded once
+    missing_texts = list(dict.fromkeys(chunk for i, chunk in enumerate(chunks) if i not in reused))
+    new_vectors = {}
+    if missing_texts:
+        # The shared embedding service returns L2-normalized float32 vectors,
+        # which is what Inner Product search needs to behave like cosine similarity
+        new_vectors = dict(zip(missing_texts, EMBEDDING_SERVICE.encode(missing_texts)))
+
+    dimension = len(next(iter(reused.values()))) if reused else len(next(iter(new_vectors.values())))
+    embeddings = np.empty((len(chunks), dimension), dtype="float32")
+    for i, chunk in enumerate(chunks):
+        embeddings[i] = reused[i] if i in reused else new_vectors[chunk]
+    return digests, embeddings, len(reused)
+
+
+# --- 2. CORE PDF PROCESSING FUNCTION (IMPROVED) ---
+def process_pdf(pdf_path: str, business_id: str, progress_callback: Optional[ProgressCallback] = None,
+                pdf_sha256: Optional[str] = None) -> dict:
+    """
+    Builds a business's FAISS index and chunk file from a PDF, streaming:
+    pages -> chunks -> embedding batches -> index. Besides the index itself, memory
+    is bounded by PDF_EMBED_BATCH_SIZE chunks and a few pages of text, not by the
+    document size.
+
+    On re-upload, chunks whose text is unchanged reuse their stored vectors
+    (looked up by content hash); only new or edited chunks are embedded, and
+    removed chunks simply don't make it into the rebuilt index.
+
+    `pdf_sha256` (the upload's hash, if known) is recorded in the index metadata,
+    so identical re-uploads can be recognised without reprocessing.
+    """
+    print(f"Starting to process PDF: {pdf_path} for business: {business_id}")
+    report = progress_callback or (lambda counters: None)
+    progress = {"stage": "extracting", "pages_extracted": 0, "chunks_processed": 0,
+                "chunks_embedded": 0, "chunks_reused": 0}
+
+    try:
+        total_pages = count_pages(pdf_path)
+    except Exception as e:
+        return {"status": "error", "message": f"Failed to read PDF: {e}"}
+    progress["total_pages"] = total_pages
+
+    def on_pages(done: int, total: int):
+        progress["pages_extracted"] = done
+        report(dict(progress))
+
+    page_seconds: List[float] = []
+    num_chars = 0
+
+    def page_texts() -> Iterator[str]:
+        nonlocal num_chars
+        for page_text, seconds in iter_pages(pdf_path, workers=settings.PDF_EXTRACT_WORKERS,
+                                             min_parallel_pages=settings.PDF_PARALLEL_MIN_PAGES,
+                                             progress_callback=on_pages):
+            page_seconds.append(seconds)
+            METRICS.observe("pdf.page_extract_seconds", seconds)
+            num_chars += len(page_text)
+            yield page_text
+
+    current = locate(FAISS_INDEX_PATH, CHUNKS_PATH, business_id)
+    previous = (StoredVectors.load(current.index_dir, business_id, EMBEDDING_SERVICE.model_name)
+                if current is not None else StoredVectors())
+    writer = _StreamingIndexWriter(business_id, create_staging_dir(FAISS_INDEX_PATH, business_id))
+    try:
+        for batch in _batched(stream_chunks(page_texts()), settings.PDF_EMBED_BATCH_SIZE):
+            digests, embeddings, num_reused = _embed_with_reuse(batch, previous)
+            writer.add(batch, digests, embeddings)
+            progress["chunks_reused"] += num_reused
+            progress.update(stage="embedding", chunks_processed=writer.num_chunks,
+                            chunks_embedded=writer.num_chunks - progress["chunks_reused"])
+            report(dict(progress))
+
+        if writer.num_chunks == 0:
+            writer.abort()
+            return {"status": "error", "message": "No text could be extracted from the PDF."}
+        report({**progress, "stage": "indexing"})
+        writer.commit(EMBEDDING_SERVICE.model_name, pdf_sha256)
+    except BaseException:
+        writer.abort()
+        raise
+    # Atomic switch: queries started before it finish on the version they resolved
+    version = publish(FAISS_INDEX_PATH, CHUNKS_PATH, business_id, writer.staging_dir,
+                      keep=settings.INDEX_VERSIONS_KEEP)
+    published_dir = business_dir(FAISS_INDEX_PATH, business_id) / version
+    published = IndexLocation(business_id, published_dir, published_dir, version)
+
+    page_seconds.sort()
+    extraction = {
+        "pages": len(page_seconds),
+        # Extraction is interleaved with embedding now, so this is the sum over pages
+        "seconds": round(sum(page_seconds), 3),
+        "page_seconds_p50": round(page_seconds[len(page_seconds) // 2], 4),
+        "page_seconds_max": round(page_seconds[-1], 4),
+    }
+    print(f"Extracted {num_chars} characters from {len(page_seconds)} pages into {writer.num_chunks} chunks "
+          f"({progress['chunks_reused']} reused, {progress['chunks_embedded']} embedded).")
+    print(f"FAISS index published as version {version}: {published.index_file} (using Inner Product, "
+          f"{writer.index_info['type']}, quantization: {writer.index_info['quantization']})")
+    print(f"Text chunks saved to: {published.chunks_file}")
+
+    # Cached answers were generated from the old index. Other processes notice the
+    # new index version on their next lookup.
+    ANSWER_CACHE.invalidate(business_id)
 
     return {
         "status": "success",
-        "num_chunks": len(chunks),
-        "faiss_index_path": str(index_file),
-        "chunks_path": str(chunks_file)
+        "num_chunks": writer.num_chunks,
+        "chunks_reused": progress["chunks_reused"],
+        "chunks_embedded": progress["chunks_embedded"],
+        "pdf_sha256": pdf_sha256,
+        "index_type": writer.index_info["type"],
+        "quantization": writer.index_info["quantization"],
+        "extraction": extraction,
+        "index_version": version,
+        # The business's index directory: stable across versions, unlike the files in it
+        "faiss_index_path": str(business_dir(FAISS_INDEX_PATH, business_id)),
+        "chunks_path": str(published.chunks_file)
     }
 
 # --- 3. SCRIPT EXECUTION BLOCK ---
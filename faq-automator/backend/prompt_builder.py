@@ -0,0 +1,103 @@
+# backend/prompt_builder.py
+
+from typing import Dict, List
+
+from backend.metrics import METRICS
+
+# Prompt sizes are in (estimated) tokens
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max(0, max_tokens * 4 - 3)
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
+
+
+class PromptBuilder:
+    """
+    Fills the RAG prompt template within a token budget.
+
+    The most recent `recent_turns` turns of history are kept verbatim, older
+    turns are compacted to `compact_chars` characters, and the oldest are
+    dropped once the history share of the budget is used up. Retrieved chunks
+    then fill the remaining budget in score order.
+    """
+
+    def __init__(self, template: str, token_budget: int = 3000, recent_turns: int = 3,
+                 history_share: float = 0.4, compact_chars: int = 200):
+        self.template = template
+        self.token_budget = token_budget
+        self.recent_messages = 2 * recent_turns
+        self.history_share = history_share
+        self.compact_chars = compact_chars
+
+    def build(self, user_query: str, history_lines: List[str], chunks: List[Dict],
+              empty_history_text: str = "") -> str:
+        """
+        Args:
+            user_query: The customer's question.
+            history_lines: Formatted history messages, oldest first.
+            chunks: Retrieved chunks ({"chunk_text", "similarity_score"}).
+            empty_history_text: What to put in the history slot when there is none.
+
+        Returns:
+            str: The formatted prompt.
+        """
+        base_tokens = estimate_tokens(self.template.format(
+            retrieved_chunks="", conversation_history=empty_history_text, user_query=user_query))
+        remaining = max(0, self.token_budget - base_tokens)
+
+        history_str = self._fit_history(history_lines, int(remaining * self.history_share))
+        remaining -= estimate_tokens(history_str)
+        context_str = self._fit_chunks(chunks, remaining)
+
+        prompt = self.template.format(
+            retrieved_chunks=context_str,
+            conversation_history=history_str or empty_history_text,
+            user_query=user_query,
+        )
+
+        untrimmed_tokens = base_tokens + sum(estimate_tokens(line) + 1 for line in history_lines) \
+            + sum(estimate_tokens(chunk["chunk_text"]) + 2 for chunk in chunks)
+        METRICS.observe("prompt.tokens_untrimmed", untrimmed_tokens, buckets=TOKEN_BUCKETS)
+        METRICS.observe("prompt.tokens", estimate_tokens(prompt), buckets=TOKEN_BUCKETS)
+        return prompt
+
+    def _fit_history(self, history_lines: List[str], budget: int) -> str:
+        kept: List[str] = []
+        used = 0
+        # Walk newest to oldest; older messages are compacted before being considered
+        for age, line in enumerate(reversed(history_lines)):
+            if age >= self.recent_messages and len(line) > self.compact_chars:
+                line = line[:self.compact_chars].rstrip() + "..."
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                if not kept and budget > 0:
+                    # Always keep (part of) the latest message for continuity
+                    kept.append(_truncate_to_tokens(line, budget - 1))
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(reversed(kept))
+
+    @staticmethod
+    def _fit_chunks(chunks: List[Dict], budget: int) -> str:
+        kept: List[str] = []
+        used = 0
+        for chunk in sorted(chunks, key=lambda c: c["similarity_score"], reverse=True):
+            text = chunk["chunk_text"]
+            cost = estimate_tokens(text) + 2
+            if used + cost > budget:
+                if not kept and budget > 2:
+                    # The best chunk alone is too long: keep as much of it as fits
+                    kept.append(_truncate_to_tokens(text, budget - 2))
+                    used = budget
+                continue
+            kept.append(text)
+            used += cost
+        return "\n---\n".join(kept)
@@ -0,0 +1,114 @@
+# backend/reply_queue.py
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+from backend.messaging_client import MessagingClient
+from backend.metrics import METRICS
+
+
+@dataclass
+class ReplyJob:
+    """One inbound WhatsApp message waiting for an outbound reply."""
+    sender_id: str
+    body: Optional[str] = None
+    num_media: int = 0
+    media_url: Optional[str] = None
+    message_sid: Optional[str] = None
+    received_at: float = field(default_factory=time.perf_counter)
+    enqueued_at: float = 0.0
+
+
+# Turns a job into the reply text that should be sent back to the sender
+ReplyHandler = Callable[[ReplyJob], Awaitable[str]]
+
+
+class ReplyWorkerPool:
+    """
+    A bounded job queue drained by a fixed pool of asyncio workers.
+
+    Used by the webhook's acknowledge-then-reply mode: the request returns
+    immediately, a worker produces the reply and sends it through the
+    outbound messaging client.
+    """
+
+    def __init__(self, handler: ReplyHandler, client: MessagingClient,
+                 num_workers: int = 4, max_queue_size: int = 1000):
+        self.handler = handler
+        self.client = client
+        self.num_workers = max(1, num_workers)
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        print(f"Started {self.num_workers} reply workers.")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Waits (up to `drain_timeout`) for queued jobs to finish, then stops the workers."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Reply queue not drained after {drain_timeout}s; {self._queue.qsize()} jobs dropped.")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, job: ReplyJob) -> bool:
+        """Enqueues a job. Returns False if the pool isn't running or the queue is full."""
+        if not self.running:
+            return False
+        job.enqueued_at = time.perf_counter()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            METRICS.incr("reply_queue.rejected")
+            return False
+        METRICS.set_gauge("reply_queue.depth", self._queue.qsize())
+        return True
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            METRICS.set_gauge("reply_queue.depth", self._queue.qsize())
+            METRICS.observe("reply_queue.wait_seconds", time.perf_counter() - job.enqueued_at)
+            try:
+                reply = await self.handler(job)
+                if reply:
+                    await self.client.send_message(job.sender_id, reply)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                METRICS.incr("reply_queue.failed")
+                print(f"Reply worker {worker_id} failed for {job.sender_id}: {e}")
+            finally:
+                METRICS.observe("reply_queue.end_to_end_seconds", time.perf_counter() - job.received_at)
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": len(self._workers),
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
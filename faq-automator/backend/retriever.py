@@ -2,49 +2,152 @@
 
 import faiss
 import numpy as np
-import pickle
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence, Tuple
+
+from backend.ann_index import rerank_exact, search_params
+from backend.chunk_store import ChunkStore, read_pickled_chunks
+from backend.config import settings
+from backend.embedding_service import EMBEDDING_SERVICE
+from backend.embedding_batcher import QueryEmbeddingBatcher
+from backend.index_cache import IndexCache
+from backend.index_versions import locate
+from backend.metrics import METRICS
+from backend.vector_store import open_vectors, read_meta
+from backend.workers import get_cpu_executor, run_cpu_bound
 
 # --- 1. CONFIGURATION ---
 DATA_PATH = Path("data")
 FAISS_INDEX_PATH = DATA_PATH / "faiss_index"
 CHUNKS_PATH = DATA_PATH / "chunks"
+# Times a query resolves the business's current index version if it keeps being replaced
+MAX_RESOLVE_ATTEMPTS = 5
 
-print("Loading embedding model for retriever...")
-EMBEDDING_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
-print("Model loaded.")
+# --- 1b. IN-PROCESS INDEX CACHE ---
+# Loaded indexes and (memory-mapped) chunk stores are kept so hot businesses skip disk
+# I/O on every query. Cold businesses are evicted once the budget is exceeded.
+def _read_index(index_file: Path, meta: dict):
+    """
+    Reads a FAISS index, memory-mapped read-only when INDEX_MMAP is on: its
+    vectors then live in the OS page cache, shared by every worker process that
+    maps the same file, instead of in a private copy per worker.
+    """
+    if not settings.INDEX_MMAP:
+        return faiss.read_index(str(index_file))
+    # IO_FLAG_MMAP maps IVF inverted lists; IO_FLAG_MMAP_IFC maps flat-code storage
+    # (flat, SQ8, PQ, HNSW vectors). The two can't be combined on an IVF index.
+    flag = faiss.IO_FLAG_MMAP if meta.get("index", {}).get("type") == "ivf" else faiss.IO_FLAG_MMAP_IFC
+    return faiss.read_index(str(index_file), flag | faiss.IO_FLAG_READ_ONLY)
 
-# --- 2. CORE RETRIEVAL FUNCTION (IMPROVED) ---
-def retrieve_context(query: str, business_id: str, top_k: int = 3) -> List[Dict]:
-    print(f"Retrieving context for query: '{query}' for business: {business_id}")
 
-    index_file = FAISS_INDEX_PATH / f"{business_id}.index"
-    chunks_file = CHUNKS_PATH / f"{business_id}_chunks.pkl"
+def _load_business_files(paths: Sequence[Path]) -> Tuple[tuple, int]:
+    index_file, chunks_file = paths
+    meta = read_meta(index_file.parent, index_file.stem) or {}
+    try:
+        index = _read_index(index_file, meta)
+    except RuntimeError as e:
+        # FAISS reports a missing file as RuntimeError. A version garbage-collected
+        # mid-load must look like any other missing file, so the caller resolves again.
+        if not index_file.exists():
+            raise FileNotFoundError(f"{index_file} was removed while loading") from e
+        raise
+    # On-disk size is a good approximation of the resident size of an index. A mapped
+    # index is counted too: searches touch most of its pages, so this bounds the
+    # page-cache working set of the worker, even though the pages are shared.
+    size_bytes = index_file.stat().st_size
+    if chunks_file.suffix == ".pkl":
+        # Not yet migrated (python -m backend.migrate_chunks): unpickled texts live in this process
+        chunks = read_pickled_chunks(chunks_file)
+        size_bytes += chunks_file.stat().st_size
+    else:
+        # Memory-mapped; texts are decoded per result and their pages are shared with other processes
+        chunks = ChunkStore(chunks_file)
+        size_bytes += chunks.offsets_nbytes
+    return (index, chunks, _rescoring_vectors(index_file, index, meta)), size_bytes
 
-    if not index_file.exists() or not chunks_file.exists():
-        print(f"Warning: No FAISS index found for business_id '{business_id}'. Please upload a PDF first.")
-        return []
 
+def _rescoring_vectors(index_file: Path, index, meta: dict) -> Optional[np.ndarray]:
+    """
+    For a quantized index, a read-only memory map of the full-precision vectors
+    used to re-score its candidates. It isn't counted against the cache budget:
+    only the rows of actual candidates are paged in, and the page cache can drop them.
+    """
+    business_id = index_file.stem
+    if meta.get("index", {}).get("quantization", "none") == "none" or settings.ANN_RERANK_FACTOR <= 1:
+        return None
     try:
-        index = faiss.read_index(str(index_file))
-        with open(chunks_file, "rb") as f:
-            chunks = pickle.load(f)
-    except Exception as e:
-        print(f"Error loading files: {e}")
-        return []
+        vectors = open_vectors(index_file.parent, business_id, meta)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Warning: no vectors to re-score '{business_id}' with, using quantized scores: {e}")
+        return None
+    # A rebuild may have replaced the vectors but not yet the index
+    return vectors if len(vectors) == index.ntotal else None
 
-    # --- Step D: Embed the user's query (IMPROVEMENT: Normalize the query vector) ---
-    query_embedding = EMBEDDING_MODEL.encode([query], convert_to_tensor=False)
-    query_embedding = np.array(query_embedding).astype('float32')
-    
-    # MUST normalize the query embedding as well
-    faiss.normalize_L2(query_embedding)
+INDEX_CACHE = IndexCache(
+    loader=_load_business_files,
+    max_bytes=settings.INDEX_CACHE_MAX_MB * 1024 * 1024,
+    verify_content_hash=settings.INDEX_CACHE_VERIFY_HASH,
+)
+METRICS.register_collector("index_cache", INDEX_CACHE.stats)
+
+# --- 1c. QUERY EMBEDDING MICRO-BATCHER ---
+# Concurrent async callers share one encode call instead of paying per-query overhead
+QUERY_BATCHER = QueryEmbeddingBatcher(
+    encode_fn=EMBEDDING_SERVICE.encode,
+    max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+    max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+    get_executor=get_cpu_executor,
+)
+METRICS.register_collector("query_batcher", QUERY_BATCHER.stats)
 
+# --- 2. CORE RETRIEVAL FUNCTIONS (IMPROVED) ---
+def _load_business_data(business_id: str):
+    """
+    Returns (index, chunks, rescoring vectors) for a business, or None if it can't be loaded.
+    The vectors are None unless the index is quantized.
+    """
+    # Index and chunks always come from the same published version. A version can be
+    # garbage-collected between resolving and opening it, but then a newer one has been
+    # published: resolve again. The same version missing twice is really missing.
+    tried = []
+    for _ in range(MAX_RESOLVE_ATTEMPTS):
+        location = locate(FAISS_INDEX_PATH, CHUNKS_PATH, business_id)
+        if location is None or location.version in tried:
+            break
+        tried.append(location.version)
+        try:
+            return INDEX_CACHE.get(business_id, (location.index_file, location.chunks_file))
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            print(f"Error loading files: {e}")
+            return None
+    print(f"Warning: No FAISS index found for business_id '{business_id}'. Please upload a PDF first.")
+    return None
+
+
+def warm_index(business_id: str) -> bool:
+    """
+    Loads the business's current index version into the cache, so the first query
+    after a re-index doesn't pay for the load. Returns whether it loaded.
+    """
+    return _load_business_data(business_id) is not None
+
+
+def _search(index, chunks: Sequence[str], query_embedding: np.ndarray, top_k: int,
+            nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+            vectors: Optional[np.ndarray] = None) -> List[Dict]:
     # --- Step E: Search the FAISS index ---
     # The 'search' method now returns similarity scores directly (higher is better).
-    scores, indices = index.search(query_embedding, top_k)
+    # Approximate (HNSW / IVF) indexes take their recall-vs-latency knobs per query.
+    # A quantized index returns ANN_RERANK_FACTOR x top_k candidates, which are
+    # re-scored with their full-precision `vectors`.
+    num_candidates = top_k * settings.ANN_RERANK_FACTOR if vectors is not None else top_k
+    params = search_params(index, num_candidates, nprobe=nprobe, ef_search=ef_search)
+    scores, indices = index.search(query_embedding.reshape(1, -1), num_candidates, params=params)
+    if vectors is not None:
+        scores, indices = rerank_exact(vectors, query_embedding, indices[0], top_k)
+        scores, indices = scores.reshape(1, -1), indices.reshape(1, -1)
 
     # --- Step F: Format the results ---
     results = []
@@ -60,6 +163,73 @@ def retrieve_context(query: str, business_id: str, top_k: int = 3) -> List[Dict]
     print(f"Found {len(results)} relevant chunks.")
     return results
 
+
+def retrieve_context(query: str, business_id: str, top_k: int = 3,
+                     nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict]:
+    """
+    Returns the `top_k` chunks most similar to `query`.
+
+    `nprobe` (IVF indexes) and `ef_search` (HNSW indexes) override ANN_IVF_NPROBE
+    and ANN_HNSW_EF_SEARCH for this query; flat indexes ignore them.
+    """
+    print(f"Retrieving context for query: '{query}' for business: {business_id}")
+
+    data = _load_business_data(business_id)
+    if data is None:
+        return []
+    index, chunks, vectors = data
+
+    # --- Step D: Embed the user's query ---
+    # The shared embedding service returns L2-normalized float32 vectors, as the index expects
+    query_embedding = EMBEDDING_SERVICE.encode([query])
+    return _search(index, chunks, query_embedding, top_k, nprobe, ef_search, vectors)
+
+
+def index_version(business_id: str) -> Optional[str]:
+    """
+    Returns an identifier of the business's current index build (None if there is none).
+    Anything derived from the index, like cached answers, is stale once this changes.
+    """
+    location = locate(FAISS_INDEX_PATH, CHUNKS_PATH, business_id)
+    if location is None:
+        return None
+    if location.version is not None:
+        return location.version
+    try:
+        # Indexed before versioning: the file's modification time identifies the build
+        return str(location.index_file.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+async def aembed_query(query: str) -> np.ndarray:
+    """Embeds a single query through the micro-batcher (1-D, L2-normalized)."""
+    return await QUERY_BATCHER.embed(query)
+
+
+async def aretrieve_context(query: str, business_id: str, top_k: int = 3,
+                            query_embedding: Optional[np.ndarray] = None,
+                            nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict]:
+    """
+    Async variant of retrieve_context for request handlers (same search knobs).
+
+    Pass `query_embedding` when the caller has already embedded `query`.
+
+    The query embedding goes through the micro-batcher, so concurrent requests
+    are encoded together instead of one model call per query. Index loading and
+    the FAISS search run on the CPU worker pool, keeping the event loop free.
+    """
+    print(f"Retrieving context (async) for query: '{query}' for business: {business_id}")
+
+    data = await run_cpu_bound(_load_business_data, business_id)
+    if data is None:
+        return []
+    index, chunks, vectors = data
+
+    if query_embedding is None:
+        query_embedding = await aembed_query(query)
+    return await run_cpu_bound(_search, index, chunks, query_embedding, top_k, nprobe, ef_search, vectors)
+
 # --- 3. SCRIPT EXECUTION BLOCK ---
 if __name__ == '__main__':
     test_query = "what are the weekday batch timings" # Change this to a question relevant to your PDF
@@ -0,0 +1,75 @@
+# backend/singleflight.py
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from backend.metrics import METRICS
+
+T = TypeVar("T")
+
+
+def prompt_key(business_id: str, prompt: str) -> tuple:
+    """A compact coalescing key for an LLM prompt."""
+    return (business_id, hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+
+
+@dataclass
+class _Call:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is in flight,
+    other callers with the same key await its result instead of starting their own.
+    Nothing is kept once the call completes (that's what the answer cache is for).
+
+    The call runs as its own task, so cancelling any caller, including the one
+    that started it, leaves it running for the others; it is cancelled only when
+    every caller has gone.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executed = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        call = self._inflight.get(key)
+        if call is not None:
+            self.collapsed += 1
+            METRICS.incr(f"{self.name}.collapsed")
+        else:
+            self.executed += 1
+            call = self._inflight[key] = _Call(asyncio.ensure_future(func()))
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody wants the result any more; a later caller starts afresh
+                self._finished(key, call)
+                call.task.cancel()
+
+    def _finished(self, key: Hashable, call: _Call):
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if call.task.done() and not call.task.cancelled():
+            call.task.exception()  # Mark retrieved in case every caller was cancelled
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "collapsed": self.collapsed,
+            "inflight": len(self._inflight),
+        }
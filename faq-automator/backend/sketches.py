@@ -0,0 +1,135 @@
+# backend/sketches.py
+#
+# Small, mergeable streaming summaries for analytics. Both sketches serialise to
+# plain dicts (JSON / Firestore friendly) and merge without the raw data, so each
+# worker can summarise its own batch and fold it into the stored state.
+
+import base64
+import hashlib
+import math
+from typing import Dict, Iterable, List, Tuple
+
+
+def _hash64(value: str) -> int:
+    # Stable across processes (unlike hash()), so sketches from different workers agree
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters (Metwally et al.) with `capacity` counters.
+
+    Every item whose true count exceeds N / capacity is guaranteed to be tracked.
+    Each counter's `count` over-estimates the true count by at most its `error`.
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = {}  # item -> [count, error]
+
+    def add(self, item: str, weight: int = 1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def update(self, counts: Dict[str, int]):
+        # Heaviest first, so a batch's frequent items don't get evicted by its tail
+        for item, weight in sorted(counts.items(), key=lambda kv: -kv[1]):
+            self.add(item, weight)
+
+    def _floor(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Mergeable-summaries combine: an item missing on one side is charged that side's floor."""
+        floor_a, floor_b = self._floor(), other._floor()
+        merged: Dict[str, List[int]] = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count_a, error_a = self.counters.get(item, (floor_a, floor_a))
+            count_b, error_b = other.counters.get(item, (floor_b, floor_b))
+            merged[item] = [count_a + count_b, error_a + error_b]
+        capacity = max(self.capacity, other.capacity)
+        result = SpaceSaving(capacity)
+        result.counters = dict(sorted(merged.items(), key=lambda kv: -kv[1][0])[:capacity])
+        return result
+
+    def top(self, n: int) -> List[Tuple[str, int]]:
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return [(item, count) for item, (count, _) in ranked[:n]]
+
+    def to_dict(self) -> dict:
+        # A list of maps rather than a map: Firestore rejects some characters in map keys
+        return {
+            "capacity": self.capacity,
+            "counters": [{"item": k, "count": c, "error": e} for k, (c, e) in self.counters.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "SpaceSaving":
+        sketch = cls(state.get("capacity", 200))
+        for counter in state.get("counters", []):
+            sketch.counters[counter["item"]] = [counter["count"], counter["error"]]
+        return sketch
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter with 2**precision one-byte registers.
+
+    The standard error is about 1.04 / sqrt(2**precision): ~1.6% at the default
+    precision of 12, in 4 KB of state regardless of how many items are added.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: str):
+        h = _hash64(item)
+        index = h >> (64 - self.precision)
+        remaining = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        result = HyperLogLog(self.precision)
+        result.registers = bytearray(map(max, self.registers, other.registers))
+        return result
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting is more accurate here
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> dict:
+        return {"precision": self.precision, "registers": base64.b64encode(bytes(self.registers)).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "HyperLogLog":
+        sketch = cls(state.get("precision", 12))
+        if state.get("registers"):
+            sketch.registers = bytearray(base64.b64decode(state["registers"]))
+        return sketch
@@ -0,0 +1,99 @@
+# backend/utils.py
+
+import hashlib
+from pathlib import Path
+from typing import Iterable, Tuple
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+# Uploads are copied to disk in pieces of this size
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Allowance for the multipart boundaries, headers and other form fields around the file
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the size limit; the partial file has been removed."""
+    pass
+
+
+async def save_upload(upload, dest: Path, max_bytes: int, chunk_size: int = UPLOAD_CHUNK_BYTES) -> Tuple[int, str]:
+    """
+    Copies an upload to `dest` a chunk at a time, hashing it on the way, so memory
+    use is one chunk however large the file is. The copy stops as soon as more
+    than `max_bytes` have arrived.
+
+    Args:
+        upload: Anything with an async read(size), e.g. FastAPI's UploadFile.
+        dest: File to write; it is removed again if the copy fails.
+        max_bytes: Largest accepted upload.
+        chunk_size: Bytes read and written at a time.
+
+    Returns:
+        Tuple: (size in bytes, SHA-256 hex digest).
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than `max_bytes`.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest, "wb") as out:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+                sha256.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        Path(dest).unlink(missing_ok=True)
+        raise
+    return size, sha256.hexdigest()
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects oversized request bodies on the given paths with 413 before the
+    form is parsed. Without it, Starlette spools the whole multipart body to
+    disk before the endpoint (and save_upload's own limit) ever runs.
+
+    A Content-Length over the limit is refused without reading the body; a
+    body without one (chunked) is cut off as soon as the limit is passed.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(status_code=413,
+                             detail=f"Request body exceeds maximum ({self.max_bytes // (1024 * 1024)}MB)")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            error = self._too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code,
+                                    headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing; FastAPI turns it into the 413 response
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
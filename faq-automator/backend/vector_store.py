@@ -0,0 +1,80 @@
+# backend/vector_store.py
+#
+# Raw chunk embeddings kept next to each business's FAISS index, so re-uploads
+# can reuse the vectors of unchanged chunks instead of re-embedding them:
+#
+#   {business_id}.vectors     float32, num_chunks x dimension; row i is chunk i
+#   {business_id}.hashes      SHA-1 of each chunk's text (20 bytes), row-aligned
+#   {business_id}.meta.json   embedding model, dimension, num_chunks, source PDF's SHA-256,
+#                             index type and build parameters (see ann_index)
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+DIGEST_SIZE = 20
+
+
+def chunk_digest(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def vectors_file(index_dir: Path, business_id: str) -> Path:
+    return Path(index_dir) / f"{business_id}.vectors"
+
+
+def hashes_file(index_dir: Path, business_id: str) -> Path:
+    return Path(index_dir) / f"{business_id}.hashes"
+
+
+def meta_file(index_dir: Path, business_id: str) -> Path:
+    return Path(index_dir) / f"{business_id}.meta.json"
+
+
+def read_meta(index_dir: Path, business_id: str) -> Optional[dict]:
+    try:
+        with open(meta_file(index_dir, business_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def open_vectors(index_dir: Path, business_id: str, meta: dict) -> np.ndarray:
+    """Memory-maps a business's vectors read-only; rows are paged in as they're touched."""
+    return np.memmap(vectors_file(index_dir, business_id), dtype="float32", mode="r",
+                     shape=(meta["num_chunks"], meta["dimension"]))
+
+
+class StoredVectors:
+    """The embeddings of a business's current index, looked up by chunk content hash."""
+
+    def __init__(self, vectors: Optional[np.ndarray] = None, row_by_digest: Optional[Dict[bytes, int]] = None):
+        self.vectors = vectors
+        self.row_by_digest = row_by_digest or {}
+
+    @classmethod
+    def load(cls, index_dir: Path, business_id: str, model_name: str) -> "StoredVectors":
+        """Loads the stored vectors, or an empty store if there are none or another model made them."""
+        meta = read_meta(index_dir, business_id)
+        if not meta or meta.get("embedding_model") != model_name or not meta.get("num_chunks"):
+            return cls()
+        try:
+            digests = np.fromfile(hashes_file(index_dir, business_id), dtype=np.uint8)
+            vectors = open_vectors(index_dir, business_id, meta)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Stored vectors for {business_id} unusable, embedding from scratch: {e}")
+            return cls()
+        digests = digests.reshape(-1, DIGEST_SIZE)
+        if len(digests) != len(vectors):
+            return cls()
+        return cls(vectors, {row.tobytes(): i for i, row in enumerate(digests)})
+
+    def get(self, digest: bytes) -> Optional[np.ndarray]:
+        row = self.row_by_digest.get(digest)
+        return None if row is None else self.vectors[row]
+
+    def __len__(self) -> int:
+        return len(self.row_by_digest)
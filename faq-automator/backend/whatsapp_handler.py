@@ -1,5 +1,6 @@
 # backend/whatsapp_handler.py
 
+import asyncio
 from fastapi import APIRouter, Form, Response, Request, HTTPException
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.request_validator import RequestValidator
@@ -12,6 +13,11 @@ from backend.voice_transcriber import transcribe_audio
 from backend.firebase_client import store_conversation
 from backend.langgraph_agent import conversational_agent
 from backend.config import settings
+from backend.messaging_client import create_messaging_client
+from backend.reply_queue import ReplyJob, ReplyWorkerPool
+from backend.idempotency import IdempotencyCache
+from backend.conversation_store import create_conversation_store
+from backend.metrics import METRICS
 
 # --- Setup Logging ---
 logging.basicConfig(level=logging.INFO)
@@ -19,10 +25,17 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# --- A simple in-memory cache for conversation history ---
-# This dictionary will store the history for each user (keyed by their WhatsApp number).
-# In a production system with multiple server instances, you'd use a shared store like Redis.
-conversation_history_cache = {}
+# --- Conversation history store ---
+# Keeps the last few turns per user (keyed by their WhatsApp number), forgets idle users
+# and is capped in memory. The SQLite backend lets several workers share history.
+conversation_store = create_conversation_store(
+    settings.CONVERSATION_STORE_BACKEND,
+    max_turns=settings.CONVERSATION_MAX_TURNS,
+    idle_ttl_seconds=settings.CONVERSATION_IDLE_TTL_SECONDS,
+    max_total_bytes=settings.CONVERSATION_MAX_MEMORY_MB * 1024 * 1024,
+    sqlite_path=settings.CONVERSATION_SQLITE_PATH,
+)
+METRICS.register_collector("conversation_store", conversation_store.stats)
 
 # --- Initialize Twilio Request Validator ---
 twilio_validator = RequestValidator(settings.TWILIO_AUTH_TOKEN)
@@ -41,13 +54,130 @@ def validate_twilio_request(request_url: str, params: dict, signature: str) -> b
     """
     return twilio_validator.validate(request_url, params, signature)
 
+class FallbackReply(str):
+    """
+    A reply sent because the real one couldn't be produced (transcription or LLM
+    failure). It isn't cached for Twilio retries or kept in the conversation history.
+    """
+
+
+async def generate_reply(job: ReplyJob) -> str:
+    """
+    Runs transcription (for voice notes), the LangGraph agent and conversation
+    logging for one inbound message, and returns the text to send back
+    (a FallbackReply if it failed).
+    """
+    sender_id = job.sender_id
+
+    # --- Initialize variables ---
+    text_to_process = ""
+    response_prefix = ""
+    query_type = "text"
+    transcription = None
+
+    # --- Determine if the message is text or voice ---
+    if job.num_media > 0 and job.media_url:
+        query_type = "voice"
+        transcribed_text = await transcribe_audio(job.media_url)
+        text_to_process = transcribed_text
+        transcription = transcribed_text
+        response_prefix = f"I heard you say: \"{transcribed_text}\"\n\n"
+    elif job.body:
+        text_to_process = job.body
+    else:
+        logger.warning(f"Received an empty message from {sender_id}.")
+        return "Sorry, I didn't receive a message. Please try sending it again."
+
+    # --- Use the LangGraph Agent to get a response ---
+    if not text_to_process:
+        return FallbackReply("I had trouble understanding your message. Could you please try again?")
+
+    try:
+        # 1. Retrieve the user's past messages from the store
+        # (on a thread: the SQLite backend does disk I/O, which would block the event loop)
+        history = [
+            HumanMessage(content=content) if role == "human" else AIMessage(content=content)
+            for role, content in await asyncio.to_thread(conversation_store.get_history, sender_id)
+        ]
+
+        # 2. Invoke the agent with the current state (async, so the LLM call doesn't block the loop)
+        result = await conversational_agent.ainvoke({
+            "user_query": text_to_process,
+            "business_id": "business_01", # Hardcoded for now
+            "conversation_history": history
+        })
+
+        # 3. Extract the final answer from the agent's result
+        failed = result.get("generation_failed", False) or "ai_answer" not in result
+        ai_answer = result.get("ai_answer", "Sorry, I couldn't generate a response.")
+
+        # 4. Record this new turn (O(1) append; old turns fall off the end)
+        if not failed:
+            await asyncio.to_thread(conversation_store.append_turn, sender_id, text_to_process, ai_answer)
+
+        # --- Log the response ---
+        logger.info(f"Sending AI answer to {sender_id}: '{ai_answer}'")
+
+        conversation_log = {
+            "user_id": sender_id, "business_id": "business_01",
+            "query": text_to_process, "query_type": query_type,
+            "transcription": transcription, "answer": ai_answer,
+        }
+        await store_conversation(conversation_log)
+        reply = f"{response_prefix}{ai_answer}"
+        return FallbackReply(reply) if failed else reply
+    except Exception as agent_error:
+        logger.error(f"Error processing message from {sender_id}: {agent_error}", exc_info=True)
+        return FallbackReply("I encountered an error processing your request. Please try again.")
+
+
+# --- Deduplication of Twilio retries ---
+# Twilio retries slow webhooks with the same MessageSid. Retries join the in-flight attempt
+# (or get its cached reply) instead of re-running transcription and the LLM.
+message_dedupe = IdempotencyCache(
+    ttl_seconds=settings.WEBHOOK_DEDUPE_TTL_SECONDS,
+    max_entries=settings.WEBHOOK_DEDUPE_MAX_ENTRIES,
+)
+METRICS.register_collector("webhook_dedupe", message_dedupe.stats)
+
+
+# --- Acknowledge-then-reply mode ---
+# When WHATSAPP_ASYNC_REPLY is enabled, the webhook returns an empty TwiML response at once
+# and a pool of workers sends the reply through the outbound messaging client instead.
+reply_workers = None
+if settings.WHATSAPP_ASYNC_REPLY:
+    reply_workers = ReplyWorkerPool(
+        handler=generate_reply,
+        client=create_messaging_client(
+            settings.OUTBOUND_MESSAGING_BACKEND,
+            account_sid=settings.TWILIO_ACCOUNT_SID,
+            auth_token=settings.TWILIO_AUTH_TOKEN,
+            from_number=settings.TWILIO_WHATSAPP_NUMBER,
+        ),
+        num_workers=settings.REPLY_WORKERS,
+        max_queue_size=settings.REPLY_QUEUE_MAX_SIZE,
+    )
+    METRICS.register_collector("reply_queue", reply_workers.stats)
+
+
+async def start_reply_workers():
+    if reply_workers is not None:
+        await reply_workers.start()
+
+
+async def stop_reply_workers():
+    if reply_workers is not None:
+        await reply_workers.stop()
+
+
 @router.post("/whatsapp-webhook")
 async def handle_whatsapp(
     request: Request,
     From: str = Form(...),
     Body: str = Form(None),
     NumMedia: int = Form(0),
-    MediaUrl0: str = Form(None)
+    MediaUrl0: str = Form(None),
+    MessageSid: str = Form(None)
 ):
     """
     Handles incoming WhatsApp messages, uses a LangGraph agent for conversational
@@ -80,66 +210,27 @@ async def handle_whatsapp(
             raise HTTPException(status_code=403, detail="Invalid Twilio signature")
         
         logger.info(f"✅ Twilio signature verified for user {sender_id}")
-        
-        # --- Initialize variables ---
-        text_to_process = ""
-        response_prefix = ""
-        query_type = "text"
-        transcription = None
-
-        # --- Determine if the message is text or voice ---
-        if NumMedia > 0 and MediaUrl0:
-            query_type = "voice"
-            transcribed_text = await transcribe_audio(MediaUrl0)
-            text_to_process = transcribed_text
-            transcription = transcribed_text
-            response_prefix = f"I heard you say: \"{transcribed_text}\"\n\n"
-        elif Body:
-            text_to_process = Body
-        else:
-            logger.warning(f"Received an empty message from {sender_id}.")
-            response.message("Sorry, I didn't receive a message. Please try sending it again.")
-            return Response(content=str(response), media_type="application/xml")
-
-        # --- Use the LangGraph Agent to get a response ---
-        if text_to_process:
-            try:
-                # 1. Retrieve the user's past messages from our cache
-                history = conversation_history_cache.get(sender_id, [])
-
-                # 2. Invoke the agent with the current state
-                result = conversational_agent.invoke({
-                    "user_query": text_to_process,
-                    "business_id": "business_01", # Hardcoded for now
-                    "conversation_history": history
-                })
-                
-                # 3. Extract the final answer from the agent's result
-                ai_answer = result.get("ai_answer", "Sorry, I couldn't generate a response.")
-                
-                # 4. Update the history cache with this new turn
-                conversation_history_cache[sender_id] = history + [
-                    HumanMessage(content=text_to_process),
-                    AIMessage(content=ai_answer)
-                ]
-
-                # --- Log and send the response ---
-                logger.info(f"Sending AI answer to {sender_id}: '{ai_answer}'")
-                final_response_message = f"{response_prefix}{ai_answer}"
-                response.message(final_response_message)
-
-                conversation_log = {
-                    "user_id": sender_id, "business_id": "business_01",
-                    "query": text_to_process, "query_type": query_type,
-                    "transcription": transcription, "answer": ai_answer,
-                }
-                await store_conversation(conversation_log)
-            except Exception as agent_error:
-                logger.error(f"Error processing message from {sender_id}: {agent_error}", exc_info=True)
-                response.message("I encountered an error processing your request. Please try again.")
-        else:
-            response.message("I had trouble understanding your message. Could you please try again?")
 
+        job = ReplyJob(
+            sender_id=sender_id, body=Body, num_media=NumMedia,
+            media_url=MediaUrl0, message_sid=MessageSid,
+        )
+
+        # --- Acknowledge now, reply later (falls back to inline if the queue is full) ---
+        if reply_workers is not None:
+            if not message_dedupe.claim(MessageSid):
+                logger.info(f"Duplicate delivery of {MessageSid} from {sender_id} - already queued")
+                return Response(content=str(response), media_type="application/xml")
+            if reply_workers.submit(job):
+                logger.info(f"Queued reply job for {sender_id}")
+                return Response(content=str(response), media_type="application/xml")
+            # Nothing was queued: the inline attempt below decides what a retry gets
+            message_dedupe.release(MessageSid)
+
+        # A fallback reply isn't kept: Twilio's retry should get a real attempt
+        reply = await message_dedupe.run(MessageSid, lambda: generate_reply(job),
+                                         cache_if=lambda reply: not isinstance(reply, FallbackReply))
+        response.message(reply)
         return Response(content=str(response), media_type="application/xml")
 
     except HTTPException:
@@ -150,4 +241,4 @@ async def handle_whatsapp(
         # Always return a 200 OK response with a friendly error message to Twilio
         error_response = MessagingResponse()
         error_response.message("I'm sorry, I'm having a little trouble right now. Please try your question again in a moment.")
-        return Response(content=str(error_response), media_type="application/xml", status_code=200)
\ No newline at end of file
+        return Response(content=str(error_response), media_type="application/xml", status_code=200)
@@ -0,0 +1,39 @@
+# backend/workers.py
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from backend.config import settings
+
+T = TypeVar("T")
+
+# A thread pool (rather than a process pool) is enough here: torch and FAISS release
+# the GIL while they compute, and threads share the one loaded embedding model and
+# the in-process index cache.
+_CPU_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Returns the shared pool for CPU-bound work (embedding, FAISS search, index loads)."""
+    global _CPU_EXECUTOR
+    if _CPU_EXECUTOR is None:
+        _CPU_EXECUTOR = ThreadPoolExecutor(
+            max_workers=settings.CPU_WORKER_THREADS,
+            thread_name_prefix="cpu-worker",
+        )
+    return _CPU_EXECUTOR
+
+
+async def run_cpu_bound(func: Callable[..., T], *args, **kwargs) -> T:
+    """Runs a blocking, CPU-heavy call on the worker pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_cpu_executor():
+    global _CPU_EXECUTOR
+    if _CPU_EXECUTOR is not None:
+        _CPU_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _CPU_EXECUTOR = None
@@ -0,0 +1,99 @@
+# benchmarks/bench_ann_index.py
+#
+# Recall@k versus query latency of the index types ann_index chooses from (flat,
+# HNSW, IVF), for corpora of different sizes, sweeping the search-time knobs
+# (efSearch, nprobe) around their defaults. Recall is measured against the exact
+# flat index.
+#
+# Vectors are synthetic but clustered like real chunk embeddings (many near-
+# duplicate passages around a few thousand topics), L2-normalized, 384-d as with
+# MiniLM. Queries are perturbed corpus vectors, as questions paraphrase passages.
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_ann_index
+
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from backend.ann_index import build_index, choose_index_type, search_params
+from backend.config import settings
+
+DIMENSION = 384
+CORPUS_SIZES = (20_000, 100_000, 300_000)
+NUM_QUERIES = 500
+TOP_K = 3  # What the agent retrieves per question
+EF_SEARCH_SWEEP = (16, 32, 64, 128)
+NPROBE_SWEEP = (4, 8, 16, 32)
+
+
+def synthetic_corpus(num_vectors: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    num_topics = max(10, num_vectors // 50)
+    topics = rng.standard_normal((num_topics, DIMENSION), dtype=np.float32)
+    vectors = topics[rng.integers(num_topics, size=num_vectors)]
+    vectors += 0.6 * rng.standard_normal((num_vectors, DIMENSION), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def synthetic_queries(corpus: np.ndarray, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.integers(len(corpus), size=NUM_QUERIES)].copy()
+    queries += 0.4 * rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(DIMENSION) * 4
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, **knobs) -> tuple:
+    """Returns (recall@TOP_K, p50 ms, p95 ms), searching one query at a time as retrieve_context does."""
+    params = search_params(index, TOP_K, **knobs)
+    found = np.empty((len(queries), TOP_K), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found[i] = index.search(query.reshape(1, -1), TOP_K, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+    recall = np.mean([len(set(f) & set(t)) / TOP_K for f, t in zip(found, truth)])
+    return recall, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def main():
+    faiss.omp_set_num_threads(1)  # One query per request, like the API's worker threads
+    workdir = Path(tempfile.mkdtemp())
+    print(f"{DIMENSION}-d vectors, {NUM_QUERIES} queries, recall@{TOP_K} vs exact search. "
+          f"Defaults: efSearch={settings.ANN_HNSW_EF_SEARCH}, nprobe={settings.ANN_IVF_NPROBE}, "
+          f"flat up to {settings.ANN_FLAT_MAX_VECTORS}, IVF from {settings.ANN_IVF_MIN_VECTORS}\n")
+    print(f"{'chunks':>8}  {'index':<6} {'knob':<13} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+
+    for num_vectors in CORPUS_SIZES:
+        corpus = synthetic_corpus(num_vectors)
+        vectors_file = workdir / f"{num_vectors}.vectors"
+        corpus.tofile(vectors_file)
+        queries = synthetic_queries(corpus)
+        del corpus
+
+        flat, _ = build_index(vectors_file, num_vectors, DIMENSION, "flat")
+        _, truth = flat.search(queries, TOP_K)
+        recall, p50, p95 = measure(flat, queries, truth)
+        print(f"{num_vectors:>8}  {'flat':<6} {'exact':<13} {recall:>7.3f} {p50:>8.3f} {p95:>8.3f} {'-':>8}")
+        del flat
+
+        for index_type, knob, sweep in (("hnsw", "ef_search", EF_SEARCH_SWEEP), ("ivf", "nprobe", NPROBE_SWEEP)):
+            start = time.perf_counter()
+            index, info = build_index(vectors_file, num_vectors, DIMENSION, index_type)
+            build_seconds = time.perf_counter() - start
+            for value in sweep:
+                recall, p50, p95 = measure(index, queries, truth, **{knob: value})
+                print(f"{num_vectors:>8}  {index_type:<6} {f'{knob}={value}':<13} {recall:>7.3f} "
+                      f"{p50:>8.3f} {p95:>8.3f} {build_seconds:>8.1f}")
+            del index
+        print(f"{'':>8}  -> auto choice: {choose_index_type(num_vectors)}\n")
+        vectors_file.unlink()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_chunk_store.py
+#
+# Loading a large business's chunk texts: pickled list (unpickled into Python
+# str objects) versus the memory-mapped chunk store (only the offsets are read;
+# texts are decoded per result). Reports load time, memory added to the
+# process and the time to fetch a top-3 result. Memory is split into private
+# pages (held by every worker separately) and shared file pages (the page cache,
+# held once however many workers map the file).
+#
+# Each variant runs in a fresh subprocess so its memory is measured alone.
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_chunk_store
+
+import pickle
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from backend.chunk_store import ChunkStore, read_pickled_chunks, write_chunk_store
+
+NUM_CHUNKS = 300_000
+CHUNK_CHARS = 250  # The splitter's chunk_size
+NUM_LOOKUPS = 1000
+TOP_K = 3
+
+
+def synthetic_chunks(seed: int = 0):
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(5000)]
+    for i in range(NUM_CHUNKS):
+        text = f"Chunk {i}: "
+        while len(text) < CHUNK_CHARS:
+            text += rng.choice(words) + " "
+        yield text[:CHUNK_CHARS]
+
+
+def memory_mb() -> tuple:
+    """(private, shared file-backed) resident MB of this process; only private memory is per worker."""
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            fields[name] = value
+    return int(fields["RssAnon"].split()[0]) / 1024, int(fields["RssFile"].split()[0]) / 1024
+
+
+def measure(kind: str, path: str):
+    base_private, base_shared = memory_mb()
+    start = time.perf_counter()
+    chunks = read_pickled_chunks(Path(path)) if kind == "pkl" else ChunkStore(Path(path))
+    load_seconds = time.perf_counter() - start
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(NUM_LOOKUPS):
+        [chunks[rng.randrange(NUM_CHUNKS)] for _ in range(TOP_K)]
+    fetch_us = (time.perf_counter() - start) / NUM_LOOKUPS * 1e6
+    private, shared = memory_mb()
+    print(f"{kind:<6} {load_seconds * 1000:>9.1f} {private - base_private:>12.1f} "
+          f"{shared - base_shared:>11.1f} {fetch_us:>10.1f}")
+
+
+def main():
+    if len(sys.argv) == 3:
+        measure(sys.argv[1], sys.argv[2])
+        return
+
+    workdir = Path(tempfile.mkdtemp())
+    chunks = list(synthetic_chunks())
+    pkl_file, store_file = workdir / "bench_chunks.pkl", workdir / "bench_chunks.bin"
+    with open(pkl_file, "wb") as f:
+        pickle.dump(chunks, f)
+    write_chunk_store(store_file, chunks)
+    del chunks
+
+    print(f"{NUM_CHUNKS} chunks of {CHUNK_CHARS} chars: .pkl {pkl_file.stat().st_size / 1e6:.1f} MB, "
+          f".bin {store_file.stat().st_size / 1e6:.1f} MB\n")
+    print(f"{'format':<6} {'load ms':>9} {'private +MB':>12} {'shared +MB':>11} {'top-3 us':>10}")
+    for kind, path in (("pkl", pkl_file), ("mmap", store_file)):
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_chunk_store", kind, str(path)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_conversation_log.py
+#
+# Compares one write per conversation turn (the old store_conversation behaviour)
+# with the write-behind buffer, against a local sink that simulates Firestore latency.
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_conversation_log
+
+import asyncio
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from backend.conversation_log import LocalConversationSink, WriteBehindBuffer
+
+NUM_RECORDS = 500
+ROUND_TRIP_SECONDS = 0.02  # Typical Firestore write latency from a nearby region
+
+
+def make_record(i: int) -> dict:
+    return {
+        "user_id": f"whatsapp:+1555{i % 50:04d}", "business_id": "business_01",
+        "query": f"question {i}", "query_type": "text", "transcription": None,
+        "answer": "Our weekday batches run from 9am to 5pm.", "timestamp": datetime.now(),
+    }
+
+
+async def per_record_writes() -> float:
+    sink = LocalConversationSink(latency_seconds=ROUND_TRIP_SECONDS)
+    start = time.perf_counter()
+    for i in range(NUM_RECORDS):
+        # The old code path: one blocking round-trip inside every request
+        sink.write_batch([make_record(i)])
+    return time.perf_counter() - start
+
+
+async def write_behind() -> tuple:
+    sink = LocalConversationSink(latency_seconds=ROUND_TRIP_SECONDS)
+    spill = Path(tempfile.mkdtemp()) / "spill.jsonl"
+    buffer = WriteBehindBuffer(sink, spill_path=str(spill), max_batch_size=100, flush_interval=0.5)
+    await buffer.start()
+    start = time.perf_counter()
+    for i in range(NUM_RECORDS):
+        buffer.add(make_record(i))
+    request_path = time.perf_counter() - start
+    await buffer.stop()
+    total = time.perf_counter() - start
+    assert len(sink.records) == NUM_RECORDS
+    return request_path, total, sink.write_calls
+
+
+async def main():
+    direct = await per_record_writes()
+    request_path, total, write_calls = await write_behind()
+    print(f"Records: {NUM_RECORDS}, simulated round-trip: {ROUND_TRIP_SECONDS * 1000:.0f} ms")
+    print(f"Per-record writes : {direct:.2f}s total, {direct / NUM_RECORDS * 1000:.2f} ms in each request")
+    print(f"Write-behind      : {total:.2f}s until durable, "
+          f"{request_path / NUM_RECORDS * 1000:.4f} ms in each request, {write_calls} write calls")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
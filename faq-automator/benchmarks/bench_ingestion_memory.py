@@ -0,0 +1,107 @@
+# benchmarks/bench_ingestion_memory.py
+#
+# Peak RSS of PDF ingestion: the old all-in-memory pipeline (full text, every
+# chunk and the full embedding matrix before the index is built) versus the
+# streaming process_pdf, at two document sizes. Each run happens in a fresh
+# subprocess so peaks don't leak between them.
+#
+# Embeddings come from a model-free stand-in (hash-seeded random 384-d vectors),
+# so the numbers measure the pipeline rather than torch.
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_ingestion_memory
+
+import hashlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic_pdf import write_text_pdf
+
+PAGE_COUNTS = (200, 1000)
+DIMENSION = 384
+
+
+def fake_encode(texts, batch_size=None, normalize=True):
+    out = np.empty((len(texts), DIMENSION), dtype="float32")
+    for i, text in enumerate(texts):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "big")
+        out[i] = np.random.default_rng(seed).standard_normal(DIMENSION)
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def legacy_ingest(pdf_path: str, business_id: str) -> int:
+    """The pre-streaming process_pdf: everything in memory at once."""
+    import pickle
+
+    import faiss
+    import PyPDF2
+
+    from backend import pdf_processor
+
+    text = ""
+    with open(pdf_path, "rb") as file:
+        for page in PyPDF2.PdfReader(file).pages:
+            text += page.extract_text() or ""
+    chunks = pdf_processor._make_text_splitter().split_text(text)
+    embeddings = np.vstack([fake_encode(chunks[i:i + 32]) for i in range(0, len(chunks), 32)])
+    index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings)
+    faiss.write_index(index, str(pdf_processor.FAISS_INDEX_PATH / f"{business_id}.index"))
+    with open(pdf_processor.CHUNKS_PATH / f"{business_id}_chunks.pkl", "wb") as f:
+        pickle.dump(chunks, f)
+    return len(chunks)
+
+
+def run_one(mode: str, pdf_path: str):
+    # Imports first, so the baseline includes faiss, PyPDF2 and the splitter
+    from backend import pdf_processor
+    from backend.embedding_service import EMBEDDING_SERVICE
+
+    EMBEDDING_SERVICE.encode = fake_encode
+    # Keep the bench index out of the real data/ directory
+    pdf_processor.FAISS_INDEX_PATH = pdf_processor.CHUNKS_PATH = Path(pdf_path).parent
+    baseline = current_rss_mb()
+    start = time.perf_counter()
+    if mode == "legacy":
+        num_chunks = legacy_ingest(pdf_path, "bench")
+    else:
+        num_chunks = pdf_processor.process_pdf(pdf_path, "bench")["num_chunks"]
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3  # KB on Linux
+    index_mb = num_chunks * DIMENSION * 4 / 1e6
+    print(f"{mode:<10} {num_chunks:>7} chunks  peak +{peak - baseline:7.1f} MB "
+          f"(of which the index itself: {index_mb:5.1f} MB)  {elapsed:6.2f}s")
+
+
+def main():
+    if len(sys.argv) == 3:
+        run_one(sys.argv[1], sys.argv[2])
+        return
+
+    workdir = Path(tempfile.mkdtemp())
+    # Serial extraction, so no pool process holds part of the work outside the measurement
+    env = {**os.environ, "PDF_EXTRACT_WORKERS": "1"}
+    for num_pages in PAGE_COUNTS:
+        pdf_path = str(workdir / f"brochure_{num_pages}.pdf")
+        write_text_pdf(pdf_path, num_pages)
+        print(f"\n{num_pages}-page PDF ({os.path.getsize(pdf_path) / 1e6:.1f} MB)")
+        for mode in ("legacy", "streaming"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_ingestion_memory", mode, pdf_path],
+                           env=env, check=True)
+
+
+if __name__ == '__main__':
+    main()
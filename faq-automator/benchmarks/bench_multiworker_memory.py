@@ -0,0 +1,107 @@
+# benchmarks/bench_multiworker_memory.py
+#
+# Total memory of N API worker processes that each have every tenant's index
+# loaded, with indexes read into private memory (INDEX_MMAP=false) versus
+# memory-mapped read-only (INDEX_MMAP=true, the default).
+#
+# Each worker loads every tenant through the retriever's index cache and runs a
+# search against it, then waits while the parent reads /proc/<pid>/smaps_rollup:
+#   RSS   summed over workers, counts shared pages once per worker (what `ps` shows)
+#   PSS   splits shared pages between the processes mapping them (true total)
+#   anon  private memory only
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_multiworker_memory
+
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from backend.chunk_store import chunk_store_file, write_chunk_store
+from backend.vector_store import meta_file
+
+NUM_WORKERS = 4
+NUM_TENANTS = 200
+CHUNKS_PER_TENANT = 1500
+DIMENSION = 384
+
+
+def write_tenants(data_dir: Path):
+    rng = np.random.default_rng(0)
+    for t in range(NUM_TENANTS):
+        business_id = f"tenant_{t:03d}"
+        vectors = rng.standard_normal((CHUNKS_PER_TENANT, DIMENSION), dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(DIMENSION)
+        index.add(vectors)
+        faiss.write_index(index, str(data_dir / f"{business_id}.index"))
+        write_chunk_store(chunk_store_file(data_dir, business_id),
+                          (f"{business_id} chunk {i}" for i in range(CHUNKS_PER_TENANT)))
+        with open(meta_file(data_dir, business_id), "w", encoding="utf-8") as f:
+            json.dump({"dimension": DIMENSION, "num_chunks": CHUNKS_PER_TENANT,
+                       "index": {"type": "flat", "quantization": "none"}}, f)
+
+
+def worker(data_dir: str, use_mmap: bool, loaded, release):
+    sys.stdout = open(os.devnull, "w")  # The retriever logs every search
+    from backend import retriever
+    from backend.config import settings
+
+    settings.INDEX_MMAP = use_mmap
+    retriever.FAISS_INDEX_PATH = retriever.CHUNKS_PATH = Path(data_dir)
+    retriever.INDEX_CACHE.max_bytes = 1 << 40  # Keep every tenant loaded
+    query = np.random.default_rng(1).standard_normal(DIMENSION, dtype=np.float32)
+    query /= np.linalg.norm(query)
+    for t in range(NUM_TENANTS):
+        index, chunks, vectors = retriever._load_business_data(f"tenant_{t:03d}")
+        retriever._search(index, chunks, query, 3, vectors=vectors)
+    loaded.wait()
+    release.wait()
+
+
+def memory_mb(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss", "Anonymous"):
+                fields[name] = int(value.split()[0]) / 1024
+    return fields
+
+
+def measure(data_dir: Path, use_mmap: bool) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    loaded, release = ctx.Barrier(NUM_WORKERS + 1), ctx.Barrier(NUM_WORKERS + 1)
+    workers = [ctx.Process(target=worker, args=(str(data_dir), use_mmap, loaded, release))
+               for _ in range(NUM_WORKERS)]
+    for p in workers:
+        p.start()
+    loaded.wait()
+    per_worker = [memory_mb(p.pid) for p in workers]
+    release.wait()
+    for p in workers:
+        p.join()
+    return {name: sum(m[name] for m in per_worker) for name in ("Rss", "Pss", "Anonymous")}
+
+
+def main():
+    data_dir = Path(tempfile.mkdtemp())
+    write_tenants(data_dir)
+    index_mb = sum(p.stat().st_size for p in data_dir.glob("*.index")) / 1024 / 1024
+
+    print(f"{NUM_WORKERS} workers x {NUM_TENANTS} tenants of {CHUNKS_PER_TENANT} chunks "
+          f"({index_mb:.0f} MB of index files)\n")
+    print(f"{'mode':<8} {'RSS MB':>9} {'PSS MB':>9} {'anon MB':>9}")
+    for label, use_mmap in (("private", False), ("mmap", True)):
+        totals = measure(data_dir, use_mmap)
+        print(f"{label:<8} {totals['Rss']:>9.0f} {totals['Pss']:>9.0f} {totals['Anonymous']:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
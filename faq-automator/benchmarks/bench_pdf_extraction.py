@@ -0,0 +1,54 @@
+# benchmarks/bench_pdf_extraction.py
+#
+# Serial page-by-page extraction with `text +=` (the old process_pdf loop) versus
+# page ranges extracted across a process pool and joined once, on a generated
+# multi-hundred-page PDF.
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_pdf_extraction [num_pages]
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import PyPDF2
+
+from backend.pdf_extractor import extract_pages
+from benchmarks.synthetic_pdf import write_text_pdf
+
+
+def serial_concat(pdf_path: str) -> str:
+    text = ""
+    with open(pdf_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        for page in reader.pages:
+            text += page.extract_text() or ""
+    return text
+
+
+def main():
+    num_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    pdf_path = str(Path(tempfile.mkdtemp()) / "brochure.pdf")
+    write_text_pdf(pdf_path, num_pages)
+    print(f"{num_pages}-page PDF ({os.path.getsize(pdf_path) / 1e6:.1f} MB), {os.cpu_count()} CPUs\n")
+
+    start = time.perf_counter()
+    expected = serial_concat(pdf_path)
+    baseline = time.perf_counter() - start
+    print(f"serial, text +=          {baseline:6.2f}s")
+
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        pages = extract_pages(pdf_path, workers=workers, min_parallel_pages=1)
+        elapsed = time.perf_counter() - start
+        assert "".join(text for text, _ in pages) == expected, "page order or text differs"
+        page_seconds = sorted(seconds for _, seconds in pages)
+        print(f"extract_pages({workers} proc)  {elapsed:6.2f}s  ({baseline / elapsed:.2f}x)  "
+              f"page p50 {page_seconds[len(page_seconds) // 2] * 1000:.1f}ms, "
+              f"max {page_seconds[-1] * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
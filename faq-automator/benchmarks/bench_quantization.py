@@ -0,0 +1,81 @@
+# benchmarks/bench_quantization.py
+#
+# Memory per 10k chunks, query latency and recall@3 of quantized indexes (SQ8,
+# PQ) against the exact float32 flat index, with and without exact re-scoring of
+# the top candidates from the memory-mapped float32 vectors file, as the
+# retriever does.
+#
+# Uses the clustered synthetic corpus of bench_ann_index.
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_quantization
+
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from backend.ann_index import build_index, rerank_exact, search_params
+from backend.config import settings
+from benchmarks.bench_ann_index import DIMENSION, TOP_K, synthetic_corpus, synthetic_queries
+
+NUM_VECTORS = 100_000
+CONFIGURATIONS = (
+    ("flat", "none"), ("flat", "sq8"), ("flat", "pq"),
+    ("ivf", "none"), ("ivf", "sq8"), ("ivf", "pq"),
+)
+
+
+def measure(index, vectors, queries: np.ndarray, truth: np.ndarray, rerank_factor: int) -> tuple:
+    """Returns (recall@TOP_K, p50 ms, p95 ms); re-scores from `vectors` when rerank_factor > 1."""
+    num_candidates = TOP_K * rerank_factor
+    params = search_params(index, num_candidates)
+    found = np.empty((len(queries), TOP_K), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, candidates = index.search(query.reshape(1, -1), num_candidates, params=params)
+        if rerank_factor > 1:
+            _, found[i] = rerank_exact(vectors, query, candidates[0], TOP_K)
+        else:
+            found[i] = candidates[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+    recall = np.mean([len(set(f) & set(t)) / TOP_K for f, t in zip(found, truth)])
+    return recall, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+def main():
+    faiss.omp_set_num_threads(1)
+    workdir = Path(tempfile.mkdtemp())
+    vectors_file = workdir / "bench.vectors"
+    corpus = synthetic_corpus(NUM_VECTORS)
+    corpus.tofile(vectors_file)
+    queries = synthetic_queries(corpus)
+    del corpus
+    vectors = np.memmap(vectors_file, dtype="float32", mode="r", shape=(NUM_VECTORS, DIMENSION))
+
+    print(f"{NUM_VECTORS} chunks, {DIMENSION}-d, {len(queries)} queries, recall@{TOP_K} vs exact flat search "
+          f"(PQ{settings.ANN_PQ_SUBQUANTIZERS}, nprobe={settings.ANN_IVF_NPROBE})\n")
+    print(f"{'index':<6} {'quant':<5} {'MB/10k':>7} {'rerank':>7} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+
+    truth = None
+    for index_type, quantization in CONFIGURATIONS:
+        start = time.perf_counter()
+        index, _ = build_index(vectors_file, NUM_VECTORS, DIMENSION, index_type, quantization)
+        build_seconds = time.perf_counter() - start
+        # The serialized size is what the index cache holds per business (chunk texts aside)
+        mb_per_10k = len(faiss.serialize_index(index)) / NUM_VECTORS * 10_000 / 1024 / 1024
+        if truth is None:
+            _, truth = index.search(queries, TOP_K)
+        for rerank_factor in ((1,) if quantization == "none" else (1, 4, settings.ANN_RERANK_FACTOR)):
+            recall, p50, p95 = measure(index, vectors, queries, truth, rerank_factor)
+            rerank = f"x{rerank_factor}" if rerank_factor > 1 else "-"
+            print(f"{index_type:<6} {quantization:<5} {mb_per_10k:>7.2f} {rerank:>7} {recall:>7.3f} "
+                  f"{p50:>8.3f} {p95:>8.3f} {build_seconds:>8.1f}")
+        del index
+
+
+if __name__ == '__main__':
+    main()
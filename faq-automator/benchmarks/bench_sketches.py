@@ -0,0 +1,91 @@
+# benchmarks/bench_sketches.py
+#
+# Accuracy and memory of the analytics sketches (Space-Saving top queries,
+# HyperLogLog unique users) against exact Counter / set computation, on a
+# synthetic conversation log with Zipf-distributed questions. The stream is
+# split across several "workers" whose sketches are merged, as in production.
+#
+# Run from the faq-automator directory:
+#     python -m benchmarks.bench_sketches
+
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+from backend.analytics import TOP_QUERIES_LIMIT, aggregate_by_business
+from backend.sketches import HyperLogLog, SpaceSaving
+
+NUM_RECORDS = 200_000
+NUM_DISTINCT_QUERIES = 20_000
+NUM_USERS = 30_000
+NUM_WORKERS = 4
+BATCH_SIZE = 100  # Matches the default write-behind batch size
+ZIPF_EXPONENT = 1.1
+
+
+def synthetic_log(seed: int = 7):
+    rng = random.Random(seed)
+    weights = [1 / (rank ** ZIPF_EXPONENT) for rank in range(1, NUM_DISTINCT_QUERIES + 1)]
+    queries = rng.choices(range(NUM_DISTINCT_QUERIES), weights=weights, k=NUM_RECORDS)
+    for q in queries:
+        yield {
+            "business_id": "business_01", "user_id": f"whatsapp:+1555{rng.randrange(NUM_USERS):07d}",
+            "query": f"question number {q}", "query_type": "text", "timestamp": "2026-01-01T00:00:00",
+        }
+
+
+def exact_size_bytes(counts: Counter, users: set) -> int:
+    size = sys.getsizeof(counts) + sys.getsizeof(users)
+    size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in counts.items())
+    return size + sum(sys.getsizeof(u) for u in users)
+
+
+def main():
+    records = list(synthetic_log())
+
+    start = time.perf_counter()
+    exact_counts = Counter(r["query"] for r in records)
+    exact_users = {r["user_id"] for r in records}
+    exact_seconds = time.perf_counter() - start
+
+    # Each worker folds its own write batches into its own sketch state...
+    start = time.perf_counter()
+    worker_states = [{} for _ in range(NUM_WORKERS)]
+    for batch_no, offset in enumerate(range(0, NUM_RECORDS, BATCH_SIZE)):
+        delta = aggregate_by_business(records[offset:offset + BATCH_SIZE])["business_01"]
+        state = worker_states[batch_no % NUM_WORKERS]
+        delta.merge_into(state)
+    sketch_seconds = time.perf_counter() - start
+
+    # ...and the states are merged, as concurrent flushes into one analytics doc would be
+    top = SpaceSaving.from_dict(worker_states[0]["sketches"]["top_queries"])
+    hll = HyperLogLog.from_dict(worker_states[0]["sketches"]["unique_users"])
+    for state in worker_states[1:]:
+        top = top.merge(SpaceSaving.from_dict(state["sketches"]["top_queries"]))
+        hll = hll.merge(HyperLogLog.from_dict(state["sketches"]["unique_users"]))
+
+    exact_top = exact_counts.most_common(TOP_QUERIES_LIMIT)
+    approx_top = top.top(TOP_QUERIES_LIMIT)
+    recall = len({q for q, _ in exact_top} & {q for q, _ in approx_top}) / TOP_QUERIES_LIMIT
+    max_count_error = max(abs(count - exact_counts[q]) / exact_counts[q] for q, count in approx_top)
+    users_estimate = hll.count()
+    users_error = abs(users_estimate - len(exact_users)) / len(exact_users)
+    sketch_bytes = len(json.dumps({"top_queries": top.to_dict(), "unique_users": hll.to_dict()}))
+
+    print(f"{NUM_RECORDS} records, {len(exact_counts)} distinct queries, {len(exact_users)} users, "
+          f"{NUM_WORKERS} workers x batches of {BATCH_SIZE}\n")
+    print(f"Top-{TOP_QUERIES_LIMIT} recall:            {recall:.0%}")
+    print(f"Max top-{TOP_QUERIES_LIMIT} count error:   {max_count_error:.2%}")
+    print(f"Unique users:              {users_estimate} estimated vs {len(exact_users)} exact ({users_error:.2%} error)")
+    print(f"State size:                {sketch_bytes / 1024:.1f} KB sketches vs "
+          f"{exact_size_bytes(exact_counts, exact_users) / 1024:.0f} KB exact (in memory)")
+    print(f"Time:                      {sketch_seconds:.2f}s sketching vs {exact_seconds:.2f}s exact")
+    print("\nTop queries (exact vs sketch):")
+    for (q1, c1), (q2, c2) in zip(exact_top, approx_top):
+        print(f"  {q1:<22} {c1:>6}   {q2:<22} {c2:>6}")
+
+
+if __name__ == '__main__':
+    main()
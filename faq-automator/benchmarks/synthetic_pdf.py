@@ -0,0 +1,66 @@
+# benchmarks/synthetic_pdf.py
+#
+# Writes plain-text PDFs of any length without extra dependencies, for the
+# ingestion benchmarks. Pages use the built-in Helvetica font, so PyPDF2 can
+# extract their text like a real brochure's.
+
+import random
+from typing import Iterable
+
+WORDS = (
+    "admission fees batch timing weekday weekend course syllabus faculty hostel "
+    "scholarship refund policy certificate placement library laboratory transport "
+    "canteen uniform registration deadline semester examination result counselling"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(page_no: int, lines_per_page: int, rng: random.Random):
+    yield f"Section {page_no + 1}: frequently asked questions"
+    for line_no in range(lines_per_page - 1):
+        yield f"Q{page_no + 1}.{line_no + 1} " + " ".join(rng.choice(WORDS) for _ in range(12))
+
+
+def write_text_pdf(path: str, num_pages: int, lines_per_page: int = 40, seed: int = 0,
+                   edited_pages: Iterable[int] = ()):
+    """
+    Writes a `num_pages`-page PDF with `lines_per_page` lines of text per page.
+    Each page's text depends only on (seed, page number); pages in `edited_pages`
+    get different text, to simulate a lightly revised brochure.
+    """
+    edited_pages = set(edited_pages)
+    objects = {}
+    # 1: catalog, 2: page tree, 3: font, then (page, content stream) per page
+    page_ids = [4 + 2 * i for i in range(num_pages)]
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{pid} 0 R" for pid in page_ids), num_pages)).encode()
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    for page_no, page_id in enumerate(page_ids):
+        content_id = page_id + 1
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        rng = random.Random(f"{seed}-{page_no}-{'edited' if page_no in edited_pages else 'original'}")
+        for line in page_lines(page_no, lines_per_page, rng):
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    xref_at = len(out)
+    count = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % count
+    for obj_id in range(1, count):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref_at)
+    with open(path, "wb") as f:
+        f.write(out)
@@ -44,14 +44,13 @@ def fetch_analytics(business_id: str = BUSINESS_ID_DEFAULT) -> dict:
 def page_home():
     st.header("Home — Key Metrics")
     analytics = fetch_analytics()
-    conversations = fetch_conversations(limit=1000)
 
     col1, col2, col3, col4 = st.columns(4)
-    total_queries = analytics.get("total_queries", len(conversations))
+    total_queries = analytics.get("total_queries", 0)
     top_queries_list = analytics.get("top_queries", [])
     query_type_counts = analytics.get("query_type_counts", {})
-
-    unique_users = len(set([c.get("user_id") for c in conversations if c.get("user_id")]))
+    # Estimated from a HyperLogLog sketch, so it covers all conversations, not just a page of them
+    unique_users = analytics.get("unique_users", 0)
 
     col1.metric("Total Queries", total_queries)
     col2.metric("Unique Users", unique_users)
@@ -75,31 +74,28 @@ def page_home():
 # --- Page: Analytics (charts) ---
 def page_analytics():
     st.header("Analytics — Trends & Charts")
-    conversations = fetch_conversations(limit=2000)
-    if not conversations:
+    # Pre-aggregated counters: no need to download every conversation to draw these
+    analytics = fetch_analytics()
+    if not analytics or not analytics.get("total_queries"):
         st.warning("No conversation data available for analytics.")
         return
 
-    df = pd.DataFrame(conversations)
-    if 'timestamp' in df.columns:
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
-    else:
-        st.warning("Timestamps missing from data; charts will be limited.")
-        df['date'] = pd.NaT
-
     # Queries per day
-    queries_per_day = df.groupby('date').size().reset_index(name='count')
+    daily_counts = analytics.get("daily_counts", {})
+    queries_per_day = pd.DataFrame(
+        [{"date": day, "count": count} for day, count in sorted(daily_counts.items()) if day != "unknown"]
+    )
     if not queries_per_day.empty:
+        queries_per_day['date'] = pd.to_datetime(queries_per_day['date'])
         fig = px.line(queries_per_day, x='date', y='count', title='Queries per Day')
         st.plotly_chart(fig, width='stretch')
     else:
         st.info("Not enough data to plot queries per day.")
 
     # Query type distribution
-    if 'query_type' in df.columns:
-        qtype = df['query_type'].fillna('unknown').value_counts().reset_index()
-        qtype.columns = ['query_type', 'count']
+    query_type_counts = analytics.get("query_type_counts", {})
+    if query_type_counts:
+        qtype = pd.DataFrame([{"query_type": k, "count": v} for k, v in query_type_counts.items()])
         fig2 = px.pie(qtype, names='query_type', values='count', title='Query Type Distribution')
         st.plotly_chart(fig2, width='stretch')
     else:
@@ -0,0 +1,116 @@
+# tests/test_analytics.py
+
+import json
+import random
+from collections import Counter
+from datetime import datetime
+
+from backend.analytics import AnalyticsDelta, aggregate_by_business, format_analytics
+from backend.sketches import HyperLogLog, SpaceSaving
+
+
+def record(query, user_id="whatsapp:+1", query_type="text", business_id="biz", day="2024-05-01"):
+    return {"business_id": business_id, "user_id": user_id, "query": query,
+            "query_type": query_type, "timestamp": f"{day}T10:00:00"}
+
+
+def zipf_stream(num_items, num_distinct, seed=3):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, num_distinct + 1)]
+    return rng.choices([f"query {i}" for i in range(num_distinct)], weights=weights, k=num_items)
+
+
+def test_deltas_merge_into_the_stored_counters():
+    counters = {}
+    first = aggregate_by_business([
+        record("What are your HOURS? "),
+        record("what are your hours?", user_id="whatsapp:+2", query_type="voice"),
+        record("price", business_id="other"),
+    ])
+    second = AnalyticsDelta()
+    second.add(record("price", day="2024-05-02"))
+    second.add({"business_id": "biz", "query": "parking", "timestamp": datetime(2024, 5, 2, 9)})
+
+    first["biz"].merge_into(counters)
+    second.merge_into(counters)
+
+    assert set(first) == {"biz", "other"}
+    assert counters["total_queries"] == 4
+    assert counters["query_type_counts"] == {"text": 2, "voice": 1, "unknown": 1}
+    assert counters["daily_counts"] == {"2024-05-01": 2, "2024-05-02": 2}
+    analytics = format_analytics(counters)
+    assert analytics["top_queries"][0] == {"query": "what are your hours?", "count": 2}
+    assert analytics["unique_users"] == 2
+
+
+def test_format_analytics_survives_a_serialisation_round_trip():
+    delta = aggregate_by_business(record(q, user_id=f"whatsapp:+{i}")
+                                  for i, q in enumerate(zipf_stream(500, 40)))["biz"]
+    counters = {}
+    delta.merge_into(counters)
+
+    # Firestore stores plain JSON-like values
+    restored = json.loads(json.dumps(counters))
+
+    assert format_analytics(restored) == format_analytics(counters)
+    assert format_analytics(restored)["total_queries"] == 500
+    assert format_analytics(None) == {"total_queries": 0, "unique_users": 0, "query_type_counts": {},
+                                      "daily_counts": {}, "top_queries": []}
+
+
+def test_sketches_round_trip_through_dicts():
+    top = SpaceSaving(capacity=5)
+    top.update(Counter(zipf_stream(200, 20)))
+    users = HyperLogLog(precision=10)
+    users.update(f"user {i}" for i in range(300))
+
+    restored_top = SpaceSaving.from_dict(json.loads(json.dumps(top.to_dict())))
+    restored_users = HyperLogLog.from_dict(json.loads(json.dumps(users.to_dict())))
+
+    assert restored_top.capacity == 5
+    assert restored_top.counters == top.counters
+    assert restored_users.precision == 10
+    assert restored_users.registers == users.registers
+
+
+def check_space_saving_bounds(sketch, true_counts, total):
+    threshold = total / sketch.capacity
+    for item, (count, error) in sketch.counters.items():
+        assert count - error <= true_counts[item] <= count
+        assert error <= threshold
+    for item, true_count in true_counts.items():
+        if true_count > threshold:
+            assert item in sketch.counters
+
+
+def test_space_saving_stays_within_its_error_bounds_on_a_skewed_stream():
+    stream = zipf_stream(20000, 2000)
+    true_counts = Counter(stream)
+
+    single = SpaceSaving(capacity=50)
+    for item in stream:
+        single.add(item)
+    # As stored: each batch summarised on its own, then merged into the running state
+    merged = SpaceSaving(capacity=50)
+    for start in range(0, len(stream), 1000):
+        batch = SpaceSaving(capacity=50)
+        batch.update(Counter(stream[start:start + 1000]))
+        merged = merged.merge(batch)
+
+    for sketch in (single, merged):
+        check_space_saving_bounds(sketch, true_counts, len(stream))
+        assert [item for item, _ in sketch.top(3)] == [item for item, _ in true_counts.most_common(3)]
+
+
+def test_hyperloglog_estimate_is_within_the_expected_error():
+    for num_distinct in (100, 5000, 50000):
+        sketch = HyperLogLog(precision=12)
+        halves = HyperLogLog(precision=12), HyperLogLog(precision=12)
+        for i in range(num_distinct):
+            sketch.add(f"whatsapp:+{i}")
+            sketch.add(f"whatsapp:+{i}")  # Repeats don't count
+            halves[i % 2].add(f"whatsapp:+{i}")
+
+        # Three standard errors (1.04 / sqrt(4096) = 1.6%)
+        assert abs(sketch.count() - num_distinct) <= 0.05 * num_distinct
+        assert halves[0].merge(halves[1]).count() == sketch.count()
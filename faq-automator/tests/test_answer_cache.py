@@ -0,0 +1,100 @@
+# tests/test_answer_cache.py
+
+import numpy as np
+import pytest
+
+from backend import answer_cache
+from backend.answer_cache import SemanticAnswerCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(answer_cache, "time", clock)
+    return clock
+
+
+def unit(cosine, axis=1):
+    """A unit vector whose cosine similarity with BASE is `cosine`."""
+    vector = np.zeros(4, dtype=np.float32)
+    vector[0] = cosine
+    vector[axis] = np.sqrt(1 - cosine ** 2)
+    return vector
+
+
+BASE = unit(1.0)
+
+
+def test_similar_query_hits_just_above_the_threshold(clock):
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store("biz", BASE, "We open at 9.", version="v1", llm_seconds=2.0)
+
+    assert cache.lookup("biz", unit(0.901), version="v1") == "We open at 9."
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["saved_llm_seconds"] == 2.0
+
+
+def test_query_just_below_the_threshold_misses(clock):
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.store("biz", BASE, "We open at 9.", version="v1")
+
+    assert cache.lookup("biz", unit(0.899), version="v1") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.store("biz", BASE, "We open at 9.", version="v1")
+
+    clock.now += 60
+    assert cache.lookup("biz", BASE, version="v1") == "We open at 9."
+    clock.now += 1
+    assert cache.lookup("biz", BASE, version="v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_answer_is_evicted_at_capacity(clock):
+    cache = SemanticAnswerCache(similarity_threshold=0.99, max_entries_per_business=2)
+    hours, prices, parking = unit(1.0), unit(0.0, axis=1), unit(0.0, axis=2)
+    cache.store("biz", hours, "hours", version="v1")
+    clock.now += 1
+    cache.store("biz", prices, "prices", version="v1")
+    clock.now += 1
+    cache.lookup("biz", hours, version="v1")  # "prices" is now the least recently used
+    clock.now += 1
+    cache.store("biz", parking, "parking", version="v1")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("biz", hours, version="v1") == "hours"
+    assert cache.lookup("biz", parking, version="v1") == "parking"
+    assert cache.lookup("biz", prices, version="v1") is None
+
+
+def test_invalidate_drops_only_that_business(clock):
+    cache = SemanticAnswerCache()
+    cache.store("biz", BASE, "ours", version="v1")
+    cache.store("other", BASE, "theirs", version="v1")
+
+    cache.invalidate("biz")
+
+    assert cache.lookup("biz", BASE, version="v1") is None
+    assert cache.lookup("other", BASE, version="v1") == "theirs"
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_new_index_version_drops_the_business_answers(clock):
+    cache = SemanticAnswerCache()
+    cache.store("biz", BASE, "from the old PDF", version="v1")
+
+    assert cache.lookup("biz", BASE, version="v2") is None
+    assert cache.stats()["invalidations"] == 1
+    # Going back to the old version doesn't bring its answers back
+    assert cache.lookup("biz", BASE, version="v1") is None
@@ -0,0 +1,81 @@
+# tests/test_conversation_log.py
+
+from datetime import datetime
+
+import pytest
+
+from backend.conversation_log import ConversationSink, LocalConversationSink, WriteBehindBuffer
+
+
+class FailingSink(ConversationSink):
+    """A sink whose backend is down."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def write_batch(self, records):
+        self.attempts += 1
+        raise ConnectionError("sink unavailable")
+
+
+def make_record(i: int) -> dict:
+    return {"business_id": "business_01", "user_id": f"whatsapp:+1{i}", "query": f"q{i}",
+            "response": "a", "query_type": "faq", "timestamp": datetime(2024, 1, 1, 12, 0, i % 60)}
+
+
+def spilled_lines(buffer: WriteBehindBuffer) -> list:
+    with open(buffer.spill_path, encoding="utf-8") as f:
+        return [line for line in f if line.strip()]
+
+
+@pytest.mark.asyncio
+async def test_stop_spills_every_record_when_sink_is_down(tmp_path):
+    buffer = WriteBehindBuffer(FailingSink(), str(tmp_path / "spill.jsonl"), max_batch_size=10)
+    for i in range(35):
+        buffer.add(make_record(i))
+
+    await buffer.stop()
+
+    assert len(spilled_lines(buffer)) == 35
+    assert buffer.stats()["buffered"] == 0
+    assert buffer.stats()["spilled"] == 35
+
+
+@pytest.mark.asyncio
+async def test_spilled_records_are_replayed_once_sink_recovers(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    failing = WriteBehindBuffer(FailingSink(), spill_path, max_batch_size=10)
+    for i in range(35):
+        failing.add(make_record(i))
+    await failing.stop()
+
+    sink = LocalConversationSink()
+    recovered = WriteBehindBuffer(sink, spill_path, max_batch_size=10)
+    await recovered.start()
+    await recovered.stop()
+
+    assert sorted(r["query"] for r in sink.records) == sorted(f"q{i}" for i in range(35))
+    assert sink.records[0]["timestamp"] == datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_leftover_replay_file_is_replayed_before_the_newer_spill(tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    failing = WriteBehindBuffer(FailingSink(), str(spill_path), max_batch_size=10)
+    for i in range(5):
+        failing.add(make_record(i))
+    await failing.stop()
+    # A replay crashed after taking the spill file; records spilled since then start a new one
+    spill_path.replace(spill_path.with_suffix(".replaying"))
+    for i in range(5, 8):
+        failing.add(make_record(i))
+    await failing.stop()
+
+    sink = LocalConversationSink()
+    recovered = WriteBehindBuffer(sink, str(spill_path), max_batch_size=10)
+    await recovered.start()
+    await recovered.stop()
+
+    assert [r["query"] for r in sink.records] == [f"q{i}" for i in range(8)]
+    assert not spill_path.exists()
+    assert not spill_path.with_suffix(".replaying").exists()
@@ -0,0 +1,87 @@
+# tests/test_conversation_store.py
+
+import pytest
+
+from backend import conversation_store
+from backend.conversation_store import InMemoryConversationStore, SQLiteConversationStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(conversation_store, "time", clock)
+    return clock
+
+
+def test_only_the_most_recent_turns_are_kept(clock):
+    store = InMemoryConversationStore(max_turns=2)
+    for i in range(5):
+        store.append_turn("whatsapp:+1", f"q{i}", f"a{i}")
+
+    assert store.get_history("whatsapp:+1") == [("human", "q3"), ("ai", "a3"), ("human", "q4"), ("ai", "a4")]
+    # Trimmed messages no longer count towards the size
+    assert store.stats()["bytes"] == 4 * (2 + 100)
+
+
+def test_idle_sender_is_forgotten_after_the_ttl(clock):
+    store = InMemoryConversationStore(idle_ttl_seconds=60)
+    store.append_turn("whatsapp:+1", "hi", "hello")
+    store.append_turn("whatsapp:+2", "hi", "hello")
+
+    clock.now += 30
+    store.append_turn("whatsapp:+2", "still there?", "yes")
+    clock.now += 31
+
+    assert store.get_history("whatsapp:+1") == []
+    assert len(store.get_history("whatsapp:+2")) == 4
+    assert store.stats()["expired"] == 1
+    assert store.stats()["bytes"] == sum(len(text) + 100 for text in ("hi", "hello", "still there?", "yes"))
+
+
+def test_least_recently_active_senders_are_evicted_over_the_byte_cap(clock):
+    turn_bytes = 2 * (1 + 100)
+    store = InMemoryConversationStore(max_total_bytes=3 * turn_bytes)
+    for sender in ("a", "b", "c"):
+        store.append_turn(sender, "q", "a")
+        clock.now += 1
+    # A second turn from "a" goes over the cap: "b" is now the least recently active sender
+    store.append_turn("a", "q", "a")
+    assert store.get_history("b") == []
+    assert store.get_history("c") == [("human", "q"), ("ai", "a")]
+
+    clock.now += 1
+    store.append_turn("d", "q", "a")
+
+    assert store.get_history("c") == []
+    assert len(store.get_history("a")) == 4
+    assert store.get_history("d") == [("human", "q"), ("ai", "a")]
+    assert store.stats()["evicted"] == 2
+    assert store.stats()["bytes"] == 3 * turn_bytes
+
+
+def test_sqlite_store_round_trip(tmp_path, clock):
+    db_path = str(tmp_path / "conversations.db")
+    store = SQLiteConversationStore(db_path, max_turns=2, idle_ttl_seconds=60)
+    for i in range(3):
+        store.append_turn("whatsapp:+1", f"q{i}", f"a{i}")
+    store.append_turn("whatsapp:+2", "hi", "hello")
+
+    # Another worker opening the same file sees the same history
+    reopened = SQLiteConversationStore(db_path, max_turns=2, idle_ttl_seconds=60)
+    assert reopened.get_history("whatsapp:+1") == [("human", "q1"), ("ai", "a1"), ("human", "q2"), ("ai", "a2")]
+    assert reopened.get_history("whatsapp:+2") == [("human", "hi"), ("ai", "hello")]
+    assert reopened.stats() == {"backend": "sqlite", "senders": 2, "messages": 6}
+
+    clock.now += 61
+    assert reopened.get_history("whatsapp:+1") == []
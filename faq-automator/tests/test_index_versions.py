@@ -0,0 +1,125 @@
+# tests/test_index_versions.py
+
+import json
+import os
+import threading
+import time
+
+import faiss
+import numpy as np
+
+from backend import retriever
+from backend.chunk_store import chunk_store_file, write_chunk_store
+from backend.index_cache import IndexCache
+from backend.index_versions import (
+    STALE_STAGING_SECONDS, collect_garbage, create_staging_dir, current_version, list_versions, locate, publish,
+)
+from backend.vector_store import meta_file
+
+DIMENSION = 8
+
+
+def write_build(directory, business_id, num_chunks):
+    """A complete build whose index and chunks both identify it by their size."""
+    vectors = np.random.default_rng(num_chunks).standard_normal((num_chunks, DIMENSION), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(DIMENSION)
+    index.add(vectors)
+    faiss.write_index(index, str(directory / f"{business_id}.index"))
+    write_chunk_store(chunk_store_file(directory, business_id),
+                      (f"build {num_chunks} chunk {i}" for i in range(num_chunks)))
+    with open(meta_file(directory, business_id), "w", encoding="utf-8") as f:
+        json.dump({"dimension": DIMENSION, "num_chunks": num_chunks,
+                   "index": {"type": "flat", "quantization": "none"}}, f)
+
+
+def publish_build(root, business_id, num_chunks, keep=2):
+    staging_dir = create_staging_dir(root, business_id)
+    write_build(staging_dir, business_id, num_chunks)
+    return publish(root, root, business_id, staging_dir, keep=keep)
+
+
+def test_readers_never_see_a_missing_or_mixed_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(retriever, "FAISS_INDEX_PATH", tmp_path)
+    monkeypatch.setattr(retriever, "CHUNKS_PATH", tmp_path)
+    monkeypatch.setattr(retriever, "INDEX_CACHE", IndexCache(retriever._load_business_files, max_bytes=1 << 30))
+    write_build(tmp_path, "biz", 10)  # Indexed before versioning
+    errors, loads = [], [0]
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            try:
+                data = retriever._load_business_data("biz")
+                if data is None:
+                    errors.append("no index")
+                    continue
+                index, chunks, _ = data
+                if index.ntotal != len(chunks) or not chunks[-1].startswith(f"build {index.ntotal} "):
+                    errors.append(f"index of {index.ntotal} vectors with {chunks[-1]!r}")
+                loads[0] += 1
+            except Exception as e:
+                errors.append(repr(e))
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    try:
+        for num_chunks in range(11, 41):
+            publish_build(tmp_path, "biz", num_chunks)
+            time.sleep(0.002)
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+
+    assert errors == []
+    assert loads[0] > 0
+    assert len(list_versions(tmp_path, "biz")) == 2
+    assert locate(tmp_path, tmp_path, "biz").version == current_version(tmp_path, "biz")
+    assert len(retriever._load_business_data("biz")[1]) == 40
+
+
+def test_legacy_files_are_read_until_the_first_publish(tmp_path):
+    write_build(tmp_path, "biz", 5)
+    legacy = locate(tmp_path, tmp_path, "biz")
+    assert legacy.version is None
+    assert legacy.index_file == tmp_path / "biz.index"
+
+    version = publish_build(tmp_path, "biz", 6)
+
+    assert locate(tmp_path, tmp_path, "biz").version == version
+    assert not (tmp_path / "biz.index").exists()
+    assert not chunk_store_file(tmp_path, "biz").exists()
+    assert not meta_file(tmp_path, "biz").exists()
+
+
+def test_unpublished_build_is_invisible(tmp_path):
+    staging_dir = create_staging_dir(tmp_path, "biz")
+    write_build(staging_dir, "biz", 5)
+
+    assert locate(tmp_path, tmp_path, "biz") is None
+    assert list_versions(tmp_path, "biz") == []
+
+
+def test_garbage_collection_keeps_newest_versions_and_current(tmp_path):
+    versions = [publish_build(tmp_path, "biz", n, keep=10) for n in range(1, 6)]
+
+    # Point back at an old version, as a rollback would
+    (tmp_path / "biz" / "CURRENT").write_text(versions[0])
+    deleted = collect_garbage(tmp_path, "biz", keep=2)
+
+    assert deleted == versions[1:3]
+    assert list_versions(tmp_path, "biz") == [versions[0]] + versions[3:]
+
+
+def test_abandoned_staging_dirs_are_removed(tmp_path):
+    abandoned = create_staging_dir(tmp_path, "biz")
+    in_progress = create_staging_dir(tmp_path, "biz")
+    old = time.time() - STALE_STAGING_SECONDS - 60
+    os.utime(abandoned, (old, old))
+
+    collect_garbage(tmp_path, "biz")
+
+    assert not abandoned.exists()
+    assert in_progress.exists()
@@ -0,0 +1,90 @@
+# tests/test_ingestion_jobs.py
+
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from backend.ingestion_jobs import IngestionJobManager
+
+
+def fake_ingestion_job(job_id, pdf_path, business_id, jobs_dir, pdf_sha256=None):
+    """Stands in for run_ingestion_job in the pool process; a "crash" PDF kills the process."""
+    if pdf_path.endswith("crash.pdf"):
+        os.kill(os.getpid(), signal.SIGKILL)
+    if pdf_path.endswith("slow.pdf"):
+        time.sleep(1)
+    return {"status": "success", "num_chunks": 1, "pdf_path": pdf_path}
+
+
+async def wait_for_jobs(manager, timeout=60):
+    async def idle():
+        while manager.stats()["pending"]:
+            await asyncio.sleep(0.05)
+    await asyncio.wait_for(idle(), timeout)
+
+
+@pytest.mark.asyncio
+async def test_next_job_runs_after_a_worker_process_dies(tmp_path):
+    manager = IngestionJobManager(str(tmp_path / "jobs"), max_concurrent=1, job_fn=fake_ingestion_job)
+    try:
+        crashed = await manager.submit("biz", str(tmp_path / "crash.pdf"))
+        await wait_for_jobs(manager)
+        after = await manager.submit("biz", str(tmp_path / "ok.pdf"))
+        await wait_for_jobs(manager)
+    finally:
+        await manager.shutdown()
+
+    assert manager.get(crashed["job_id"])["status"] == "failed"
+    assert manager.get(after["job_id"])["status"] == "succeeded"
+    assert manager.stats()["succeeded"] == 1
+    assert manager.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_input_is_handed_to_on_success_then_deleted(tmp_path):
+    kept = []
+
+    async def on_success(business_id, pdf_path, filename, result):
+        kept.append((business_id, filename, open(pdf_path, "rb").read()))
+
+    manager = IngestionJobManager(str(tmp_path / "jobs"), max_concurrent=1, on_success=on_success,
+                                  job_fn=fake_ingestion_job)
+    inputs = [tmp_path / f"upload{i}.pdf" for i in range(2)]
+    for i, path in enumerate(inputs):
+        path.write_bytes(b"%PDF " + bytes([i]))
+    try:
+        first = await manager.submit("biz", str(inputs[0]), "menu.pdf", pdf_sha256="a")
+        duplicate = await manager.submit("biz", str(inputs[1]), "menu.pdf", pdf_sha256="a")
+        await wait_for_jobs(manager)
+    finally:
+        await manager.shutdown()
+
+    assert duplicate["job_id"] == first["job_id"]
+    assert kept == [("biz", "menu.pdf", b"%PDF \x00")]
+    assert not inputs[0].exists()
+    assert not inputs[1].exists()
+
+
+@pytest.mark.asyncio
+async def test_jobs_for_one_business_finish_in_submission_order(tmp_path):
+    finished = []
+
+    async def on_success(business_id, pdf_path, filename, result):
+        finished.append((business_id, filename))
+
+    manager = IngestionJobManager(str(tmp_path / "jobs"), max_concurrent=2, on_success=on_success,
+                                  job_fn=fake_ingestion_job)
+    try:
+        await manager.submit("biz", str(tmp_path / "slow.pdf"), "old.pdf")
+        await manager.submit("biz", str(tmp_path / "fast.pdf"), "new.pdf")
+        await manager.submit("other", str(tmp_path / "other.pdf"), "other.pdf")
+        await wait_for_jobs(manager)
+    finally:
+        await manager.shutdown()
+
+    assert [name for business_id, name in finished if business_id == "biz"] == ["old.pdf", "new.pdf"]
+    # Other businesses don't wait behind it
+    assert finished[0] == ("other", "other.pdf")
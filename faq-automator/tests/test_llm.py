@@ -0,0 +1,174 @@
+# tests/test_llm.py
+
+import asyncio
+import time
+
+import pytest
+
+from backend.llm_client import LLMClient, LLMUnavailableError
+from backend.singleflight import SingleFlight
+
+CALL_SECONDS = 0.2
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeAsyncModel:
+    """Stands in for the Gemini model: sleeps like a network call and tracks concurrency."""
+
+    def __init__(self, delay: float = CALL_SECONDS):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content_async(self, prompt: str) -> FakeResponse:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return FakeResponse(f"  answer to: {prompt}  ")
+
+
+class FakeSyncModel:
+    """A model with only the blocking API, like older SDK versions."""
+
+    def generate_content(self, prompt: str) -> FakeResponse:
+        time.sleep(CALL_SECONDS)
+        return FakeResponse(f"answer to: {prompt}")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_take_about_one_call_time():
+    client = LLMClient(FakeAsyncModel(), max_concurrency=10, timeout_seconds=5)
+
+    start = time.perf_counter()
+    answers = await asyncio.gather(*[client.generate(f"q{i}") for i in range(10)])
+    elapsed = time.perf_counter() - start
+
+    assert answers == [f"answer to: q{i}" for i in range(10)]
+    assert elapsed < CALL_SECONDS * 3
+
+
+@pytest.mark.asyncio
+async def test_sync_model_runs_off_the_event_loop():
+    client = LLMClient(FakeSyncModel(), max_concurrency=10, timeout_seconds=5)
+
+    start = time.perf_counter()
+    answers = await asyncio.gather(*[client.generate(f"q{i}") for i in range(10)])
+    elapsed = time.perf_counter() - start
+
+    assert answers == [f"answer to: q{i}" for i in range(10)]
+    assert elapsed < CALL_SECONDS * 3
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_by_semaphore():
+    model = FakeAsyncModel(delay=0.05)
+    client = LLMClient(model, max_concurrency=3, timeout_seconds=5)
+
+    await asyncio.gather(*[client.generate(f"q{i}") for i in range(12)])
+
+    assert model.max_in_flight == 3
+    assert client.stats()["calls"] == 12
+    assert client.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_call_times_out():
+    client = LLMClient(FakeAsyncModel(delay=1.0), max_concurrency=1, timeout_seconds=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.generate("slow question")
+    assert client.stats()["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_model_raises():
+    client = LLMClient(None)
+
+    with pytest.raises(LLMUnavailableError):
+        await client.generate("anything")
+
+
+class CountingCall:
+    """An LLM call that takes CALL_SECONDS; counts how often it really ran."""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> str:
+        self.started += 1
+        try:
+            await asyncio.sleep(CALL_SECONDS)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return "shared answer"
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_are_coalesced():
+    flight = SingleFlight("test")
+    call = CountingCall()
+
+    answers = await asyncio.gather(*(flight.do("prompt", call) for _ in range(10)))
+
+    assert answers == ["shared answer"] * 10
+    assert call.started == 1
+    assert flight.stats() == {"calls": 10, "executed": 1, "collapsed": 9, "inflight": 0}
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_waiter():
+    flight = SingleFlight("test")
+    call = CountingCall(error=RuntimeError("quota exceeded"))
+
+    results = await asyncio.gather(*(flight.do("prompt", call) for _ in range(5)), return_exceptions=True)
+
+    assert [str(r) for r in results] == ["quota exceeded"] * 5
+    assert call.started == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_first_caller_leaves_the_others_their_answer():
+    flight = SingleFlight("test")
+    call = CountingCall()
+    owner = asyncio.create_task(flight.do("prompt", call))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(flight.do("prompt", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    owner.cancel()
+
+    assert await asyncio.gather(*waiters) == ["shared answer"] * 3
+    assert owner.cancelled()
+    assert call.started == 1
+    assert call.cancelled == 0
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_once_every_caller_has_gone():
+    flight = SingleFlight("test")
+    call = CountingCall()
+    callers = [asyncio.create_task(flight.do("prompt", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert call.cancelled == 1
+    assert flight.stats()["inflight"] == 0
+    # A later caller starts a new call rather than joining the cancelled one
+    assert await flight.do("prompt", call) == "shared answer"
+    assert call.started == 2
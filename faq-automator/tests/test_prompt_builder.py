@@ -0,0 +1,64 @@
+# tests/test_prompt_builder.py
+
+import random
+
+from backend.prompt_builder import PromptBuilder, estimate_tokens
+
+TEMPLATE = """Answer from the context.
+
+Context:
+{retrieved_chunks}
+
+Conversation so far:
+{conversation_history}
+
+Question: {user_query}
+Answer:"""
+
+
+def chunk(text, score):
+    return {"chunk_text": text, "similarity_score": score}
+
+
+def history(num_turns, length=300):
+    lines = []
+    for i in range(num_turns):
+        lines.append(f"Customer: question {i} " + "q" * length)
+        lines.append(f"Assistant: answer {i} " + "a" * length)
+    return lines
+
+
+def test_recent_turns_are_kept_verbatim():
+    builder = PromptBuilder(TEMPLATE, token_budget=3000, recent_turns=2, compact_chars=50)
+    lines = history(4)
+
+    prompt = builder.build("When do you open?", lines, [])
+
+    for line in lines[-4:]:
+        assert line in prompt
+    for line in lines[:-4]:
+        assert line not in prompt
+        assert line[:50] + "..." in prompt
+
+
+def test_lowest_scoring_chunks_are_dropped_first():
+    builder = PromptBuilder(TEMPLATE, token_budget=400, history_share=0.0)
+    chunks = [chunk(f"chunk {score} " + "x" * 600, score) for score in (0.5, 0.9, 0.2, 0.7)]
+
+    prompt = builder.build("When do you open?", [], chunks)
+
+    kept = [score for score in (0.9, 0.7, 0.5, 0.2) if f"chunk {score} " in prompt]
+    assert kept == [0.9, 0.7]
+
+
+def test_prompt_never_exceeds_the_budget():
+    rng = random.Random(7)
+    for budget in (200, 500, 1000, 3000):
+        builder = PromptBuilder(TEMPLATE, token_budget=budget, recent_turns=2)
+        for _ in range(50):
+            lines = [f"Customer: {'w' * rng.randint(0, 2000)}" for _ in range(rng.randint(0, 12))]
+            chunks = [chunk("c" * rng.randint(1, 4000), rng.random()) for _ in range(rng.randint(0, 8))]
+
+            prompt = builder.build("q" * rng.randint(1, 200), lines, chunks, empty_history_text="(none)")
+
+            assert estimate_tokens(prompt) <= budget
@@ -0,0 +1,150 @@
+# tests/test_retriever.py
+
+import os
+
+import numpy as np
+import pytest
+
+from backend.embedding_batcher import QueryEmbeddingBatcher
+from backend.index_cache import IndexCache
+from backend.workers import get_cpu_executor, shutdown_cpu_executor
+
+
+class CountingLoader:
+    """Loads a file's text as the cached value; its size is the value's size in bytes."""
+
+    def __init__(self):
+        self.loads = []
+
+    def __call__(self, paths):
+        self.loads.append(tuple(paths))
+        text = paths[0].read_text()
+        return text, len(text)
+
+
+def write(path, text, mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_hit_does_not_reload(tmp_path):
+    loader = CountingLoader()
+    cache = IndexCache(loader, max_bytes=1000)
+    path = write(tmp_path / "a.index", "aaaa")
+
+    assert cache.get("a", [path]) == "aaaa"
+    assert cache.get("a", [path]) == "aaaa"
+
+    assert len(loader.loads) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_over_budget(tmp_path):
+    loader = CountingLoader()
+    cache = IndexCache(loader, max_bytes=10)
+    paths = {key: write(tmp_path / f"{key}.index", key * 4) for key in "abc"}
+
+    cache.get("a", [paths["a"]])
+    cache.get("b", [paths["b"]])
+    cache.get("a", [paths["a"]])  # "b" is now the least recently used
+    cache.get("c", [paths["c"]])
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+    cache.get("a", [paths["a"]])
+    cache.get("b", [paths["b"]])
+    assert loader.loads.count((paths["a"],)) == 1
+    assert loader.loads.count((paths["b"],)) == 2
+
+
+def test_entry_larger_than_budget_is_returned_but_not_kept(tmp_path):
+    cache = IndexCache(CountingLoader(), max_bytes=10)
+    path = write(tmp_path / "big.index", "x" * 11)
+
+    assert cache.get("big", [path]) == "x" * 11
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    loader = CountingLoader()
+    cache = IndexCache(loader, max_bytes=1000)
+    path = write(tmp_path / "a.index", "old", mtime_ns=1_000_000_000)
+    cache.get("a", [path])
+
+    write(path, "new!", mtime_ns=2_000_000_000)
+
+    assert cache.get("a", [path]) == "new!"
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["bytes"] == 4
+
+
+def test_new_paths_for_a_key_replace_its_entry(tmp_path):
+    loader = CountingLoader()
+    cache = IndexCache(loader, max_bytes=1000)
+    # Same mtime and size: only the paths tell the two versions apart
+    v1 = write(tmp_path / "v1.index", "one", mtime_ns=1_000_000_000)
+    v2 = write(tmp_path / "v2.index", "two", mtime_ns=1_000_000_000)
+
+    assert cache.get("a", [v1]) == "one"
+    assert cache.get("a", [v2]) == "two"
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 3
+
+
+def test_invalidate_drops_the_entry(tmp_path):
+    loader = CountingLoader()
+    cache = IndexCache(loader, max_bytes=1000)
+    path = write(tmp_path / "a.index", "aaaa")
+    cache.get("a", [path])
+
+    cache.invalidate("a")
+    cache.invalidate("missing")
+
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 1
+    cache.get("a", [path])
+    assert len(loader.loads) == 2
+
+
+def test_content_hash_keeps_entry_when_only_mtime_changes(tmp_path):
+    loader = CountingLoader()
+    cache = IndexCache(loader, max_bytes=1000, verify_content_hash=True)
+    path = write(tmp_path / "a.index", "same", mtime_ns=1_000_000_000)
+    cache.get("a", [path])
+
+    write(path, "same", mtime_ns=2_000_000_000)
+    cache.get("a", [path])  # Nothing to compare with yet: reloads and remembers the hash
+    write(path, "same", mtime_ns=3_000_000_000)
+    cache.get("a", [path])
+    write(path, "diff", mtime_ns=4_000_000_000)
+
+    assert cache.get("a", [path]) == "diff"
+    assert len(loader.loads) == 3
+
+
+def test_missing_file_raises(tmp_path):
+    cache = IndexCache(CountingLoader(), max_bytes=1000)
+    with pytest.raises(FileNotFoundError):
+        cache.get("a", [tmp_path / "missing.index"])
+
+
+@pytest.mark.asyncio
+async def test_query_batcher_survives_cpu_pool_restart():
+    batcher = QueryEmbeddingBatcher(
+        encode_fn=lambda texts: np.ones((len(texts), 4), dtype=np.float32),
+        max_wait_ms=1,
+        get_executor=get_cpu_executor,
+    )
+    assert (await batcher.embed("before")).shape == (4,)
+
+    shutdown_cpu_executor()  # As on app shutdown or in test teardown
+
+    try:
+        assert (await batcher.embed("after")).shape == (4,)
+    finally:
+        shutdown_cpu_executor()
@@ -0,0 +1,166 @@
+# tests/test_uploads.py
+
+import asyncio
+import hashlib
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI, File, Form, UploadFile
+from fastapi.testclient import TestClient
+
+from backend.utils import UploadSizeLimitMiddleware, UploadTooLargeError, save_upload
+
+MB = 1024 * 1024
+
+
+class FakeUpload:
+    """An UploadFile stand-in that produces `size` bytes as they are read, never holding them all."""
+
+    def __init__(self, size: int, fill: bytes):
+        self.remaining = size
+        self.fill = fill
+
+    async def read(self, size: int = -1) -> bytes:
+        await asyncio.sleep(0)  # Let the other uploads interleave, as network reads would
+        n = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= n
+        return self.fill * n
+
+
+def expected_sha256(size: int, fill: bytes) -> str:
+    sha256 = hashlib.sha256()
+    for offset in range(0, size, MB):
+        sha256.update(fill * min(MB, size - offset))
+    return sha256.hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_large_uploads_are_streamed_with_constant_memory(tmp_path):
+    sizes = [20 * MB, 30 * MB, 40 * MB, 45 * MB]
+    uploads = [FakeUpload(size, bytes([65 + i])) for i, size in enumerate(sizes)]
+
+    tracemalloc.start()
+    results = await asyncio.gather(*(
+        save_upload(upload, tmp_path / f"upload_{i}.pdf", max_bytes=50 * MB)
+        for i, upload in enumerate(uploads)
+    ))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for i, (size, sha256) in enumerate(results):
+        assert size == sizes[i]
+        assert sha256 == expected_sha256(sizes[i], bytes([65 + i]))
+        assert (tmp_path / f"upload_{i}.pdf").stat().st_size == sizes[i]
+    # About one chunk per upload in flight, not the 135 MB being uploaded
+    assert peak < 4 * 2 * MB
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_aborted_mid_stream(tmp_path):
+    upload = FakeUpload(200 * MB, b"x")
+    dest = tmp_path / "too_big.pdf"
+
+    with pytest.raises(UploadTooLargeError):
+        await save_upload(upload, dest, max_bytes=50 * MB)
+
+    # Stopped right after the limit rather than reading the whole body
+    assert upload.remaining >= 200 * MB - 51 * MB
+    assert not dest.exists()
+
+
+BOUNDARY = "test-boundary"
+
+
+def make_upload_app(max_bytes: int):
+    """An app with the upload endpoint's signature behind the size-limit middleware."""
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=max_bytes, paths={"/business/upload-pdf"})
+    app.state.handled = []
+
+    @app.post("/business/upload-pdf")
+    async def upload(business_id: str = Form(...), file: UploadFile = File(...)):
+        size = len(await file.read())
+        app.state.handled.append((business_id, size))
+        return {"size": size}
+
+    return app
+
+
+class MultipartBody:
+    """A multipart PDF upload of `size` bytes, produced 1 MB at a time; counts what was read."""
+
+    HEAD = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"business_id\"\r\n\r\nbusiness_01\r\n"
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode()
+    TAIL = f"\r\n--{BOUNDARY}--\r\n".encode()
+
+    def __init__(self, size: int):
+        self.size = size
+        self.bytes_read = 0
+
+    def __len__(self) -> int:
+        return len(self.HEAD) + self.size + len(self.TAIL)
+
+    def __iter__(self):
+        yield from self._count(self.HEAD)
+        for offset in range(0, self.size, MB):
+            yield from self._count(b"x" * min(MB, self.size - offset))
+        yield from self._count(self.TAIL)
+
+    def _count(self, chunk: bytes):
+        self.bytes_read += len(chunk)
+        yield chunk
+
+
+def post_upload(client: TestClient, body: MultipartBody):
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}", "Content-Length": str(len(body))}
+    return client.post("/business/upload-pdf", content=iter(body), headers=headers)
+
+
+def test_oversized_upload_is_refused_by_content_length_before_reading_it():
+    app = make_upload_app(max_bytes=5 * MB)
+    body = MultipartBody(50 * MB)
+
+    response = post_upload(TestClient(app), body)
+
+    assert response.status_code == 413
+    assert app.state.handled == []
+    assert body.bytes_read < MB
+
+
+@pytest.mark.asyncio
+async def test_oversized_chunked_upload_is_cut_off_at_the_limit():
+    # Driven over raw ASGI: TestClient reads the whole request body before the app sees it
+    app = make_upload_app(max_bytes=5 * MB)
+    body = MultipartBody(50 * MB)
+    chunks = iter(body)
+    sent = []
+
+    async def receive():
+        chunk = next(chunks, None)
+        return {"type": "http.request", "body": chunk or b"", "more_body": chunk is not None}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/business/upload-pdf", "raw_path": b"/business/upload-pdf",
+        "root_path": "", "query_string": b"", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+                    (b"transfer-encoding", b"chunked")],
+    }
+    await app(scope, receive, send)
+
+    assert sent[0]["status"] == 413
+    assert app.state.handled == []
+    assert body.bytes_read < 7 * MB
+
+
+def test_upload_within_the_limit_reaches_the_endpoint():
+    app = make_upload_app(max_bytes=5 * MB)
+
+    response = post_upload(TestClient(app), MultipartBody(3 * MB))
+
+    assert response.status_code == 200
+    assert app.state.handled == [("business_01", 3 * MB)]
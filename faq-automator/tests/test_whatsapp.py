@@ -0,0 +1,146 @@
+# tests/test_whatsapp.py
+
+import asyncio
+
+import pytest
+
+from backend.idempotency import IdempotencyCache
+from backend.messaging_client import FakeMessagingClient
+from backend.reply_queue import ReplyJob, ReplyWorkerPool
+
+
+async def echo_handler(job: ReplyJob) -> str:
+    await asyncio.sleep(0.05)
+    return f"reply to {job.body}"
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_sends_each_reply_to_its_sender():
+    client = FakeMessagingClient()
+    pool = ReplyWorkerPool(echo_handler, client, num_workers=4)
+    await pool.start()
+
+    for i in range(10):
+        assert pool.submit(ReplyJob(sender_id=f"whatsapp:+1{i}", body=f"q{i}"))
+    await pool.stop()
+
+    assert sorted(client.sent) == sorted((f"whatsapp:+1{i}", f"reply to q{i}") for i in range(10))
+    assert pool.stats()["processed"] == 10
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_so_webhook_can_reply_inline():
+    pool = ReplyWorkerPool(echo_handler, FakeMessagingClient(), num_workers=1, max_queue_size=1)
+    await pool.start()
+
+    accepted = [pool.submit(ReplyJob(sender_id="whatsapp:+1", body=f"q{i}")) for i in range(5)]
+    await pool.stop()
+
+    assert accepted[0] is True
+    assert False in accepted
+    assert pool.stats()["rejected"] == accepted.count(False)
+
+
+@pytest.mark.asyncio
+async def test_handler_failure_does_not_stop_the_worker():
+    async def flaky_handler(job: ReplyJob) -> str:
+        if job.body == "boom":
+            raise RuntimeError("agent failed")
+        return "ok"
+
+    client = FakeMessagingClient()
+    pool = ReplyWorkerPool(flaky_handler, client, num_workers=1)
+    await pool.start()
+    pool.submit(ReplyJob(sender_id="whatsapp:+1", body="boom"))
+    pool.submit(ReplyJob(sender_id="whatsapp:+2", body="fine"))
+    await pool.stop()
+
+    assert client.sent == [("whatsapp:+2", "ok")]
+    assert pool.stats()["failed"] == 1
+
+
+def test_submit_before_start_is_rejected():
+    pool = ReplyWorkerPool(echo_handler, FakeMessagingClient())
+    assert pool.submit(ReplyJob(sender_id="whatsapp:+1", body="hi")) is False
+
+
+@pytest.mark.asyncio
+async def test_retry_during_processing_joins_the_first_attempt():
+    dedupe = IdempotencyCache(ttl_seconds=60)
+    calls = []
+
+    async def slow_reply():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "the answer"
+
+    replies = await asyncio.gather(*[dedupe.run("SM123", slow_reply) for _ in range(3)])
+    late_retry = await dedupe.run("SM123", slow_reply)
+
+    assert replies == ["the answer"] * 3
+    assert late_retry == "the answer"
+    assert len(calls) == 1
+    assert dedupe.stats()["joined_inflight"] == 2
+    assert dedupe.stats()["served_cached"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_attempt_is_not_cached():
+    dedupe = IdempotencyCache(ttl_seconds=60)
+
+    async def failing_reply():
+        raise RuntimeError("gemini down")
+
+    async def ok_reply():
+        return "recovered"
+
+    with pytest.raises(RuntimeError):
+        await dedupe.run("SM1", failing_reply)
+    assert await dedupe.run("SM1", ok_reply) == "recovered"
+
+
+def test_claim_drops_duplicates():
+    dedupe = IdempotencyCache(ttl_seconds=60)
+    assert dedupe.claim("SM1") is True
+    assert dedupe.claim("SM1") is False
+    assert dedupe.claim(None) is True
+
+
+@pytest.mark.asyncio
+async def test_rejected_result_is_not_cached():
+    dedupe = IdempotencyCache(ttl_seconds=60)
+    replies = iter(["sorry, try again", "the answer"])
+
+    async def reply():
+        return next(replies)
+
+    def is_real_answer(text):
+        return not text.startswith("sorry")
+
+    assert await dedupe.run("SM1", reply, cache_if=is_real_answer) == "sorry, try again"
+    assert await dedupe.run("SM1", reply, cache_if=is_real_answer) == "the answer"
+    assert await dedupe.run("SM1", reply, cache_if=is_real_answer) == "the answer"
+    assert dedupe.stats()["executed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_released_claim_lets_a_retry_get_a_real_attempt():
+    dedupe = IdempotencyCache(ttl_seconds=60)
+    replies = iter(["sorry, try again", "the answer"])
+
+    async def reply():
+        return next(replies)
+
+    def is_real_answer(text):
+        return not text.startswith("sorry")
+
+    # Queue full: the claim is released and the reply is made inline, but fails
+    assert dedupe.claim("SM1") is True
+    dedupe.release("SM1")
+    assert await dedupe.run("SM1", reply, cache_if=is_real_answer) == "sorry, try again"
+
+    # Twilio's retry is neither dropped as queued nor served the fallback
+    assert dedupe.claim("SM1") is True
+    dedupe.release("SM1")
+    assert await dedupe.run("SM1", reply, cache_if=is_real_answer) == "the answer"
+    assert dedupe.claim("SM1") is False